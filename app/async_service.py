@@ -0,0 +1,231 @@
+#============================================================================================
+# ASYNC (MOTOR) COUNTERPARTS OF THE SERVICE FUNCTIONS.
+#============================================================================================
+import datetime
+import pymongo
+from starlette.concurrency import run_in_threadpool
+from .database import get_async_mongo_client
+from .constants import *
+from .service import (
+    FormatNotificationListEntry, BuildEnforcementHoursConfig, BuildNotificationCronSetting, CronInfoViewPipeline,
+    FormatSiteNotificationNames, PlanBulkNotificationWrite, ApplyBulkWriteErrors, ReconcileBulkNotificationWrite,
+    CountBulkWriteMatches, BulkStatusApplied, LegacyCronSettingQuery, LegacyCronSettingProjection, LegacyCronSettingRemoval,
+    CronSettingTombstoneUpdate
+)
+from . import exceptions, models, notify, outbox, scheduler, profiling, storage, notification_sites
+
+async def GetNotificationList(filters: dict):
+    db_instance = get_async_mongo_client()[NotificationsDatabase]
+    collection = db_instance[NotificationListCollection]
+    notification_list = []
+    async for notification_document in collection.find(filters):
+        notification_list.append(FormatNotificationListEntry(notification_document))
+    return notification_list
+
+async def GetSiteNotificationList(site_id: str):
+    collection, site_filter = await storage.GetAsyncSiteCollection(site_id, NotificationListCollection)
+    notification_list = await collection.find(site_filter, {"_id": 0}).to_list(length=None)
+    if notification_list:
+        return notification_list[0].get("entity_details", [])
+    return notification_list
+
+async def CreateNotification(payload: dict):
+    notification_name = payload.get("notification_name", "")
+    Notification = models.get_notification_class(notification_name)
+    notification = Notification(
+        site_id=payload.get("site_id", ""),
+        email_recipients=payload.get("email_recipients", []),
+        metadata=payload.get("metadata", {})
+    )
+    return await notification.CreateNotificationAsync()
+
+async def UpdateNotification(payload: dict):
+    notification_name = payload.get("notification_name", "")
+    Notification = models.get_notification_class(notification_name)
+    notification = Notification(
+        site_id=payload.get("site_id", ""),
+        email_recipients=payload.get("email_recipients", []),
+        metadata=payload.get("metadata", {})
+    )
+    return await notification.UpdateNotificationAsync()
+
+async def DeleteNotification(payload: dict):
+    notification_name = payload.get("notification_name", "")
+    Notification = models.get_notification_class(notification_name)
+    notification = Notification(
+        site_id=payload.get("site_id", "")
+    )
+    return await notification.DeleteNotificationAsync()
+
+async def GetNotificationInfo(site_id: str, notification_name: str):
+    Notification = models.get_notification_class(notification_name)
+    notification = Notification(
+        site_id=site_id
+    )
+    return await notification.GetNotificationInfoAsync()
+
+async def GetSiteNotificationNames(site_id: str) -> set:
+    collection, site_filter = await storage.GetAsyncSiteCollection(site_id, NotificationListCollection)
+    doc = await collection.find_one({**site_filter, "entity_type": "NotificationList"}, {"_id": 0, "entity_details.notification_name": 1})
+    return FormatSiteNotificationNames(doc)
+
+async def BulkWriteNotifications(payload: dict, operation: str):
+    site_id = payload.get("site_id", "")
+    ordered = payload.get("ordered", True)
+    collection, site_filter = await storage.GetAsyncSiteCollection(site_id, NotificationListCollection, write=True)
+    results, requests, request_items = PlanBulkNotificationWrite(
+        site_id, operation, payload.get("notifications", []), await GetSiteNotificationNames(site_id), ordered, site_filter
+    )
+    if not requests:
+        return results
+    await models.SiteNotification(site_id, []).EnsureNotificationListIndexAsync(collection, site_filter)
+    try:
+        result = await collection.bulk_write(requests, ordered=ordered)
+        matched, expected = CountBulkWriteMatches(result), len(requests)
+    except pymongo.errors.BulkWriteError as e:
+        ApplyBulkWriteErrors(site_id, results, request_items, e.details.get("writeErrors", []), ordered)
+        matched = e.details.get("nMatched", 0) + e.details.get("nUpserted", 0)
+        expected = sum(1 for result in results if result["status"] == BulkStatusApplied)
+    if matched < expected:
+        ReconcileBulkNotificationWrite(site_id, operation, results, await GetSiteNotificationNames(site_id))
+    # Bulk writes can partially apply, so the site's NotificationSites entries are re-synced from its list.
+    await notification_sites.SyncSiteAsync(site_id)
+    return results
+
+async def BulkCreateNotifications(payload: dict):
+    return await BulkWriteNotifications(payload, models.BulkOperationCreate)
+
+async def BulkUpdateNotifications(payload: dict):
+    return await BulkWriteNotifications(payload, models.BulkOperationUpdate)
+
+async def BulkDeleteNotifications(payload: dict):
+    return await BulkWriteNotifications(payload, models.BulkOperationDelete)
+
+async def GetEnforcementHours(site_id: str):
+    collection, site_filter = await storage.GetAsyncSiteCollection(site_id, ConfigurationListCollection)
+    enforcement_config = await collection.find_one({**site_filter, "config_type": "enforcement_hours"})
+    if enforcement_config is None:
+        return {}
+    return enforcement_config.get("metadata", {})
+
+async def SetEnforcementHours(payload: dict):
+    site_id = payload.get("site_id")
+    collection, site_filter = await storage.GetAsyncSiteCollection(site_id, ConfigurationListCollection, write=True)
+    enforcement_config = BuildEnforcementHoursConfig(payload)
+    await collection.update_one({**site_filter, "config_type": "enforcement_hours"}, {"$set": enforcement_config}, upsert=True)
+    return
+
+async def DeleteEnforcementHours(payload: dict):
+    site_id = payload.get("site_id")
+    collection, site_filter = await storage.GetAsyncSiteCollection(site_id, ConfigurationListCollection, write=True)
+    await collection.delete_one({**site_filter, "config_type": "enforcement_hours"})
+    return
+
+async def GetTimezoneList():
+    db_instance = get_async_mongo_client()[NotificationsDatabase]
+    collection = db_instance[TimezoneListCollection]
+    return await collection.find({}, {"_id": 0}).to_list(length=None)
+
+_cron_settings_indexed = False
+
+async def GetCronSettingsCollection():
+    global _cron_settings_indexed
+    db_instance = get_async_mongo_client()[ParkLoyaltyDatabase]
+    collection = db_instance[CronSettingsCollection]
+    if not _cron_settings_indexed:
+        await collection.create_index([("cron_type", pymongo.ASCENDING), ("site_id", pymongo.ASCENDING)], unique=True)
+        _cron_settings_indexed = True
+    return collection
+
+def GetLegacyCronInfoCollection():
+    return get_async_mongo_client()[ParkLoyaltyDatabase][CronInfoCollection]
+
+async def GetCronInfoView(cron_type: str = None):
+    collection = await GetCronSettingsCollection()
+    pipeline = CronInfoViewPipeline
+    if cron_type is not None:
+        pipeline = [{"$match": {"cron_type": cron_type}}] + pipeline
+    return await collection.aggregate(pipeline).to_list(length=None)
+
+async def GetNotificationCronInfo(site_id: str, notification_name: str):
+    notification = models.get_notification_class(notification_name)
+    if not notification.isCronConfigurable:
+        raise exceptions.NotConfigurableNotificationsCronsException(notification_name)
+    notification_cron_name = notification.NotificationCronName
+    collection = await GetCronSettingsCollection()
+    cron_setting_doc = await collection.find_one({
+        "cron_type": notification_cron_name,
+        "site_id": site_id
+    }, {"_id": 0, "setting": 1, "deleted": 1})
+    if cron_setting_doc is not None:
+        return {} if models.IsCronSettingTombstone(cron_setting_doc) else cron_setting_doc.get("setting", {})
+    notification_cron_info = await GetLegacyCronInfoCollection().find_one(
+        LegacyCronSettingQuery(notification_cron_name, site_id), LegacyCronSettingProjection(site_id)
+    )
+    if notification_cron_info is None:
+        return {}
+    return notification_cron_info.get("mapping", {}).get(site_id, {})
+
+async def SetNotificationCronInfo(payload: dict):
+    site_id = payload.get("site_id")
+    notification_cron_name, cron_setting = BuildNotificationCronSetting(payload)
+    # The site lookup behind NotificationCronEmail is still blocking, so it runs on the threadpool.
+    email = await run_in_threadpool(
+        notify.NotificationCronEmail,
+        site_id,
+        notification_cron_name,
+        notify.NotificationCronEmailMethods.ReconfigureNotificationCron,
+        cron_setting
+    )
+    collection = await GetCronSettingsCollection()
+
+    async def write_cron_setting(session):
+        with profiling.span("cron_write"):
+            await collection.update_one(
+                {"cron_type": notification_cron_name, "site_id": site_id},
+                {"$set": {"setting": cron_setting, "updated_at": datetime.datetime.utcnow()}, "$unset": {"deleted": ""}},
+                upsert=True,
+                session=session
+            )
+        await outbox.EnqueueEmailAsync(email, session=session)
+    with profiling.span("transaction"):
+        await outbox.RunInTransactionAsync(write_cron_setting)
+    scheduler.scheduler.upsert(notification_cron_name, site_id, cron_setting)
+    return
+
+async def DeleteNotificationCronInfo(payload: dict):
+    notification_name = payload.get("notification_name")
+    site_id = payload.get("site_id")
+    notification = models.get_notification_class(notification_name)
+    if not notification.isCronConfigurable:
+        raise exceptions.NotConfigurableNotificationsCronsException(notification_name)
+    notification_cron_name = notification.NotificationCronName
+    email = await run_in_threadpool(
+        notify.NotificationCronEmail,
+        site_id,
+        notification_cron_name,
+        notify.NotificationCronEmailMethods.DeleteNotificationCron
+    )
+    collection = await GetCronSettingsCollection()
+    legacy_collection = GetLegacyCronInfoCollection()
+
+    async def delete_cron_setting(session):
+        with profiling.span("cron_write"):
+            previous = await collection.find_one_and_update(
+                {"cron_type": notification_cron_name, "site_id": site_id},
+                CronSettingTombstoneUpdate(),
+                {"_id": 0, "deleted": 1},
+                upsert=True,
+                session=session
+            )
+            legacy_result = await legacy_collection.update_one(
+                LegacyCronSettingQuery(notification_cron_name, site_id), LegacyCronSettingRemoval(site_id), session=session
+            )
+        existed = previous is not None and not models.IsCronSettingTombstone(previous)
+        if not existed and legacy_result.modified_count == 0:
+            raise exceptions.NotificationCronDoesNotExistException(site_id, notification_name)
+        await outbox.EnqueueEmailAsync(email, session=session)
+    with profiling.span("transaction"):
+        await outbox.RunInTransactionAsync(delete_cron_setting)
+    scheduler.scheduler.remove(notification_cron_name, site_id)
+    return
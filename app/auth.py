@@ -2,43 +2,245 @@
 # API OPERTIONS FOR AUTH.
 #============================================================================================
 from urllib import response
-from .exporter import AUTH_STATUS_LINK
+from .exporter import *
 from .responses import HTTPExceptionResponse
+from .cache import TTLCache
+from .breaker import CircuitBreaker
+from . import exceptions, metrics, profiling
 from fastapi import FastAPI, Request ,HTTPException, Depends, Request
-import requests
+import httpx
+import hashlib
 import json
+import jwt
+import time
+from cryptography.hazmat.primitives import serialization
 
 ScopeGet = "get"
 ScopeCreate = "create"
 ScopeEdit = "edit"
 ScopeDelete = "delete"
+# Fleet-wide (cross-site) endpoints.
+ScopeAdmin = "admin"
 
-def checkAuth(token, endpoint_name, scope_type):
+AuthModeRemote = "remote"
+AuthModeLocal = "local"
+
+# Shared keep-alive connection pool to the auth module.
+# Warning: use get_auth_client method to get client access
+_Auth_Client = None
+_auth_breaker = CircuitBreaker(
+    "Auth Module",
+    failure_threshold=AUTH_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=AUTH_BREAKER_RESET_SECONDS
+)
+
+def get_auth_client() -> httpx.AsyncClient:
+    global _Auth_Client
+    if _Auth_Client is None:
+        _Auth_Client = httpx.AsyncClient(
+            timeout=httpx.Timeout(AUTH_READ_TIMEOUT_SECONDS, connect=AUTH_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=AUTH_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=AUTH_POOL_MAX_CONNECTIONS
+            )
+        )
+    return _Auth_Client
+
+async def close_auth_client():
+    global _Auth_Client
+    if _Auth_Client is not None:
+        await _Auth_Client.aclose()
+        _Auth_Client = None
+
+async def checkAuth(token, endpoint_name, scope_type):
+    if not _auth_breaker.allow_request():
+        metrics.AUTH_CHECKS.labels(metrics.AuthOutcomeUnavailable).inc()
+        raise exceptions.ServiceUnavailableException(_auth_breaker.name)
+    started_at = time.perf_counter()
+    outcome = None
     try:
         payload = json.dumps({
             "endpoint_name": endpoint_name,
             "scope_type": scope_type
         })
-        auth_response = requests.post(AUTH_STATUS_LINK, headers={"Content-Type": "application/json", "token": token}, data=payload)
-        return auth_response.json()
-
+        auth_response = await get_auth_client().post(AUTH_STATUS_LINK, headers={"Content-Type": "application/json", "token": token}, content=payload)
+        if auth_response.status_code >= 500:
+            raise httpx.HTTPStatusError("Auth Module Error", request=auth_response.request, response=auth_response)
+        auth_response = auth_response.json()
+        outcome = True
     except Exception as e:
         print(e)
-        raise Exception("Error! Auth Module Offline")
+        outcome = False
+        metrics.AUTH_CHECK_LATENCY.observe(time.perf_counter() - started_at)
+        metrics.AUTH_CHECKS.labels(metrics.AuthOutcomeUnavailable).inc()
+        raise exceptions.ServiceUnavailableException(_auth_breaker.name)
+    finally:
+        # Runs on cancellation too (CancelledError is a BaseException), so a half-open
+        # trial always reports back instead of holding the breaker half-open.
+        if outcome is True:
+            _auth_breaker.record_success()
+        elif outcome is False:
+            _auth_breaker.record_failure()
+        else:
+            _auth_breaker.record_abandoned()
+    metrics.AUTH_CHECK_LATENCY.observe(time.perf_counter() - started_at)
+    metrics.AUTH_CHECKS.labels(metrics.get_auth_outcome(auth_response)).inc()
+    return auth_response
+
+# Verification results keyed on (token digest, endpoint path, scope).
+# Rejections are cached for a shorter period so a fixed token is picked up quickly.
+_auth_cache = TTLCache(max_size=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _auth_response_ttl(auth_response) -> float:
+    if auth_response.get("token_active") == False or auth_response.get("status") == False:
+        return AUTH_CACHE_NEGATIVE_TTL_SECONDS
+    return AUTH_CACHE_TTL_SECONDS
+
+async def cachedCheckAuth(token, endpoint_name, scope_type):
+    cache_key = (_token_digest(token), endpoint_name, scope_type)
+    return await _auth_cache.aget_or_load(
+        cache_key,
+        lambda: checkAuth(token, endpoint_name, scope_type),
+        ttl_for=_auth_response_ttl
+    )
+
+def evictToken(token) -> int:
+    """Drop every cached verification result for a token in this process."""
+    token_digest = _token_digest(token)
+    _revocation_cache.pop(token_digest)
+    return _auth_cache.evict_where(lambda cache_key: cache_key[0] == token_digest)
+
+def getAuthCacheStats() -> dict:
+    return _auth_cache.stats()
+
+#============================================================================================
+# LOCAL SIGNED-TOKEN VERIFICATION.
+#============================================================================================
+class PublicKeyStore():
+    """Public keys used to verify signed tokens, indexed by key id.
 
-def verifyGETAuthenticationAndAuthorizationRequest(request: Request):
-    return verifyAuthenticationAndAuthorizationRequest(request, ScopeGet)
+    Keys come from a PEM file and/or a JWKS endpoint. The JWKS document is
+    re-fetched every AUTH_JWKS_REFRESH_SECONDS, or sooner when a token names a
+    key id we have not seen (at most once per minute).
+    """
+    UnknownKidRefreshSeconds = 60
+
+    def __init__(self) -> None:
+        self.keys = {}
+        self.fetched_at = 0.0
+
+    def add_key(self, key, kid=None) -> None:
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        if isinstance(key, bytes):
+            key = serialization.load_pem_public_key(key)
+        self.keys[kid] = key
+
+    async def refresh(self) -> None:
+        response = await get_auth_client().get(AUTH_JWKS_URL)
+        response.raise_for_status()
+        jwk_set = jwt.PyJWKSet.from_dict(response.json())
+        for jwk in jwk_set.keys:
+            self.keys[jwk.key_id] = jwk.key
+        self.fetched_at = time.monotonic()
+
+    async def get(self, kid):
+        if AUTH_JWKS_URL:
+            age = time.monotonic() - self.fetched_at
+            if age >= AUTH_JWKS_REFRESH_SECONDS or (kid not in self.keys and age >= self.UnknownKidRefreshSeconds):
+                await self.refresh()
+        key = self.keys.get(kid)
+        if key is None and len(self.keys) == 1:
+            # A single configured key also verifies tokens that carry no (or a foreign) kid.
+            key = next(iter(self.keys.values()))
+        return key
+
+_public_keys = PublicKeyStore()
+if AUTH_JWT_PUBLIC_KEY_PATH:
+    with open(AUTH_JWT_PUBLIC_KEY_PATH, "rb") as fh:
+        _public_keys.add_key(fh.read())
+
+# Last revocation verdict per token digest, refreshed from the auth module every AUTH_REVOCATION_CHECK_SECONDS.
+_revocation_cache = TTLCache(max_size=AUTH_CACHE_MAX_SIZE, ttl=AUTH_REVOCATION_CHECK_SECONDS)
+
+def registerPublicKey(key, kid=None) -> None:
+    """Trust an additional public key (PEM string/bytes or key object) for local verification."""
+    _public_keys.add_key(key, kid)
+
+def _claims_to_auth_response(claims: dict, scope_type: str) -> dict:
+    scopes = claims.get("scopes")
+    if scopes is None:
+        scopes = claims.get("scope", "").split()
+    return {
+        "token_active": True,
+        "status": scope_type in scopes,
+        "metadata": {
+            "site_id": claims.get("site_id"),
+            "user_id": claims.get("user_id", claims.get("sub")),
+            "role": claims.get("role"),
+            "scopes": list(scopes),
+        }
+    }
+
+async def _isTokenActive(token, endpoint_name, scope_type) -> bool:
+    async def check_revocation():
+        try:
+            auth_response = await checkAuth(token, endpoint_name, scope_type)
+        except exceptions.ServiceUnavailableException:
+            # The signature is already verified; an offline auth module must not take the service down with it.
+            # The unknown verdict (None) is only kept briefly so revocation is re-checked once it is back.
+            return None
+        return auth_response.get("token_active", False) != False
+    token_active = await _revocation_cache.aget_or_load(
+        _token_digest(token),
+        check_revocation,
+        ttl_for=lambda verdict: AUTH_CACHE_NEGATIVE_TTL_SECONDS if verdict is None else None
+    )
+    return token_active != False
+
+async def verifyLocalToken(token, endpoint_name, scope_type) -> dict:
+    """Verify a signed token against cached public keys and map its claims to an auth response."""
+    inactive_response = {"token_active": False, "status": False, "metadata": {}}
+    try:
+        header = jwt.get_unverified_header(token)
+        key = await _public_keys.get(header.get("kid"))
+        if key is None:
+            return inactive_response
+        claims = jwt.decode(
+            token,
+            key=key,
+            algorithms=AUTH_JWT_ALGORITHMS,
+            audience=AUTH_JWT_AUDIENCE or None,
+            issuer=AUTH_JWT_ISSUER or None,
+            options={"verify_aud": bool(AUTH_JWT_AUDIENCE), "require": ["exp"]}
+        )
+    except jwt.PyJWTError:
+        return inactive_response
+    except httpx.HTTPError:
+        raise exceptions.ServiceUnavailableException(_auth_breaker.name)
+    if not await _isTokenActive(token, endpoint_name, scope_type):
+        return inactive_response
+    return _claims_to_auth_response(claims, scope_type)
+
+async def verifyGETAuthenticationAndAuthorizationRequest(request: Request):
+    return await verifyAuthenticationAndAuthorizationRequest(request, ScopeGet)
     
-def verifyCREATEAuthenticationAndAuthorizationRequest(request: Request):
-    return verifyAuthenticationAndAuthorizationRequest(request, ScopeCreate)
+async def verifyCREATEAuthenticationAndAuthorizationRequest(request: Request):
+    return await verifyAuthenticationAndAuthorizationRequest(request, ScopeCreate)
+
+async def verifyEDITAuthenticationAndAuthorizationRequest(request: Request):
+    return await verifyAuthenticationAndAuthorizationRequest(request, ScopeEdit)
 
-def verifyEDITAuthenticationAndAuthorizationRequest(request: Request):
-    return verifyAuthenticationAndAuthorizationRequest(request, ScopeEdit)
+async def verifyDELETEAuthenticationAndAuthorizationRequest(request: Request):
+    return await verifyAuthenticationAndAuthorizationRequest(request, ScopeDelete)
 
-def verifyDELETEAuthenticationAndAuthorizationRequest(request: Request):
-    return verifyAuthenticationAndAuthorizationRequest(request, ScopeDelete)
+async def verifyADMINAuthenticationAndAuthorizationRequest(request: Request):
+    return await verifyAuthenticationAndAuthorizationRequest(request, ScopeAdmin)
 
-def verifyAuthenticationAndAuthorizationRequest(request: Request, scope_type: str):
+async def verifyAuthenticationAndAuthorizationRequest(request: Request, scope_type: str):
     token = request.headers.get('token', None)
     if token is None:
         if "Authorization" in request.headers:        
@@ -50,7 +252,14 @@ def verifyAuthenticationAndAuthorizationRequest(request: Request, scope_type: st
             )
 
     endpoint_name = request.url.path
-    auth_response = checkAuth(token, endpoint_name, scope_type)
+    try:
+        with profiling.span("auth"):
+            if AUTH_MODE == AuthModeLocal:
+                auth_response = await verifyLocalToken(token, endpoint_name, scope_type)
+            else:
+                auth_response = await cachedCheckAuth(token, endpoint_name, scope_type)
+    except exceptions.ServiceUnavailableException as e:
+        raise HTTPExceptionResponse(status_code=503, message=str(e))
     if auth_response["token_active"] == False:
         raise HTTPExceptionResponse(status_code=401, message="Token authentication failure")
     if auth_response["status"] == False:
@@ -0,0 +1,62 @@
+#============================================================================================
+# CIRCUIT BREAKER FOR DOWNSTREAM SERVICES.
+#============================================================================================
+import threading
+import time
+
+StateClosed = "closed"
+StateOpen = "open"
+StateHalfOpen = "half_open"
+
+
+class CircuitBreaker():
+    """Fails fast once a downstream service has failed repeatedly.
+
+    After failure_threshold consecutive failures the circuit opens and every
+    call is rejected for reset_timeout seconds. The first call after that is
+    let through as a trial; its outcome closes or re-opens the circuit. A trial
+    that is abandoned (record_abandoned) or never reports back within
+    reset_timeout gives the next call the trial instead.
+    """
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = StateClosed
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == StateClosed:
+                return True
+            now = time.monotonic()
+            if self.state == StateOpen and now - self.opened_at >= self.reset_timeout:
+                self.state = StateHalfOpen
+                self.trial_started_at = now
+                return True
+            if self.state == StateHalfOpen and now - self.trial_started_at >= self.reset_timeout:
+                # The previous trial never reported back.
+                self.trial_started_at = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = StateClosed
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == StateHalfOpen or self.failures >= self.failure_threshold:
+                self.state = StateOpen
+                self.opened_at = time.monotonic()
+
+    def record_abandoned(self) -> None:
+        """The call ended without an outcome (e.g. it was cancelled); a pending trial is given up."""
+        with self._lock:
+            if self.state == StateHalfOpen:
+                self.state = StateOpen
@@ -0,0 +1,170 @@
+#============================================================================================
+# IN-PROCESS TTL / LRU CACHE.
+#============================================================================================
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class _InflightCall():
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache():
+    """Bounded LRU cache whose entries expire after a per-entry TTL.
+
+    Concurrent misses on the same key are collapsed: the first caller runs the
+    loader while the others wait for its result instead of calling it again.
+    """
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._async_inflight = {}
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_locked(self, key, value, ttl):
+        if ttl is None:
+            ttl = self.ttl
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get_locked(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None) -> None:
+        with self._lock:
+            self._set_locked(key, value, ttl)
+
+    def get_or_load(self, key, loader, ttl_for=None):
+        """Return the cached value for key, calling loader() once on a miss.
+
+        ttl_for, when given, receives the loaded value and returns the TTL it
+        should be cached for. Errors raised by the loader are never cached.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            call = self._inflight.get(key)
+            if call is None:
+                self.misses += 1
+                call = _InflightCall()
+                self._inflight[key] = call
+                is_leader = True
+            else:
+                self.coalesced += 1
+                is_leader = False
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            value = loader()
+            call.value = value
+            with self._lock:
+                self._set_locked(key, value, ttl_for(value) if ttl_for else None)
+            return value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    async def aget_or_load(self, key, loader, ttl_for=None):
+        """Async counterpart of get_or_load; loader is a coroutine function.
+
+        The load runs in its own task that every caller awaits through shield(), so
+        a cancelled caller stops waiting without cancelling the load the others share.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            task = self._async_inflight.get(key)
+            if task is None:
+                self.misses += 1
+                task = asyncio.ensure_future(self._aload(key, loader, ttl_for))
+                # Retrieve the outcome so an error nobody is left waiting for is not reported.
+                task.add_done_callback(lambda task: task.cancelled() or task.exception())
+                self._async_inflight[key] = task
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _aload(self, key, loader, ttl_for):
+        try:
+            value = await loader()
+            with self._lock:
+                self._set_locked(key, value, ttl_for(value) if ttl_for else None)
+            return value
+        finally:
+            with self._lock:
+                self._async_inflight.pop(key, None)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict_where(self, predicate) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
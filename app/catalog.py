@@ -0,0 +1,100 @@
+#============================================================================================
+# CACHED NOTIFICATION CATALOG RESPONSE.
+# /get_notification_list is served from pre-serialized bytes with an ETag. They are rebuilt
+# only when the notification class registry or Notifications.NotificationList changes.
+#============================================================================================
+import enum
+import hashlib
+import json
+import threading
+import time
+import pymongo
+from .database import get_mongo_client
+from .constants import NotificationsDatabase, NotificationListCollection
+from .exporter import CATALOG_REFRESH_SECONDS
+from . import models, responses, service
+
+
+def _encode_default(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class NotificationCatalog():
+    """Holds the serialized catalog response and its ETag.
+
+    While watching, a change stream on the catalog collection invalidates the
+    cached bytes. Without change streams (standalone mongod, or before start())
+    the bytes are simply rebuilt every CATALOG_REFRESH_SECONDS.
+    """
+    def __init__(self) -> None:
+        # (body, etag), replaced in one assignment so readers never pair a body with another build's ETag.
+        self.response = None
+        self.watching = False
+        self._registry_version = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def is_stale(self) -> bool:
+        if self.response is None or self._registry_version != models.get_registry_version():
+            return True
+        return not self.watching and time.monotonic() - self._built_at >= CATALOG_REFRESH_SECONDS
+
+    def rebuild(self) -> tuple:
+        registry_version = models.get_registry_version()
+        notification_list = service.GetNotificationList({})
+        body = json.dumps(
+            responses.ResponseModel(notification_list, True, "Notification List"),
+            default=_encode_default,
+            separators=(",", ":")
+        ).encode("utf-8")
+        response = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+        self.response = response
+        self._registry_version = registry_version
+        self._built_at = time.monotonic()
+        return response
+
+    def get(self):
+        """Return (body, etag), rebuilding the cached bytes first if they are stale."""
+        response = self.response
+        if response is None or self.is_stale():
+            with self._lock:
+                # invalidate() can clear self.response at any point, so only locals are returned.
+                response = self.response
+                if response is None or self.is_stale():
+                    response = self.rebuild()
+        return response
+
+    def invalidate(self) -> None:
+        self.response = None
+
+    def _watch(self) -> None:
+        collection = get_mongo_client()[NotificationsDatabase][NotificationListCollection]
+        while not self._stop_event.is_set():
+            try:
+                with collection.watch(max_await_time_ms=1000) as stream:
+                    self.watching = True
+                    self.invalidate()
+                    while not self._stop_event.is_set():
+                        if stream.try_next() is not None:
+                            self.invalidate()
+            except pymongo.errors.OperationFailure:
+                # Change streams need a replica set; fall back to the refresh interval.
+                self.watching = False
+                return
+            except pymongo.errors.PyMongoError as e:
+                self.watching = False
+                print(f"Notification catalog watch error: {e}")
+                self._stop_event.wait(CATALOG_REFRESH_SECONDS)
+        self.watching = False
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        threading.Thread(target=self._watch, name="notification-catalog", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+catalog = NotificationCatalog()
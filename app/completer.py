@@ -1,12 +1,26 @@
 from datetime import datetime
-from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+MonthAbbreviations = ("", "Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+def format_event_timestamp(dateTimeObj: datetime) -> str:
+    # Same output as strftime("%d-%b-%Y (%H:%M:%S.%f)") in an English locale, without the strftime call.
+    return (
+        f"{dateTimeObj.day:02d}-{MonthAbbreviations[dateTimeObj.month]}-{dateTimeObj.year} "
+        f"({dateTimeObj.hour:02d}:{dateTimeObj.minute:02d}:{dateTimeObj.second:02d}.{dateTimeObj.microsecond:06d})"
+    )
 
 def general_completer_user(payload, metadata):
-    encoded_payload = jsonable_encoder(payload)
+    # Payloads are validated pydantic models holding only JSON types, so .dict() gives the same
+    # result as jsonable_encoder without its per-value type dispatch.
+    if isinstance(payload, BaseModel):
+        encoded_payload = payload.dict()
+    else:
+        encoded_payload = dict(payload)
     dateTimeObj = datetime.now()
 
     encoded_payload["event_initiator_role"] = metadata["role"]
     encoded_payload["event_initiator_id"] = metadata["user_id"]
     encoded_payload["site_id"] = metadata["site_id"]
-    encoded_payload["timestamp"] = dateTimeObj.strftime("%d-%b-%Y (%H:%M:%S.%f)")
-    return encoded_payload
\ No newline at end of file
+    encoded_payload["timestamp"] = format_event_timestamp(dateTimeObj)
+    return encoded_payload
@@ -7,5 +7,18 @@ TimezoneListCollection = "TimezoneList"
 ConfigurationListCollection = "ConfigurationsList"
 ParkLoyaltyDatabase = "ParkLoyalty"
 CronInfoCollection = "Crons"
+CronSettingsCollection = "CronSettings"
+CronInfoViewCollection = "CronsView"
+EmailOutboxCollection = "EmailOutbox"
+SchedulerLeaseCollection = "SchedulerLeases"
+DueNotificationsCollection = "DueNotifications"
+AdminJobsCollection = "AdminJobs"
+AdminJobSitesCollection = "AdminJobSites"
+# Shared (STORAGE_MODE=shared) counterparts of the per-site collections, in NotificationsDatabase.
+SharedNotificationListCollection = "SiteNotificationList"
+SharedConfigurationListCollection = "SiteConfigurationsList"
+StorageMigrationsCollection = "StorageMigrations"
+# Reverse index of NotificationList: one document per (notification_name, site_id), in NotificationsDatabase.
+NotificationSitesCollection = "NotificationSites"
 
 NOTIFICATION_SOURCE_EMAIL_ID = "account@email-provider.com"
\ No newline at end of file
@@ -0,0 +1,127 @@
+#============================================================================================
+# CRONTAB EXPRESSIONS.
+# "minute hour day-of-month month day-of-week" with lists, ranges, steps and names, parsed
+# once per distinct string into one integer bitmask per field.
+#============================================================================================
+import datetime
+import functools
+from . import exceptions
+
+MonthNames = {name: idx for idx, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1
+)}
+WeekdayNames = {name: idx for idx, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+Macros = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+DaysInMonth = [0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+# Far enough ahead to reach any satisfiable expression, including Feb 29 on a given weekday.
+MaxSearchDays = 366 * 29
+
+
+def _next_bit(mask: int, start: int):
+    """Lowest set bit of mask at position >= start, or None."""
+    rest = mask >> start
+    if not rest:
+        return None
+    return start + (rest & -rest).bit_length() - 1
+
+
+def _parse_value(value: str, names: dict, expression: str) -> int:
+    value = value.lower()
+    if value in names:
+        return names[value]
+    if not value.isdigit():
+        raise exceptions.InvalidCronExpressionException(expression)
+    return int(value)
+
+
+def _parse_field(field: str, low: int, high: int, names: dict, expression: str) -> int:
+    mask = 0
+    for item in field.split(","):
+        value_range, _, step = item.partition("/")
+        step = int(step) if step.isdigit() else (1 if step == "" else 0)
+        if step <= 0:
+            raise exceptions.InvalidCronExpressionException(expression)
+        if value_range == "*":
+            start, end = low, high
+        elif "-" in value_range:
+            start, end = (_parse_value(value, names, expression) for value in value_range.split("-", 1))
+        else:
+            start = _parse_value(value_range, names, expression)
+            end = high if item != value_range else start
+        if start < low or end > high or start > end:
+            raise exceptions.InvalidCronExpressionException(expression)
+        for value in range(start, end + 1, step):
+            mask |= 1 << value
+    return mask
+
+
+class CrontabExpression():
+    """A parsed crontab expression; get instances through parse_crontab()."""
+    __slots__ = ("expression", "minutes", "hours", "days", "months", "weekdays", "day_or")
+
+    def __init__(self, expression: str) -> None:
+        self.expression = expression
+        fields = Macros.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise exceptions.InvalidCronExpressionException(expression)
+        minute, hour, day, month, weekday = fields
+        self.minutes = _parse_field(minute, 0, 59, {}, expression)
+        self.hours = _parse_field(hour, 0, 23, {}, expression)
+        self.days = _parse_field(day, 1, 31, {}, expression)
+        self.months = _parse_field(month, 1, 12, MonthNames, expression)
+        weekdays = _parse_field(weekday, 0, 7, WeekdayNames, expression)
+        # 7 is an alias for Sunday.
+        self.weekdays = (weekdays | (weekdays >> 7)) & 0x7F
+        # Standard cron: when both day fields are restricted a day matching either one fires.
+        self.day_or = not day.startswith("*") and not weekday.startswith("*")
+        if not self.day_or and weekday.startswith("*") and not any(
+            self.months >> month_idx & 1 and self.days & ((1 << (DaysInMonth[month_idx] + 1)) - 1)
+            for month_idx in range(1, 13)
+        ):
+            raise exceptions.InvalidCronExpressionException(expression)
+
+    def matches_day(self, day: datetime.date) -> bool:
+        if not self.months >> day.month & 1:
+            return False
+        day_match = self.days >> day.day & 1
+        weekday_match = self.weekdays >> ((day.weekday() + 1) % 7) & 1
+        if self.day_or:
+            return bool(day_match or weekday_match)
+        return bool(day_match and weekday_match)
+
+    def matches(self, when: datetime.datetime) -> bool:
+        """True if the expression fires at when's minute (in when's own wall-clock time)."""
+        return bool(self.minutes >> when.minute & 1 and self.hours >> when.hour & 1) and self.matches_day(when)
+
+    def matches_timestamp(self, timestamp: float, tz=None) -> bool:
+        return self.matches(datetime.datetime.fromtimestamp(timestamp, tz or datetime.timezone.utc))
+
+    def iter_local(self, start: datetime.datetime):
+        """Naive local wall times the expression fires at, from start (rounded up to the minute) on."""
+        if start.second or start.microsecond:
+            start = start.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        day, hour, minute = start.date(), start.hour, start.minute
+        for _ in range(MaxSearchDays):
+            if self.matches_day(day):
+                next_hour = _next_bit(self.hours, hour)
+                while next_hour is not None:
+                    next_minute = _next_bit(self.minutes, minute if next_hour == hour else 0)
+                    while next_minute is not None:
+                        yield datetime.datetime.combine(day, datetime.time(next_hour, next_minute))
+                        next_minute = _next_bit(self.minutes, next_minute + 1)
+                    next_hour = _next_bit(self.hours, next_hour + 1)
+            day += datetime.timedelta(days=1)
+            hour = minute = 0
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_crontab(expression: str) -> CrontabExpression:
+    return CrontabExpression(expression)
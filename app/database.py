@@ -1,11 +1,19 @@
 from pymongo import MongoClient
 import datetime
 from .exporter import MONGO_DB_LINK, MONGO_TRANSACTIONAL_DB_LINK
+from . import metrics, slow_queries
+
+# Command listeners shared by every client below.
+_Event_Listeners = metrics.get_mongo_event_listeners() + slow_queries.get_mongo_event_listeners()
 
 # Mongo DB Client
 # Warning: use get_mongo_client method to get client access
-_Mongo_Client = MongoClient(MONGO_DB_LINK)
-_Transactional_Client = MongoClient(MONGO_TRANSACTIONAL_DB_LINK)
+_Mongo_Client = MongoClient(MONGO_DB_LINK, event_listeners=_Event_Listeners)
+_Transactional_Client = MongoClient(MONGO_TRANSACTIONAL_DB_LINK, event_listeners=_Event_Listeners)
+
+# Async Mongo DB Client, created on first use so it binds to the running event loop.
+# Warning: use get_async_mongo_client method to get client access
+_Async_Mongo_Client = None
 
 DATA_MAX_DAYS = 5
 
@@ -32,4 +40,12 @@ def get_mongo_client(collection=None, from_ts=None, real_time_data=None):
            from_ts = from_ts.replace(tzinfo=None)
            if from_ts >= ref_time:
                return _Transactional_Client
-    return _Mongo_Client
\ No newline at end of file
+    return _Mongo_Client
+
+def get_async_mongo_client():
+    global _Async_Mongo_Client
+    if _Async_Mongo_Client is None:
+        # Imported here so the pymongo-only data layer (ASYNC_DATA_LAYER=false) never loads Motor.
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _Async_Mongo_Client = AsyncIOMotorClient(MONGO_DB_LINK, event_listeners=_Event_Listeners)
+    return _Async_Mongo_Client
@@ -1,32 +1,63 @@
 import os
-import sendgrid
-from jinja2 import Environment, FileSystemLoader
-from sendgrid.helpers.mail import *
-from .exporter import SENDGRID_API_KEY
-from . import exceptions
+import time
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from .exporter import EMAIL_TEMPLATE_AUTO_RELOAD, EMAIL_TEMPLATE_BYTECODE_CACHE_DIR
+from . import exceptions, transports, metrics, profiling
+
+
+TEMPLATES_DIR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# Module-level template registry: templates are compiled once and kept for the life of the process.
+# In dev mode (EMAIL_TEMPLATE_AUTO_RELOAD) Jinja re-checks each file's mtime and recompiles only changed ones.
+_template_env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR_PATH),
+    auto_reload=EMAIL_TEMPLATE_AUTO_RELOAD,
+    cache_size=-1,
+    bytecode_cache=FileSystemBytecodeCache(EMAIL_TEMPLATE_BYTECODE_CACHE_DIR) if EMAIL_TEMPLATE_BYTECODE_CACHE_DIR else None,
+)
+
+
+def precompile_email_templates():
+    template_names = _template_env.list_templates(extensions=["html"])
+    for template_name in template_names:
+        _template_env.get_template(template_name)
+    return template_names
 
 
 def render_email_template(template_name, email_body):
-        TEMPLATES_DIR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
-        env = Environment(loader=FileSystemLoader(TEMPLATES_DIR_PATH))
-        template = env.get_template(template_name)
-        return template.render(email_body)
+        with profiling.span("render"):
+            template = _template_env.get_template(template_name)
+            return template.render(email_body)
+
+
+def render_email_templates(template_name, email_bodies):
+    with profiling.span("render"):
+        template = _template_env.get_template(template_name)
+        return [template.render(email_body) for email_body in email_bodies]
 
 
 def write_debug_output(output):
-    TEMPLATES_DIR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
     with open(os.path.join(TEMPLATES_DIR_PATH, 'output.html'), 'w') as fh:
         fh.write(output)
         
 
-def send_email(source_email, email_recepients, email_subject, email_body):
-        sg = sendgrid.SendGridAPIClient(api_key=SENDGRID_API_KEY)
-        from_email = Email(source_email)
-        to_email = []
-        for recepient in email_recepients:
-            to_email.append(To(recepient))
-        subject = email_subject
-        mail = Mail(from_email=from_email, to_emails=to_email, subject=subject, html_content=email_body, is_multiple=True)
-        response = sg.client.mail.send.post(request_body=mail.get())
-        if response.status_code >= 400:
-            raise exceptions.EmailNotSentException()
\ No newline at end of file
+async def _timed_send(operation, send):
+    started_at = time.perf_counter()
+    try:
+        with profiling.span("email_send"):
+            await send
+    except Exception:
+        metrics.EMAIL_SEND_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        metrics.EMAIL_SEND_LATENCY.labels(operation).observe(time.perf_counter() - started_at)
+
+
+async def send_email(source_email, email_recepients, email_subject, email_body):
+        transport = transports.get_email_transport()
+        await _timed_send("send_email", transport.send(transports.OutgoingEmail(source_email, email_recepients, email_subject, email_body)))
+
+
+async def send_emails(messages: list):
+    """Send many transports.OutgoingEmail messages; the transport batches those sharing content."""
+    await _timed_send("send_emails", transports.get_email_transport().send_many(messages))
@@ -56,6 +56,11 @@ class InvalidBeatFreqFormatException(Exception):
         self.message = f"{beat_freq} has an invalid format. Kindly send a valid beat_freq value."
         super().__init__(self.message)
 
+class InvalidCronExpressionException(Exception):
+    def __init__(self, cron_expression) -> None:
+        self.message = f"{cron_expression} is an invalid crontab expression. Kindly send a valid cron_expression value."
+        super().__init__(self.message)
+
 class InvalidNotificationCronEmailMethodException(Exception):
     def __init__(self, method) -> None:
         self.message = f"{method} is an invalid method. Kindly send a valid method."
@@ -65,4 +70,29 @@ class EmailNotSentException(Exception):
     def __init__(self, message) -> None:
         curr_timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
         self.message = f"Could not send Email Successfully. Timestamp: {curr_timestamp}. Error: {message}"
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+class ServiceUnavailableException(Exception):
+    def __init__(self, service_name) -> None:
+        self.message = f"{service_name} is currently unavailable. Kindly try again later."
+        super().__init__(self.message)
+
+class InvalidAdminJobException(Exception):
+    def __init__(self, message) -> None:
+        self.message = message
+        super().__init__(self.message)
+
+class AdminJobDoesNotExistException(Exception):
+    def __init__(self, job_id) -> None:
+        self.message = f"{job_id} is not a valid admin job."
+        super().__init__(self.message)
+
+class InvalidCursorException(Exception):
+    def __init__(self, cursor) -> None:
+        self.message = f"{cursor} is an invalid cursor. Kindly send the cursor returned by the previous page."
+        super().__init__(self.message)
+
+class InvalidPageLimitException(Exception):
+    def __init__(self, limit, max_limit) -> None:
+        self.message = f"{limit} is an invalid limit. Kindly send a limit between 1 and {max_limit}."
+        super().__init__(self.message)
@@ -11,4 +11,125 @@ MONGO_DB_LINK = os.getenv("MONGO_DB_LINK", "DEFAULT_VALUE")
 MONGO_TRANSACTIONAL_DB_LINK = os.getenv("MONGO_TRANSACTIONAL_DB_LINK", "DEFAULT_VALUE")
 
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL", "DEFAULT_VALUE")
-SENDGRID_API_KEY = os.getenv("SENDGRID_CREDENTIAL", "DEFAULT_VALUE")
\ No newline at end of file
+SENDGRID_API_KEY = os.getenv("SENDGRID_CREDENTIAL", "DEFAULT_VALUE")
+
+# AUTH CACHE
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+
+# AUTH CLIENT
+AUTH_CONNECT_TIMEOUT_SECONDS = float(os.getenv("AUTH_CONNECT_TIMEOUT_SECONDS", "1"))
+AUTH_READ_TIMEOUT_SECONDS = float(os.getenv("AUTH_READ_TIMEOUT_SECONDS", "3"))
+AUTH_POOL_MAX_CONNECTIONS = int(os.getenv("AUTH_POOL_MAX_CONNECTIONS", "50"))
+AUTH_BREAKER_FAILURE_THRESHOLD = int(os.getenv("AUTH_BREAKER_FAILURE_THRESHOLD", "5"))
+AUTH_BREAKER_RESET_SECONDS = float(os.getenv("AUTH_BREAKER_RESET_SECONDS", "10"))
+
+# AUTH MODE: "remote" asks the auth module on every request, "local" verifies signed tokens in-process.
+AUTH_MODE = os.getenv("AUTH_MODE", "remote")
+AUTH_JWT_ALGORITHMS = os.getenv("AUTH_JWT_ALGORITHMS", "RS256,ES256").split(",")
+AUTH_JWT_PUBLIC_KEY_PATH = os.getenv("AUTH_JWT_PUBLIC_KEY_PATH", "")
+AUTH_JWKS_URL = os.getenv("AUTH_JWKS_URL", "")
+AUTH_JWKS_REFRESH_SECONDS = float(os.getenv("AUTH_JWKS_REFRESH_SECONDS", "3600"))
+AUTH_JWT_AUDIENCE = os.getenv("AUTH_JWT_AUDIENCE", "")
+AUTH_JWT_ISSUER = os.getenv("AUTH_JWT_ISSUER", "")
+AUTH_REVOCATION_CHECK_SECONDS = float(os.getenv("AUTH_REVOCATION_CHECK_SECONDS", "60"))
+
+# DATA LAYER: "true" awaits the Motor-backed service functions, "false" runs the pymongo ones on the threadpool.
+ASYNC_DATA_LAYER = os.getenv("ASYNC_DATA_LAYER", "false").lower() == "true"
+
+# EMAIL OUTBOX
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "sendgrid")
+# "auto" uses transactions only when the server supports them (replica set or mongos); "true" / "false" force it.
+MONGO_TRANSACTIONS_ENABLED = os.getenv("MONGO_TRANSACTIONS_ENABLED", "auto").lower()
+OUTBOX_DISPATCHER_ENABLED = os.getenv("OUTBOX_DISPATCHER_ENABLED", "true").lower() == "true"
+OUTBOX_MAX_CONCURRENCY = int(os.getenv("OUTBOX_MAX_CONCURRENCY", "4"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "5"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "900"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+
+# EMAIL TEMPLATES
+EMAIL_TEMPLATE_AUTO_RELOAD = os.getenv("EMAIL_TEMPLATE_AUTO_RELOAD", "false").lower() == "true"
+EMAIL_TEMPLATE_BYTECODE_CACHE_DIR = os.getenv("EMAIL_TEMPLATE_BYTECODE_CACHE_DIR", "")
+
+# EMAIL TRANSPORTS: "sendgrid", "smtp", "memory" (kept in-process, for offline use) or "file".
+EMAIL_MAX_CONCURRENT_SENDS = int(os.getenv("EMAIL_MAX_CONCURRENT_SENDS", "8"))
+EMAIL_SEND_TIMEOUT_SECONDS = float(os.getenv("EMAIL_SEND_TIMEOUT_SECONDS", "10"))
+EMAIL_FILE_SINK_DIR = os.getenv("EMAIL_FILE_SINK_DIR", "./email_sink")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "false").lower() == "true"
+# Pooled connections idle longer than this are closed instead of reused (relays drop idle clients).
+SMTP_MAX_IDLE_SECONDS = float(os.getenv("SMTP_MAX_IDLE_SECONDS", "60"))
+
+# SITE DIRECTORY
+SITE_DIRECTORY_ENABLED = os.getenv("SITE_DIRECTORY_ENABLED", "true").lower() == "true"
+SITE_DIRECTORY_MAX_SIZE = int(os.getenv("SITE_DIRECTORY_MAX_SIZE", "50000"))
+SITE_DIRECTORY_POLL_SECONDS = float(os.getenv("SITE_DIRECTORY_POLL_SECONDS", "30"))
+
+# NOTIFICATION CATALOG
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+
+# CRON FORECAST
+FORECAST_RELOAD_SECONDS = float(os.getenv("FORECAST_RELOAD_SECONDS", "60"))
+FORECAST_MAX_MINUTES = int(os.getenv("FORECAST_MAX_MINUTES", "1440"))
+
+# NOTIFICATION SCHEDULER
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "8"))
+SCHEDULER_MAX_PENDING_JOBS = int(os.getenv("SCHEDULER_MAX_PENDING_JOBS", "1000"))
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+SCHEDULER_RELOAD_SECONDS = float(os.getenv("SCHEDULER_RELOAD_SECONDS", "300"))
+SCHEDULER_MISFIRE_GRACE_SECONDS = float(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "300"))
+
+# BULK NOTIFICATIONS
+BULK_MAX_NOTIFICATIONS = int(os.getenv("BULK_MAX_NOTIFICATIONS", "500"))
+
+# ADMIN JOBS
+ADMIN_JOBS_ENABLED = os.getenv("ADMIN_JOBS_ENABLED", "true").lower() == "true"
+ADMIN_JOB_WORKERS = int(os.getenv("ADMIN_JOB_WORKERS", "16"))
+ADMIN_JOB_LEASE_SECONDS = float(os.getenv("ADMIN_JOB_LEASE_SECONDS", "60"))
+ADMIN_JOB_POLL_SECONDS = float(os.getenv("ADMIN_JOB_POLL_SECONDS", "10"))
+
+# LIST PAGINATION
+LIST_PAGE_DEFAULT_LIMIT = int(os.getenv("LIST_PAGE_DEFAULT_LIMIT", "100"))
+LIST_PAGE_MAX_LIMIT = int(os.getenv("LIST_PAGE_MAX_LIMIT", "1000"))
+LIST_CURSOR_BATCH_SIZE = int(os.getenv("LIST_CURSOR_BATCH_SIZE", "500"))
+
+# METRICS
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# REQUEST TIMING AND PROFILING
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+# Requests sending this value in X-Profile-Request are profiled; empty disables the header.
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL_SECONDS = float(os.getenv("PROFILING_INTERVAL_SECONDS", "0.001"))
+PROFILING_OUTPUT_DIR = os.getenv("PROFILING_OUTPUT_DIR", "./profiles")
+
+# SLOW QUERY LOG
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG_ENABLED", "true").lower() == "true"
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_EXPLAIN_ENABLED = os.getenv("SLOW_QUERY_EXPLAIN_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MAX_SHAPES = int(os.getenv("SLOW_QUERY_MAX_SHAPES", "1000"))
+
+# INDEXES
+# Shared-database indexes are ensured in the background on startup; per-site ones via app.manage.
+INDEX_BOOTSTRAP_ON_STARTUP = os.getenv("INDEX_BOOTSTRAP_ON_STARTUP", "true").lower() == "true"
+INDEX_BOOTSTRAP_WORKERS = int(os.getenv("INDEX_BOOTSTRAP_WORKERS", "8"))
+
+# STORAGE MODE
+# per_site: one database per site (the original layout).
+# dual: sites are copied into the shared collections on first write (or by app.manage
+#       migrate_storage); unmigrated sites are still read from their own database.
+# shared: NotificationList and ConfigurationsList live in shared collections keyed by site_id.
+STORAGE_MODE = os.getenv("STORAGE_MODE", "per_site").lower()
+STORAGE_MIGRATION_WORKERS = int(os.getenv("STORAGE_MIGRATION_WORKERS", "8"))
+
+# NOTIFICATION SITES INDEX
+# Sites reconciled in parallel by app.manage rebuild_notification_sites / check_notification_sites.
+NOTIFICATION_SITES_WORKERS = int(os.getenv("NOTIFICATION_SITES_WORKERS", "8"))
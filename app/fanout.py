@@ -0,0 +1,31 @@
+#============================================================================================
+# BOUNDED FAN-OUT OVER A THREAD POOL.
+# Fleet-wide maintenance (index bootstrap, storage migration, NotificationSites checks) runs
+# one call per site with a bounded number of sites queued, so a 100k-site fleet never holds
+# 100k futures.
+#============================================================================================
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def ForEachBounded(func, items, max_workers: int, thread_name_prefix: str) -> None:
+    """Call func(item) for every item with at most max_workers * 2 calls queued or running.
+
+    items is consumed lazily, so it may be a cursor. The result of every finished call
+    is taken: the first exception raised by func cancels the calls not yet started and
+    is re-raised here once the running ones finish.
+    """
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix) as executor:
+        try:
+            for item in items:
+                if len(in_flight) >= max_workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                in_flight.add(executor.submit(func, item))
+            for future in in_flight:
+                future.result()
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            raise
@@ -0,0 +1,331 @@
+#============================================================================================
+# FLEET-WIDE NEXT-FIRE-TIME FORECAST FOR SITE CRONS.
+#============================================================================================
+import datetime
+import functools
+import itertools
+import math
+import threading
+import time
+import numpy as np
+import pytz
+from .database import get_mongo_client
+from .constants import ParkLoyaltyDatabase, CronSettingsCollection
+from .exporter import FORECAST_RELOAD_SECONDS
+from . import models, crontab
+
+SecondsPerDay = 86400
+MinutesPerDay = 1440
+# Largest UTC offset change at a single transition (Antarctica/Troll); bounds how far
+# out of time order a DST change can put a schedule's slots.
+MaxShiftSeconds = 7200
+# Pads rows with fewer than k fire times (e.g. unsatisfiable crontab expressions).
+NoFireTime = np.iinfo(np.int64).max
+# Transition lookups for every zone share one sorted array keyed on (zone index, UTC second).
+_ZoneKeyShift = 35
+_TimeKeyOffset = 2 ** 33
+_MinTransition = -_TimeKeyOffset
+
+
+@functools.lru_cache(maxsize=None)
+def _zone_transitions(zone_name: str):
+    """UTC transition instants (epoch seconds) and the UTC offset (seconds) in effect from each one."""
+    tz = pytz.timezone(zone_name)
+    transition_times = getattr(tz, "_utc_transition_times", None)
+    if not transition_times:
+        return [_MinTransition], [int(tz.utcoffset(datetime.datetime(2000, 1, 1)).total_seconds())]
+    epoch = datetime.datetime(1970, 1, 1)
+    times = [_MinTransition]
+    times += [int((transition_time - epoch).total_seconds()) for transition_time in transition_times[1:]]
+    offsets = [int(transition_info[0].total_seconds()) for transition_info in tz._transition_info]
+    return times, offsets
+
+
+class ForecastEngine():
+    """Array-backed copy of every site cron setting.
+
+    Each schedule is compiled to (zone, weekday_only, first_minute, step,
+    slots_per_day): a scheduled cron fires once a day at first_minute, a
+    periodic cron fires every `step` minutes from local midnight. Fire times
+    for all schedules are produced in one vectorized pass over local wall
+    times, which are converted back to UTC through each zone's transition
+    table so DST changes are honoured. Crontab schedules do not fit the
+    column model and are expanded row by row from their parsed bitsets.
+    """
+    def __init__(self) -> None:
+        self.cron_types = []
+        self.site_ids = []
+        self.zone_names = []
+        self.zone_idx = np.zeros(0, dtype=np.int64)
+        self.weekday_only = np.zeros(0, dtype=bool)
+        self.first_minute = np.zeros(0, dtype=np.int64)
+        self.step = np.zeros(0, dtype=np.int64)
+        self.slots_per_day = np.zeros(0, dtype=np.int64)
+        self.crontab_rows = {}
+        self._transition_keys = np.zeros(0, dtype=np.int64)
+        self._transition_offsets = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.site_ids)
+
+    def compile(self, cron_settings) -> None:
+        """cron_settings: iterable of (cron_type, site_id, setting) as stored in CronSettings."""
+        zone_lookup = {}
+        cron_types, site_ids, zone_idx, weekday_only, first_minute, step = [], [], [], [], [], []
+        crontab_rows = {}
+        for cron_type, site_id, setting in cron_settings:
+            if "cron_expression" in setting:
+                # The column values are placeholders; these rows are overwritten per entry.
+                crontab_rows[len(site_ids)] = crontab.parse_crontab(setting["cron_expression"])
+                schedule_first_minute, schedule_step = 0, MinutesPerDay
+            elif "beat_time" in setting:
+                hours, minutes = setting["beat_time"].split(":")
+                schedule_first_minute, schedule_step = int(hours) * 60 + int(minutes), MinutesPerDay
+            elif "beat_freq" in setting:
+                schedule_first_minute, schedule_step = 0, int(setting["beat_freq"])
+            else:
+                continue
+            zone_name = setting.get("timezone") or "UTC"
+            if zone_name not in zone_lookup:
+                zone_lookup[zone_name] = len(zone_lookup)
+            cron_types.append(cron_type)
+            site_ids.append(site_id)
+            zone_idx.append(zone_lookup[zone_name])
+            weekday_only.append(setting.get("freq") == models.CronDayFreq.weekday.value)
+            first_minute.append(schedule_first_minute)
+            step.append(schedule_step)
+
+        self.cron_types = cron_types
+        self.site_ids = site_ids
+        self.crontab_rows = crontab_rows
+        self.zone_names = list(zone_lookup)
+        self.zone_idx = np.asarray(zone_idx, dtype=np.int64)
+        self.weekday_only = np.asarray(weekday_only, dtype=bool)
+        self.first_minute = np.asarray(first_minute, dtype=np.int64)
+        self.step = np.asarray(step, dtype=np.int64)
+        self.slots_per_day = -(-(MinutesPerDay - self.first_minute) // self.step)
+
+        transition_keys, transition_offsets = [], []
+        for idx, zone_name in enumerate(self.zone_names):
+            times, offsets = _zone_transitions(zone_name)
+            transition_keys.append((np.int64(idx) << _ZoneKeyShift) + np.asarray(times, dtype=np.int64) + _TimeKeyOffset)
+            transition_offsets.append(np.asarray(offsets, dtype=np.int64))
+        self._transition_keys = np.concatenate(transition_keys) if transition_keys else np.zeros(0, dtype=np.int64)
+        self._transition_offsets = np.concatenate(transition_offsets) if transition_offsets else np.zeros(0, dtype=np.int64)
+
+    def utc_offsets(self, zone_idx, utc_seconds):
+        """UTC offset in seconds for each (zone, UTC instant) pair."""
+        keys = (zone_idx << _ZoneKeyShift) + utc_seconds + _TimeKeyOffset
+        return self._transition_offsets[np.searchsorted(self._transition_keys, keys, side="right") - 1]
+
+    def local_to_utc(self, zone_idx, local_seconds):
+        """Wall time -> UTC the way pytz localize(is_dst=False) + normalize resolves it.
+
+        A repeated wall time (clocks going back) is its second, standard-time
+        occurrence; a skipped one (clocks going forward) is read with the offset
+        from before the change, which lands after the transition (02:30 on a
+        spring-forward night in New York is 07:30Z, i.e. 03:30 EDT).
+        """
+        offset_before = self.utc_offsets(zone_idx, local_seconds - SecondsPerDay)
+        offset_after = self.utc_offsets(zone_idx, local_seconds + SecondsPerDay)
+        after = local_seconds - offset_after
+        return np.where(self.utc_offsets(zone_idx, after) == offset_after, after, local_seconds - offset_before)
+
+    def _zone_offsets_at(self, rows, instant: int):
+        zone_idx = self.zone_idx[rows]
+        return self.utc_offsets(zone_idx, np.full(len(zone_idx), instant, dtype=np.int64))
+
+    def _local_start(self, now: int, until: int, rows):
+        """The earliest wall time whose slot can fire in [now, until].
+
+        Earlier than now's own wall time when clocks go back before until, or went
+        forward less than MaxShiftSeconds ago (skipped wall times resolve to just
+        after the transition). Slots before now are dropped afterwards.
+        """
+        offsets = np.minimum(self._zone_offsets_at(rows, now - MaxShiftSeconds), self._zone_offsets_at(rows, now))
+        return now + np.minimum(offsets, self._zone_offsets_at(rows, until))
+
+    def _crontab_local_fires(self, row: int, local_start: int):
+        start = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=int(local_start))
+        epoch = datetime.datetime(1970, 1, 1)
+        for local_fire in self.crontab_rows[row].iter_local(start):
+            yield int((local_fire - epoch).total_seconds())
+
+    def _crontab_fire_times(self, row: int, local_seconds: list):
+        local_seconds = np.asarray(local_seconds, dtype=np.int64)
+        return self.local_to_utc(np.full(len(local_seconds), self.zone_idx[row], dtype=np.int64), local_seconds)
+
+    def _crontab_next_fire_times(self, row: int, local_start: int, now: int, k: int, local_end: int = None) -> list:
+        """The first k fire times at or after now from wall times starting at local_start (and,
+        if given, not after local_end), sorted and de-duplicated; see _sorted_fire_times."""
+        local_fires = self._crontab_local_fires(row, local_start)
+        if local_end is not None:
+            local_fires = itertools.takewhile(lambda local_fire: local_fire <= local_end, local_fires)
+        fires = set()
+        while True:
+            chunk = list(itertools.islice(local_fires, k + 16))
+            if not chunk:
+                return sorted(fires)[:k]
+            fire_times = self._crontab_fire_times(row, chunk).tolist()
+            fires.update(fire_at for fire_at in fire_times if fire_at >= now)
+            settled = sorted(fire_at for fire_at in fires if fire_at <= fire_times[-1] - MaxShiftSeconds)
+            if len(settled) >= k:
+                return settled[:k]
+
+    def next_fire_times(self, now: float, k: int, rows=None):
+        """The next k fire times (UTC epoch seconds, shape (n, k)) at or after now for every schedule,
+        or only for the given row indices. Each row is strictly increasing; rows with fewer than k
+        fire times are padded with NoFireTime."""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return np.zeros((0, k), dtype=np.int64)
+        now = int(math.ceil(now))
+        local_start = self._local_start(now, now + MaxShiftSeconds, rows)
+        fire_times = self._column_fire_times(local_start, now, k, rows)
+        if self.crontab_rows:
+            for position, row in enumerate(rows.tolist()):
+                if row not in self.crontab_rows:
+                    continue
+                fires = self._crontab_next_fire_times(row, int(local_start[position]), now, k)
+                fire_times[position] = NoFireTime
+                fire_times[position, :len(fires)] = fires
+        return fire_times
+
+    def _column_slot_times(self, local_start, width: int, rows):
+        """UTC instants of the first `width` slots at or after local_start, shape (n, width).
+
+        Not in time order across a DST change: see _sorted_fire_times.
+        """
+        zone_idx, weekday_only = self.zone_idx[rows], self.weekday_only[rows]
+        first_minute, step, slots_per_day = self.first_minute[rows], self.step[rows], self.slots_per_day[rows]
+        day_start = local_start // SecondsPerDay * SecondsPerDay
+        minute_now = -(-(local_start - day_start) // 60)
+        start_slot = np.maximum(-(-(minute_now - first_minute) // step), 0)
+
+        # Nothing left today: start from the first slot of tomorrow.
+        past_today = start_slot >= slots_per_day
+        day_start = np.where(past_today, day_start + SecondsPerDay, day_start)
+        start_slot = np.where(past_today, 0, start_slot)
+
+        # Weekday-only schedules that start on a weekend move to Monday's first slot (1970-01-01 was a Thursday).
+        weekday = (day_start // SecondsPerDay + 3) % 7
+        on_weekend = weekday_only & (weekday >= 5)
+        day_start = np.where(on_weekend, day_start + (7 - weekday) * SecondsPerDay, day_start)
+        start_slot = np.where(on_weekend, 0, start_slot)
+        weekday = np.where(on_weekend, 0, weekday)
+
+        slot = start_slot[:, None] + np.arange(width, dtype=np.int64)[None, :]
+        day_number = slot // slots_per_day[:, None]
+        slot_in_day = slot % slots_per_day[:, None]
+        # The n-th business day after a weekday w is n + 2 * ((w + n) // 5) calendar days later.
+        business_days = day_number + 2 * ((weekday[:, None] + day_number) // 5)
+        calendar_days = np.where(weekday_only[:, None], business_days, day_number)
+
+        local_fire = day_start[:, None] + calendar_days * SecondsPerDay + (first_minute[:, None] + slot_in_day * step[:, None]) * 60
+        return self.local_to_utc(np.broadcast_to(zone_idx[:, None], local_fire.shape), local_fire)
+
+    def _transition_counts(self, zone_idx, start, end):
+        """Number of offset changes in (start, end] for each (zone, UTC interval)."""
+        keys = (zone_idx << _ZoneKeyShift) + _TimeKeyOffset
+        return np.searchsorted(self._transition_keys, keys + end, side="right") - np.searchsorted(self._transition_keys, keys + start, side="right")
+
+    @staticmethod
+    def _sorted_fire_times(fire_times, mask):
+        """Each row's fire times where mask holds, sorted and de-duplicated, padded with NoFireTime.
+
+        Across a DST change slots are not in time order: wall times skipped by a
+        forward shift resolve to instants among (or equal to) those of the hour
+        after it, and slots before local now can precede now.
+        """
+        fire_times = np.sort(np.where(mask, fire_times, NoFireTime), axis=1, kind="stable")
+        duplicate = fire_times[:, 1:] == fire_times[:, :-1]
+        fire_times[:, 1:][duplicate] = NoFireTime
+        return np.sort(fire_times, axis=1, kind="stable")
+
+    def _column_fire_times(self, local_start, now: int, k: int, rows):
+        fire_times = np.full((len(rows), k), NoFireTime, dtype=np.int64)
+        pending = np.arange(len(rows))
+        width = k
+        while len(pending):
+            slot_times = self._column_slot_times(local_start[pending], width, rows[pending])
+            # Slots past the generated width are later than the last one, or, near a DST
+            # change, at most MaxShiftSeconds earlier; anything below that is settled.
+            last_slot = slot_times[:, -1]
+            near_transition = self._transition_counts(self.zone_idx[rows[pending]], slot_times[:, 0] - MaxShiftSeconds, last_slot) > 0
+            settled_until = np.where(near_transition, last_slot - MaxShiftSeconds, last_slot)
+            sorted_times = self._sorted_fire_times(slot_times, (slot_times >= now) & (slot_times <= settled_until[:, None]))[:, :k]
+            if sorted_times.shape[1] < k:
+                sorted_times = np.pad(sorted_times, ((0, 0), (0, k - sorted_times.shape[1])), constant_values=NoFireTime)
+            fire_times[pending] = sorted_times
+            # Rows that lost slots to the DST change are recomputed, wider.
+            pending = pending[sorted_times[:, -1] == NoFireTime]
+            width *= 2
+        return fire_times
+
+    def fires_within(self, now: float, minutes: int) -> list:
+        """Every (cron_type, site_id, fire_at) firing in [now, now + minutes]."""
+        if len(self) == 0:
+            return []
+        now = int(math.ceil(now))
+        window_end = now + minutes * 60
+        all_rows = np.arange(len(self))
+        local_start = self._local_start(now, window_end, all_rows)
+        local_end = window_end + np.maximum(self._zone_offsets_at(all_rows, now), self._zone_offsets_at(all_rows, window_end))
+        column_rows = np.ones(len(self), dtype=bool)
+        column_rows[list(self.crontab_rows)] = False
+        column_rows = np.nonzero(column_rows)[0]
+        fires = []
+        if len(column_rows):
+            # Enough slots to cover the window's wall-clock span, which a DST change can
+            # stretch by an hour, plus one per day boundary for steps that do not divide a day.
+            span_minutes = (local_end[column_rows] - local_start[column_rows]) // 60
+            k = int((span_minutes // self.step[column_rows] + span_minutes // MinutesPerDay + 2).max())
+            fire_times = self._column_slot_times(local_start[column_rows], k, column_rows)
+            fire_times = self._sorted_fire_times(fire_times, (fire_times >= now) & (fire_times <= window_end))
+            positions, cols = np.nonzero(fire_times != NoFireTime)
+            fires = [
+                (self.cron_types[row], self.site_ids[row], int(fire_times[position, col]))
+                for row, position, col in zip(column_rows[positions].tolist(), positions.tolist(), cols.tolist())
+            ]
+        for row in self.crontab_rows:
+            # Bounded by local_end, so every fire in the window is returned.
+            for fire_at in self._crontab_next_fire_times(row, int(local_start[row]), now, MinutesPerDay * 366, int(local_end[row])):
+                if fire_at <= window_end:
+                    fires.append((self.cron_types[row], self.site_ids[row], fire_at))
+        return fires
+
+
+_engine = None
+_engine_loaded_at = 0.0
+_engine_lock = threading.Lock()
+
+def LoadForecastEngine() -> ForecastEngine:
+    collection = get_mongo_client()[ParkLoyaltyDatabase][CronSettingsCollection]
+    cron_setting_docs = collection.find(models.ActiveCronSettingFilter, {"_id": 0, "cron_type": 1, "site_id": 1, "setting": 1})
+    engine = ForecastEngine()
+    engine.compile(
+        (cron_setting_doc["cron_type"], cron_setting_doc["site_id"], cron_setting_doc.get("setting", {}))
+        for cron_setting_doc in cron_setting_docs
+    )
+    return engine
+
+def GetForecastEngine() -> ForecastEngine:
+    global _engine, _engine_loaded_at
+    with _engine_lock:
+        if _engine is None or time.monotonic() - _engine_loaded_at >= FORECAST_RELOAD_SECONDS:
+            _engine = LoadForecastEngine()
+            _engine_loaded_at = time.monotonic()
+        return _engine
+
+def GetNotificationForecast(minutes: int) -> list:
+    cron_notification_names = models.get_cron_notification_names()
+    forecast = []
+    for cron_type, site_id, fire_at in GetForecastEngine().fires_within(time.time(), minutes):
+        forecast.append({
+            "site_id": site_id,
+            "notification_name": cron_notification_names.get(cron_type),
+            "cron_type": cron_type,
+            "fire_at": datetime.datetime.utcfromtimestamp(fire_at).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+    forecast.sort(key=lambda entry: (entry["fire_at"], entry["site_id"]))
+    return forecast
@@ -0,0 +1,233 @@
+#============================================================================================
+# INDEX MANIFEST.
+# Every index this service relies on, created idempotently at startup (shared databases) or
+# from `python -m app.manage ensure_indexes` (shared and per-site databases). verify_indexes
+# explains the queries the service runs and reports any that fall back to a collection scan.
+#============================================================================================
+import threading
+import pymongo
+from .database import get_mongo_client
+from .constants import *
+from .exporter import INDEX_BOOTSTRAP_WORKERS
+from . import models, service, slow_queries, storage, notification_sites, fanout
+
+ASC = pymongo.ASCENDING
+DESC = pymongo.DESCENDING
+
+# Stands in for the database name of index specs that apply to every site database.
+SiteDatabase = None
+
+IndexCreated = "created"
+IndexExists = "exists"
+IndexFailed = "failed"
+
+
+class IndexSpec():
+    __slots__ = ("database", "collection", "keys", "options")
+
+    def __init__(self, database, collection: str, keys: list, **options) -> None:
+        self.database = database
+        self.collection = collection
+        self.keys = keys
+        self.options = options
+
+    def to_index_model(self) -> pymongo.IndexModel:
+        # No explicit names: the default names match the indexes created lazily elsewhere.
+        return pymongo.IndexModel(self.keys, **self.options)
+
+
+IndexManifest = [
+    # Shared databases.
+    IndexSpec(NotificationsDatabase, NotificationListCollection, [("notification_name", ASC)]),
+    IndexSpec(NotificationsDatabase, EmailCollection, [("type", ASC)]),
+    IndexSpec(NotificationsDatabase, TimezoneListCollection, [("timezone", ASC)], unique=True),
+    IndexSpec(SitesDatabase, SiteListCollection, [("site_id", ASC), ("enable", ASC)]),
+    IndexSpec(SitesDatabase, SiteListCollection, [("updated_at", DESC)]),
+    IndexSpec(ParkLoyaltyDatabase, CronInfoCollection, [("cron_type", ASC)]),
+    IndexSpec(ParkLoyaltyDatabase, CronInfoCollection, [("sites", ASC)]),
+    IndexSpec(ParkLoyaltyDatabase, CronSettingsCollection, [("cron_type", ASC), ("site_id", ASC)], unique=True),
+    IndexSpec(ParkLoyaltyDatabase, EmailOutboxCollection, [("status", ASC), ("next_attempt_at", ASC)]),
+    IndexSpec(ParkLoyaltyDatabase, EmailOutboxCollection, [("status", ASC), ("locked_until", ASC)]),
+    IndexSpec(ParkLoyaltyDatabase, DueNotificationsCollection, [("cron_type", ASC), ("site_id", ASC), ("fire_at", ASC)], unique=True),
+    IndexSpec(ParkLoyaltyDatabase, AdminJobsCollection, [("status", ASC), ("created_at", ASC)]),
+    IndexSpec(ParkLoyaltyDatabase, AdminJobSitesCollection, [("job_id", ASC), ("site_id", ASC)], unique=True),
+    IndexSpec(ParkLoyaltyDatabase, AdminJobSitesCollection, [("job_id", ASC), ("status", ASC)]),
+    IndexSpec(NotificationsDatabase, SharedNotificationListCollection, [("site_id", ASC), ("entity_type", ASC)], unique=True),
+    IndexSpec(NotificationsDatabase, SharedNotificationListCollection, [("site_id", ASC), ("entity_type", ASC), ("entity_details.notification_name", ASC)]),
+    IndexSpec(NotificationsDatabase, SharedNotificationListCollection, [("entity_details.notification_name", ASC)]),
+    IndexSpec(NotificationsDatabase, SharedConfigurationListCollection, [("site_id", ASC), ("config_type", ASC)], unique=True),
+    IndexSpec(NotificationsDatabase, NotificationSitesCollection, [("notification_name", ASC), ("site_id", ASC)], unique=True),
+    IndexSpec(NotificationsDatabase, NotificationSitesCollection, [("site_id", ASC)]),
+    # Every site database.
+    IndexSpec(SiteDatabase, NotificationListCollection, [("entity_type", ASC)], unique=True),
+    IndexSpec(SiteDatabase, NotificationListCollection, [("entity_type", ASC), ("entity_details.notification_name", ASC)]),
+    IndexSpec(SiteDatabase, ConfigurationListCollection, [("config_type", ASC)]),
+]
+
+
+def GetManifest(per_site: bool = None) -> dict:
+    """Manifest entries grouped by (database, collection); per_site selects site or shared specs."""
+    grouped = {}
+    for spec in IndexManifest:
+        if per_site is not None and (spec.database is SiteDatabase) != per_site:
+            continue
+        grouped.setdefault((spec.database, spec.collection), []).append(spec)
+    return grouped
+
+def EnsureCollectionIndexes(database_name: str, collection_name: str, specs: list) -> dict:
+    collection = get_mongo_client()[database_name][collection_name]
+    result = {"database": database_name, "collection": collection_name, "status": IndexExists, "indexes": [], "error": None}
+    try:
+        existing_names = set(collection.index_information())
+        index_names = collection.create_indexes([spec.to_index_model() for spec in specs])
+    except pymongo.errors.PyMongoError as e:
+        # Usually an existing index with the same keys and different options; left for an operator.
+        result["status"], result["error"] = IndexFailed, str(e)
+        return result
+    result["indexes"] = index_names
+    if set(index_names) - existing_names:
+        result["status"] = IndexCreated
+    return result
+
+def EnsureSharedIndexes() -> list:
+    return [
+        EnsureCollectionIndexes(database_name, collection_name, specs)
+        for (database_name, collection_name), specs in GetManifest(per_site=False).items()
+    ]
+
+def EnsureSiteIndexes(site_id: str) -> list:
+    return [
+        EnsureCollectionIndexes(site_id, collection_name, specs)
+        for (_, collection_name), specs in GetManifest(per_site=True).items()
+    ]
+
+def PrintIndexResults(results: list) -> None:
+    for result in results:
+        if result["status"] == IndexFailed:
+            print(f"Index bootstrap failed on {result['database']}.{result['collection']}: {result['error']}")
+        elif result["status"] == IndexCreated:
+            print(f"Index bootstrap created {', '.join(result['indexes'])} on {result['database']}.{result['collection']}")
+
+def StartSharedIndexBootstrap() -> None:
+    """Ensure the shared-database indexes on a background thread so startup never waits on Mongo."""
+    def bootstrap():
+        try:
+            PrintIndexResults(EnsureSharedIndexes())
+        except pymongo.errors.PyMongoError as e:
+            print(f"Index bootstrap error: {e}")
+    threading.Thread(target=bootstrap, name="index-bootstrap", daemon=True).start()
+
+def GetFleetSiteIds(existing_only: bool = True) -> list:
+    """Every site_id in Site.sites; with existing_only, only sites that already have a database."""
+    collection = get_mongo_client()[SitesDatabase][SiteListCollection]
+    site_ids = [site_doc["site_id"] for site_doc in collection.find({}, {"_id": 0, "site_id": 1}) if site_doc.get("site_id")]
+    if existing_only:
+        database_names = set(get_mongo_client().list_database_names())
+        site_ids = [site_id for site_id in site_ids if site_id in database_names]
+    return site_ids
+
+def EnsureFleetIndexes(site_ids: list = None, max_workers: int = INDEX_BOOTSTRAP_WORKERS, on_site=None) -> list:
+    """EnsureSiteIndexes for every site with at most max_workers sites in flight.
+
+    on_site(site_id, results) is called as each site finishes; the failed results are returned.
+    """
+    site_ids = GetFleetSiteIds() if site_ids is None else site_ids
+    failures = []
+
+    def ensure_site(site_id):
+        results = EnsureSiteIndexes(site_id)
+        failures.extend(result for result in results if result["status"] == IndexFailed)
+        if on_site is not None:
+            on_site(site_id, results)
+
+    fanout.ForEachBounded(ensure_site, site_ids, max_workers, "ensure-indexes")
+    return failures
+
+
+#============================================================================================
+# QUERY VERIFICATION.
+#============================================================================================
+def _site_notification(site_id: str):
+    notification_name = models.get_valid_notifications()[0]
+    return models.get_notification_class(notification_name)(site_id=site_id)
+
+def GetQueryChecks(site_id: str) -> list:
+    """(query name, database, collection, explain command) for every filtered query the service runs.
+
+    Whole-collection reads (the catalog, the timezone list, the migration) are
+    collection scans by design and are left out.
+    """
+    # Per-site queries are checked against wherever STORAGE_MODE currently keeps the site.
+    notification_collection, site_filter = storage.GetSiteCollection(site_id, NotificationListCollection)
+    configuration_collection, _ = storage.GetSiteCollection(site_id, ConfigurationListCollection)
+    notification_list = (notification_collection.database.name, notification_collection.name)
+    configuration_list = (configuration_collection.database.name, configuration_collection.name)
+    notification = _site_notification(site_id)
+    notification_cron_name = next(iter(models.get_cron_notification_names()), "")
+    return [
+        ("SiteNotification.GetNotificationInfo / UpdateNotification / DeleteNotification", *notification_list,
+            {"find": notification_list[1], "filter": notification.NotificationListFilter(True, site_filter), "limit": 1}),
+        ("SiteNotification.CreateNotification", *notification_list,
+            {"find": notification_list[1], "filter": notification.NotificationListFilter(False, site_filter), "limit": 1}),
+        ("service.GetSiteNotificationListPage / GetSiteNotificationNames", *notification_list,
+            {"find": notification_list[1], "filter": {**site_filter, "entity_type": "NotificationList"}, "limit": 1}),
+        ("service.IterSiteNotificationList", *notification_list,
+            {"aggregate": notification_list[1], "pipeline": service.SiteNotificationListPipeline(0, 1, site_filter), "cursor": {}}),
+        ("service.GetEnforcementHours / SetEnforcementHours / DeleteEnforcementHours", *configuration_list,
+            {"find": configuration_list[1], "filter": {**site_filter, "config_type": "enforcement_hours"}, "limit": 1}),
+        ("service.GetNotificationCronInfo / SetNotificationCronInfo / DeleteNotificationCronInfo", ParkLoyaltyDatabase, CronSettingsCollection,
+            {"find": CronSettingsCollection, "filter": {"cron_type": notification_cron_name, "site_id": site_id}, "limit": 1}),
+        ("service.GetCronInfoView", ParkLoyaltyDatabase, CronSettingsCollection,
+            {"aggregate": CronSettingsCollection, "pipeline": [{"$match": {"cron_type": notification_cron_name}}] + service.CronInfoViewPipeline, "cursor": {}}),
+        ("service.GetNotificationListPage", NotificationsDatabase, NotificationListCollection,
+            {"find": NotificationListCollection, "filter": service.NotificationListQuery({}, None), "sort": {"_id": 1}, "limit": 1}),
+        ("service.GetNotificationSitesPage / IterNotificationSites", NotificationsDatabase, NotificationSitesCollection,
+            {"find": NotificationSitesCollection, "filter": notification_sites.NotificationSitesQuery(notification.notification_name, site_id), "sort": {"site_id": 1}, "limit": 1}),
+        ("notification_sites.CheckSite / SyncSite", NotificationsDatabase, NotificationSitesCollection,
+            {"find": NotificationSitesCollection, "filter": {"site_id": site_id}}),
+        ("service.SetTimezoneList", NotificationsDatabase, TimezoneListCollection,
+            {"find": TimezoneListCollection, "filter": {"timezone": "UTC"}, "limit": 1}),
+        ("notify.NotificationCronEmail.get_email_recepients", NotificationsDatabase, EmailCollection,
+            {"find": EmailCollection, "filter": {"type": "ITSupportTeam"}, "limit": 1}),
+        ("sites.SiteDirectory.get", SitesDatabase, SiteListCollection,
+            {"find": SiteListCollection, "filter": {"site_id": site_id}, "limit": 1}),
+        ("sites.SiteDirectory.load", SitesDatabase, SiteListCollection,
+            {"find": SiteListCollection, "filter": {}, "sort": {"updated_at": -1}, "limit": 1}),
+    ]
+
+# Stands in for a site_id in query filters when the fleet has no site to explain against.
+VerifySampleSiteId = "verify_indexes_sample_site"
+
+def VerifyIndexes(site_id: str = None) -> list:
+    """Explain every query check (against site_id, or the first site) and summarize its plan.
+
+    With no site_id, shared storage can use any site in Site.sites, while per-site
+    storage needs one that has a database. If there is none, the per-site checks
+    are reported as unknown and the rest run with a sample site_id.
+    """
+    no_site = False
+    if site_id is None:
+        site_ids = GetFleetSiteIds(existing_only=storage.GetStorageMode() != storage.StorageModeShared)
+        no_site = not site_ids
+        site_id = VerifySampleSiteId if no_site else site_ids[0]
+    report = []
+    for query_name, database_name, collection_name, command in GetQueryChecks(site_id):
+        entry = {"query": query_name, "database": database_name, "collection": collection_name}
+        if no_site and database_name == site_id:
+            entry.update({"uses_index": None, "stages": [], "indexes": [], "error": "No site database to explain against; pass --site-id."})
+            report.append(entry)
+            continue
+        try:
+            explain_doc = get_mongo_client()[database_name].command({"explain": command, "verbosity": "queryPlanner"})
+        except pymongo.errors.PyMongoError as e:
+            entry.update({"uses_index": False, "stages": [], "indexes": [], "error": str(e)})
+            report.append(entry)
+            continue
+        plan = slow_queries.summarize_plan(explain_doc)
+        uses_index = not plan["collscan"] and bool(plan["indexes"])
+        if plan["stages"] == ["EOF"]:
+            # A missing collection explains as EOF, which says nothing about its indexes.
+            uses_index = None
+        entry.update({"uses_index": uses_index, "stages": plan["stages"], "indexes": plan["indexes"], "error": None})
+        report.append(entry)
+    return report
@@ -0,0 +1,280 @@
+#============================================================================================
+# CROSS-SITE ADMIN JOBS.
+# One notification or cron change fanned out to many site databases by a bounded worker
+# pool. Every selected site has its own row in AdminJobSites, so that table is both the
+# progress report and the checkpoint a restarted process resumes from.
+#============================================================================================
+import datetime
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import pymongo
+from .database import get_mongo_client
+from .constants import ParkLoyaltyDatabase, SitesDatabase, SiteListCollection, AdminJobsCollection, AdminJobSitesCollection
+from .exporter import ADMIN_JOB_WORKERS, ADMIN_JOB_LEASE_SECONDS, ADMIN_JOB_POLL_SECONDS
+from . import exceptions, models, service, utils
+
+JobStatusPending = "pending"
+JobStatusRunning = "running"
+JobStatusCompleted = "completed"
+JobStatusCancelled = "cancelled"
+
+SiteStatusPending = "pending"
+SiteStatusSucceeded = "succeeded"
+SiteStatusFailed = "failed"
+SiteStatusSkipped = "skipped"
+
+# AdminJobRunner.renew results.
+LeaseRenewed = "renewed"
+LeaseCancelRequested = "cancel_requested"
+LeaseLost = "lost"
+
+def _validate_notification(payload: dict) -> None:
+    models.get_notification_class(payload.get("notification_name", ""))
+
+def _validate_cron_setting(payload: dict) -> None:
+    service.BuildNotificationCronSetting(payload)
+
+def _validate_cron_delete(payload: dict) -> None:
+    notification_name = payload.get("notification_name", "")
+    if not models.get_notification_class(notification_name).isCronConfigurable:
+        raise exceptions.NotConfigurableNotificationsCronsException(notification_name)
+
+# action -> (service function applied per site, validator run once when the job is created)
+JobActions = {
+    "create_notification": (service.CreateNotification, _validate_notification),
+    "update_notification": (service.UpdateNotification, _validate_notification),
+    "delete_notification": (service.DeleteNotification, _validate_notification),
+    "set_notification_cron_info": (service.SetNotificationCronInfo, _validate_cron_setting),
+    "delete_notification_cron_info": (service.DeleteNotificationCronInfo, _validate_cron_delete),
+}
+
+
+def GetJobsCollection():
+    return get_mongo_client()[ParkLoyaltyDatabase][AdminJobsCollection]
+
+def GetJobSitesCollection():
+    return get_mongo_client()[ParkLoyaltyDatabase][AdminJobSitesCollection]
+
+def ResolveSiteSelector(site_ids: list = None, site_query: dict = None) -> list:
+    if site_ids:
+        return list(dict.fromkeys(site_ids))
+    if site_query is None:
+        raise exceptions.InvalidAdminJobException("Either site_ids or site_query must be given.")
+    collection = get_mongo_client()[SitesDatabase][SiteListCollection]
+    return [site_doc["site_id"] for site_doc in collection.find(site_query, {"_id": 0, "site_id": 1}) if site_doc.get("site_id")]
+
+def CreateJob(payload: dict) -> dict:
+    """Validate the action and payload, resolve the sites and record one pending row per site."""
+    action = payload.get("action")
+    if action not in JobActions:
+        raise exceptions.InvalidAdminJobException(f"{action} is not a valid admin job action.")
+    action_payload = payload.get("payload", {})
+    JobActions[action][1](action_payload)
+    site_ids = ResolveSiteSelector(payload.get("site_ids"), payload.get("site_query"))
+    if not site_ids:
+        raise exceptions.InvalidAdminJobException("The site selector matched no sites.")
+
+    job_id = uuid.uuid4().hex
+    now = datetime.datetime.utcnow()
+    site_collection = GetJobSitesCollection()
+    site_collection.create_index([("job_id", pymongo.ASCENDING), ("site_id", pymongo.ASCENDING)], unique=True)
+    site_collection.create_index([("job_id", pymongo.ASCENDING), ("status", pymongo.ASCENDING)])
+    for batch_start in range(0, len(site_ids), 1000):
+        site_collection.insert_many([
+            {"job_id": job_id, "site_id": site_id, "status": SiteStatusPending, "error": None, "updated_at": now}
+            for site_id in site_ids[batch_start:batch_start + 1000]
+        ], ordered=False)
+    job = {
+        "_id": job_id,
+        "action": action,
+        "payload": action_payload,
+        "site_query": payload.get("site_query"),
+        "status": JobStatusPending,
+        "cancel_requested": False,
+        "total": len(site_ids),
+        "succeeded": 0,
+        "failed": 0,
+        "skipped": 0,
+        "created_by": payload.get("event_initiator_id"),
+        "created_at": now,
+        "owner": None,
+        "lease_until": None,
+    }
+    # The job document goes in last so a runner never claims a job whose site rows are incomplete.
+    GetJobsCollection().insert_one(job)
+    runner.wake()
+    return FormatJob(job)
+
+def FormatJob(job: dict) -> dict:
+    job = dict(job)
+    job["job_id"] = job.pop("_id")
+    job.pop("owner", None)
+    job.pop("lease_until", None)
+    job["completed"] = job["succeeded"] + job["failed"] + job["skipped"]
+    job["progress"] = round(job["completed"] / job["total"], 4) if job["total"] else 1.0
+    return job
+
+def GetJob(job_id: str) -> dict:
+    job = GetJobsCollection().find_one({"_id": job_id})
+    if job is None:
+        raise exceptions.AdminJobDoesNotExistException(job_id)
+    return FormatJob(job)
+
+def GetJobSites(job_id: str, status: str = None, skip: int = 0, limit: int = 100) -> list:
+    GetJob(job_id)
+    site_filter = {"job_id": job_id}
+    if status is not None:
+        site_filter["status"] = status
+    site_docs = GetJobSitesCollection().find(site_filter, {"_id": 0, "job_id": 0}).sort("site_id", pymongo.ASCENDING).skip(skip).limit(limit)
+    return list(site_docs)
+
+def CancelJob(job_id: str) -> dict:
+    result = GetJobsCollection().update_one(
+        {"_id": job_id, "status": {"$in": [JobStatusPending, JobStatusRunning]}},
+        {"$set": {"cancel_requested": True}}
+    )
+    if result.matched_count == 0:
+        GetJob(job_id)
+    return GetJob(job_id)
+
+
+class AdminJobRunner():
+    """Claims admin jobs one at a time and fans each out over a thread pool.
+
+    A claimed job is leased for ADMIN_JOB_LEASE_SECONDS and the lease is renewed
+    while it runs. A job whose owner died is reclaimed by any instance once the
+    lease lapses, and only its still-pending site rows are processed.
+    """
+    def __init__(self, max_workers: int = ADMIN_JOB_WORKERS) -> None:
+        self.max_workers = max_workers
+        self.owner = uuid.uuid4().hex
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+
+    def wake(self) -> None:
+        self._wake_event.set()
+
+    def claim_next(self):
+        now = datetime.datetime.utcnow()
+        return GetJobsCollection().find_one_and_update(
+            {
+                "status": {"$in": [JobStatusPending, JobStatusRunning]},
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+            },
+            {"$set": {
+                "status": JobStatusRunning,
+                "owner": self.owner,
+                "lease_until": now + datetime.timedelta(seconds=ADMIN_JOB_LEASE_SECONDS),
+                "started_at": now,
+            }},
+            sort=[("created_at", pymongo.ASCENDING)],
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+
+    def renew(self, job_id: str) -> str:
+        """Extend the lease; returns LeaseRenewed, LeaseCancelRequested (still held) or
+        LeaseLost when another instance took the job over."""
+        job = GetJobsCollection().find_one_and_update(
+            {"_id": job_id, "owner": self.owner},
+            {"$set": {"lease_until": datetime.datetime.utcnow() + datetime.timedelta(seconds=ADMIN_JOB_LEASE_SECONDS)}},
+            {"cancel_requested": 1},
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        if job is None:
+            return LeaseLost
+        return LeaseCancelRequested if job.get("cancel_requested") else LeaseRenewed
+
+    def apply_site(self, job: dict, site_id: str) -> None:
+        action_function = JobActions[job["action"]][0]
+        status, error = SiteStatusSucceeded, None
+        try:
+            if not utils.site_exists(site_id):
+                raise exceptions.SiteDoesNotExistException(site_id)
+            action_function({**job["payload"], "site_id": site_id})
+        except Exception as e:
+            status, error = SiteStatusFailed, str(e)
+        self.record_site(job["_id"], site_id, status, error)
+
+    def record_site(self, job_id: str, site_id: str, status: str, error=None) -> None:
+        # Counters move only on the pending -> done transition, so a resumed job never double counts.
+        result = GetJobSitesCollection().update_one(
+            {"job_id": job_id, "site_id": site_id, "status": SiteStatusPending},
+            {"$set": {"status": status, "error": error, "updated_at": datetime.datetime.utcnow()}}
+        )
+        if result.modified_count:
+            GetJobsCollection().update_one({"_id": job_id}, {"$inc": {status: 1}})
+
+    def run_job(self, job: dict) -> None:
+        job_id = job["_id"]
+        pending_sites = GetJobSitesCollection().find(
+            {"job_id": job_id, "status": SiteStatusPending}, {"_id": 0, "site_id": 1}
+        ).sort("site_id", pymongo.ASCENDING)
+        lease = LeaseCancelRequested if job.get("cancel_requested") else LeaseRenewed
+        renewed_at = time.monotonic()
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="admin-job") as executor:
+            for site_doc in pending_sites:
+                if lease != LeaseRenewed or self._stop_event.is_set():
+                    break
+                if len(in_flight) >= self.max_workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                in_flight.add(executor.submit(self.apply_site, job, site_doc["site_id"]))
+                if time.monotonic() - renewed_at >= ADMIN_JOB_LEASE_SECONDS / 3:
+                    lease = self.renew(job_id)
+                    renewed_at = time.monotonic()
+            if lease == LeaseLost:
+                # The new owner runs whatever is still pending; drop what has not started.
+                for future in in_flight:
+                    future.cancel()
+            for future in wait(in_flight).done:
+                if not future.cancelled():
+                    future.result()
+        if lease != LeaseLost and not self._stop_event.is_set() and self.renew(job_id) == LeaseLost:
+            # Lost while the last sites finished. (A cancel that arrives once every site was
+            # submitted has nothing left to skip, so only a takeover changes the outcome.)
+            lease = LeaseLost
+        if lease == LeaseLost:
+            print(f"Admin job {job_id} was taken over by another instance")
+            return
+        cancelled = lease == LeaseCancelRequested
+        if self._stop_event.is_set() and not cancelled:
+            # Shutting down: release the lease so another instance resumes straight away.
+            GetJobsCollection().update_one({"_id": job_id, "owner": self.owner}, {"$set": {"lease_until": None, "owner": None}})
+            return
+        if cancelled:
+            for site_doc in GetJobSitesCollection().find({"job_id": job_id, "status": SiteStatusPending}, {"_id": 0, "site_id": 1}):
+                self.record_site(job_id, site_doc["site_id"], SiteStatusSkipped, "Job cancelled")
+        GetJobsCollection().update_one(
+            {"_id": job_id, "owner": self.owner},
+            {"$set": {
+                "status": JobStatusCancelled if cancelled else JobStatusCompleted,
+                "finished_at": datetime.datetime.utcnow(),
+                "lease_until": None,
+            }}
+        )
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                job = self.claim_next()
+                if job is not None:
+                    self.run_job(job)
+                    continue
+            except pymongo.errors.PyMongoError as e:
+                print(f"Admin job runner error: {e}")
+            self._wake_event.wait(ADMIN_JOB_POLL_SECONDS)
+            self._wake_event.clear()
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        threading.Thread(target=self._run, name="admin-jobs", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake_event.set()
+
+runner = AdminJobRunner()
@@ -1,8 +1,16 @@
-from fastapi import FastAPI, Header, Request, Depends, status
+from typing import Optional
+from fastapi import FastAPI, Header, Request, Response, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
-from . import service, completer, responses, auth, schemas, exceptions
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+from . import service, async_service, completer, responses, auth, schemas, exceptions, outbox, email, transports, sites, catalog, timezones, forecast, scheduler, jobs, streaming, utils, metrics, profiling, slow_queries, indexes
+from .exporter import ASYNC_DATA_LAYER, OUTBOX_DISPATCHER_ENABLED, SITE_DIRECTORY_ENABLED, FORECAST_MAX_MINUTES, SCHEDULER_ENABLED, BULK_MAX_NOTIFICATIONS, ADMIN_JOBS_ENABLED, SLOW_QUERY_LOG_ENABLED, SLOW_QUERY_EXPLAIN_ENABLED, SLOW_QUERY_THRESHOLD_MS, INDEX_BOOTSTRAP_ON_STARTUP
 
-app = FastAPI()
+# Routes return responses.JSONResponseModel, which orjson renders directly; dicts returned
+# anywhere else still go through jsonable_encoder, then ORJSONResponse.
+app = FastAPI(default_response_class=ORJSONResponse)
+# Every route below is timed under its path template; see metrics.TimedRoute.
+app.router.route_class = metrics.TimedRoute
 
 origins = ["*"]
 
@@ -12,54 +20,142 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[profiling.ServerTimingHeader, profiling.ProfileIdHeader],
 )
+# Outermost, so Server-Timing covers CORS and error handling too.
+app.add_middleware(profiling.RequestTimingMiddleware)
 
 BASE_PREFIX = "/notification-handler"
 
+async def call_service(function_name, *args):
+    # With ASYNC_DATA_LAYER the Motor-backed implementation is awaited on the event loop;
+    # otherwise the blocking pymongo one runs on the threadpool, as it did for plain def routes.
+    with profiling.span("service"):
+        if ASYNC_DATA_LAYER and hasattr(async_service, function_name):
+            return await getattr(async_service, function_name)(*args)
+        return await run_in_threadpool(getattr(service, function_name), *args)
+
+@app.on_event("startup")
+async def startup_event():
+    email.precompile_email_templates()
+    if INDEX_BOOTSTRAP_ON_STARTUP:
+        indexes.StartSharedIndexBootstrap()
+    await run_in_threadpool(timezones.index.build)
+    if SITE_DIRECTORY_ENABLED:
+        sites.directory.start()
+    if OUTBOX_DISPATCHER_ENABLED:
+        outbox.dispatcher.start()
+    catalog.catalog.start()
+    if SCHEDULER_ENABLED:
+        scheduler.scheduler.start()
+    if ADMIN_JOBS_ENABLED:
+        jobs.runner.start()
+    if SLOW_QUERY_LOG_ENABLED and SLOW_QUERY_EXPLAIN_ENABLED:
+        slow_queries.slow_query_log.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    sites.directory.stop()
+    catalog.catalog.stop()
+    if SCHEDULER_ENABLED:
+        scheduler.scheduler.stop()
+    jobs.runner.stop()
+    slow_queries.slow_query_log.stop()
+    await outbox.dispatcher.stop()
+    await transports.close_email_transport()
+    await auth.close_auth_client()
+
 @app.get("/", status_code=status.HTTP_200_OK)
 async def read_root():
-    return responses.ResponseModel("Park Loyalty", True, "Park Loyalty Notification Handler Service.")
+    return responses.JSONResponseModel("Park Loyalty", True, "Park Loyalty Notification Handler Service.")
 
 
 @app.get(BASE_PREFIX + "/", status_code=status.HTTP_200_OK)
 async def read_root():
-    return responses.ResponseModel("Park Loyalty", True, "Park Loyalty Notification Handler Entrypoint.")
+    return responses.JSONResponseModel("Park Loyalty", True, "Park Loyalty Notification Handler Entrypoint.")
 
 
 @app.get(BASE_PREFIX + "/url_list", status_code=status.HTTP_200_OK)
 def get_all_urls():
     url_list = [{"path": route.path, "name": route.name} for route in app.routes]
-    return responses.ResponseModel(url_list, True, "All URLs")
+    return responses.JSONResponseModel(url_list, True, "All URLs")
+
+
+@app.get(BASE_PREFIX + "/metrics", status_code=status.HTTP_200_OK, include_in_schema=False)
+def get_metrics():
+    return Response(content=metrics.get_metrics(), headers={"Content-Type": metrics.MetricsContentType})
 
 
+async def list_page_response(request, cursor, limit, message, get_page, iter_docs, *args):
+    """Serve one page (next cursor in X-Next-Cursor) or, for Accept: application/x-ndjson, a stream.
+
+    The next cursor always comes from the same limit+1 read as the page. An NDJSON request
+    with a limit is that page sent as lines; without one it streams to the end, so there is
+    no next cursor.
+    """
+    ndjson = streaming.wants_ndjson(request)
+    try:
+        limit = streaming.resolve_limit(limit, ndjson)
+        if ndjson and limit is None:
+            docs = await run_in_threadpool(iter_docs, *args, cursor)
+            return streaming.NDJSONResponse(docs)
+        page, next_cursor = await run_in_threadpool(get_page, *args, cursor, limit)
+        if ndjson:
+            return streaming.NDJSONResponse(page, next_cursor)
+        headers = {streaming.NextCursorHeader: next_cursor} if next_cursor is not None else None
+        return responses.JSONResponseModel(page, True, message, headers=headers)
+    except exceptions.InvalidCursorException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.InvalidPageLimitException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.InvalidNotificationException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except Exception as e:
+        return responses.HTTPExceptionResponse(status_code=500, message=str(e))
+
 @app.get(BASE_PREFIX + "/get_notification_list", status_code=status.HTTP_200_OK)
-def get_notification_list(auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def get_notification_list(request: Request, cursor: Optional[str] = None, limit: Optional[int] = None, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+    if streaming.is_paginated(request, cursor, limit):
+        return await list_page_response(
+            request, cursor, limit, "Notification List",
+            service.GetNotificationListPage, service.IterNotificationList, {}
+        )
     try:
-        notification_list = service.GetNotificationList({})
-        return responses.ResponseModel(notification_list, True, "Notification List")
+        if catalog.catalog.is_stale():
+            body, etag = await run_in_threadpool(catalog.catalog.get)
+        else:
+            body, etag = catalog.catalog.get()
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 
 @app.get(BASE_PREFIX + "/get_site_notification_list", status_code=status.HTTP_200_OK)
-def get_site_notification_list(auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def get_site_notification_list(request: Request, cursor: Optional[str] = None, limit: Optional[int] = None, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+    site_id = auth.get("metadata", {}).get("site_id")
+    if streaming.is_paginated(request, cursor, limit):
+        return await list_page_response(
+            request, cursor, limit, "Site Notification List",
+            service.GetSiteNotificationListPage, service.IterSiteNotificationList, site_id
+        )
     try:
-        site_id = auth.get("metadata", {}).get("site_id")
-        notification_list = service.GetSiteNotificationList(site_id)
-        return responses.ResponseModel(notification_list, True, "Site Notification List")
+        notification_list = await call_service("GetSiteNotificationList", site_id)
+        return responses.JSONResponseModel(notification_list, True, "Site Notification List")
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 
 @app.post(BASE_PREFIX + "/create_notification", status_code=status.HTTP_201_CREATED)
-def create_notification(payload: schemas.SiteNotificationPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def create_notification(payload: schemas.SiteNotificationPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         encoded_payload = completer.general_completer_user(payload, auth["metadata"])
     except Exception as e:
         return responses.ErrorResponseModel("Error at completion!", False, str(e))
     try:
-        service.CreateNotification(encoded_payload)
-        return responses.ResponseModel("", True, "Site Notification Created Successfully")
+        await call_service("CreateNotification", encoded_payload)
+        return responses.JSONResponseModel("", True, "Site Notification Created Successfully", status_code=status.HTTP_201_CREATED)
     except exceptions.InvalidNotificationException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except exceptions.DuplicateNotificationException as e:
@@ -68,111 +164,152 @@ def create_notification(payload: schemas.SiteNotificationPayload, auth = Depends
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 @app.post(BASE_PREFIX + "/update_notification", status_code=status.HTTP_200_OK)
-def update_notification(payload: schemas.SiteNotificationPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def update_notification(payload: schemas.SiteNotificationPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         encoded_payload = completer.general_completer_user(payload, auth["metadata"])
     except Exception as e:
         return responses.ErrorResponseModel("Error at completion!", False, str(e))
     try:
-        service.UpdateNotification(encoded_payload)
-        return responses.ResponseModel("", True, "Site Notification Updated Successfully")
+        await call_service("UpdateNotification", encoded_payload)
+        return responses.JSONResponseModel("", True, "Site Notification Updated Successfully")
     except exceptions.InvalidNotificationException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 @app.post(BASE_PREFIX + "/delete_notification", status_code=status.HTTP_200_OK)
-def delete_notification(payload: schemas.SiteNotificationPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def delete_notification(payload: schemas.SiteNotificationPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         encoded_payload = completer.general_completer_user(payload, auth["metadata"])
     except Exception as e:
         return responses.ErrorResponseModel("Error at completion!", False, str(e))
     try:
-        service.DeleteNotification(encoded_payload)
-        return responses.ResponseModel("", True, "Site Notification Deleted Successfully")
+        await call_service("DeleteNotification", encoded_payload)
+        return responses.JSONResponseModel("", True, "Site Notification Deleted Successfully")
     except exceptions.InvalidNotificationException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
+async def bulk_write_notifications(function_name, payload, auth, verb):
+    if len(payload.notifications) > BULK_MAX_NOTIFICATIONS:
+        return responses.HTTPExceptionResponse(status_code=400, message=f"At most {BULK_MAX_NOTIFICATIONS} notifications can be sent in one request.")
+    try:
+        encoded_payload = completer.general_completer_user(payload, auth["metadata"])
+    except Exception as e:
+        return responses.ErrorResponseModel("Error at completion!", False, str(e))
+    try:
+        results = await call_service(function_name, encoded_payload)
+        applied = sum(1 for result in results if result["status"] == service.BulkStatusApplied)
+        return responses.JSONResponseModel(
+            {"results": results, "applied": applied, "failed": len(results) - applied},
+            True,
+            f"{applied} of {len(results)} Site Notifications {verb} Successfully"
+        )
+    except Exception as e:
+        return responses.HTTPExceptionResponse(status_code=500, message=str(e))
+
+@app.post(BASE_PREFIX + "/bulk_create_notifications", status_code=status.HTTP_200_OK)
+async def bulk_create_notifications(payload: schemas.BulkSiteNotificationPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+    return await bulk_write_notifications("BulkCreateNotifications", payload, auth, "Created")
+
+@app.post(BASE_PREFIX + "/bulk_update_notifications", status_code=status.HTTP_200_OK)
+async def bulk_update_notifications(payload: schemas.BulkSiteNotificationPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+    return await bulk_write_notifications("BulkUpdateNotifications", payload, auth, "Updated")
+
+@app.post(BASE_PREFIX + "/bulk_delete_notifications", status_code=status.HTTP_200_OK)
+async def bulk_delete_notifications(payload: schemas.BulkSiteNotificationPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+    return await bulk_write_notifications("BulkDeleteNotifications", payload, auth, "Deleted")
+
 @app.get(BASE_PREFIX + "/get_notification_info", status_code=status.HTTP_200_OK)
-def get_notification_info(notification_name: str, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def get_notification_info(notification_name: str, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         site_id = auth.get("metadata", {}).get("site_id")
-        notification = service.GetNotificationInfo(site_id, notification_name)
-        return responses.ResponseModel(notification, True, "Site Notification Retreived Successfully")
+        notification = await call_service("GetNotificationInfo", site_id, notification_name)
+        return responses.JSONResponseModel(notification, True, "Site Notification Retreived Successfully")
     except exceptions.InvalidNotificationException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 @app.get(BASE_PREFIX + "/get_enforcement_hours", status_code=status.HTTP_200_OK)
-def get_enforcement_hours(auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def get_enforcement_hours(auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         site_id = auth.get("metadata", {}).get("site_id")
-        enforcement_hours = service.GetEnforcementHours(site_id)
+        enforcement_hours = await call_service("GetEnforcementHours", site_id)
         if enforcement_hours == {}:
-            return responses.ResponseModel(enforcement_hours, True, f"Enforcement Hours are not set for site {site_id}")
-        return responses.ResponseModel(enforcement_hours, True, "Enforcement Hours Retreived Successfully")
+            return responses.JSONResponseModel(enforcement_hours, True, f"Enforcement Hours are not set for site {site_id}")
+        return responses.JSONResponseModel(enforcement_hours, True, "Enforcement Hours Retreived Successfully")
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 @app.post(BASE_PREFIX + "/set_enforcement_hours", status_code=status.HTTP_200_OK)
-def set_enforcement_hours(payload: schemas.EnforcementHoursPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def set_enforcement_hours(payload: schemas.EnforcementHoursPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         try:
             encoded_payload = completer.general_completer_user(payload, auth["metadata"])
         except Exception as e:
             return responses.ErrorResponseModel("Error at completion!", False, str(e))
-        service.SetEnforcementHours(encoded_payload)
-        return responses.ResponseModel("", True, "Enforcement Hours Updated Successfully.")
+        await call_service("SetEnforcementHours", encoded_payload)
+        return responses.JSONResponseModel("", True, "Enforcement Hours Updated Successfully.")
     except exceptions.InvalidEnforcementHoursException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 @app.post(BASE_PREFIX + "/delete_enforcement_hours", status_code=status.HTTP_200_OK)
-def delete_enforcement_hours(auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def delete_enforcement_hours(auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         try:
             encoded_payload = completer.general_completer_user({}, auth["metadata"])
         except Exception as e:
             return responses.ErrorResponseModel("Error at completion!", False, str(e))
-        enforcement_hours = service.DeleteEnforcementHours(encoded_payload)
-        return responses.ResponseModel(enforcement_hours, True, "Enforcement Hours Deleted Successfully.")
+        enforcement_hours = await call_service("DeleteEnforcementHours", encoded_payload)
+        return responses.JSONResponseModel(enforcement_hours, True, "Enforcement Hours Deleted Successfully.")
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 @app.get(BASE_PREFIX + "/get_timezone_list", status_code=status.HTTP_200_OK)
-def get_timezone_list(auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def get_timezone_list(request: Request, cursor: Optional[str] = None, limit: Optional[int] = None, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+    if streaming.is_paginated(request, cursor, limit):
+        return await list_page_response(
+            request, cursor, limit, timezones.TimezoneIndex.ResponseMessage,
+            utils.get_timezone_list_page, utils.iter_timezone_list
+        )
     try:
-        timezone_list = service.GetTimezoneList()
-        return responses.ResponseModel(timezone_list, True, "Notification Timezone List Retreived Successfully")
+        body, gzip_body, etag = timezones.index.get()
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=gzip_body, media_type="application/json", headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 @app.get(BASE_PREFIX + "/get_notification_cron_info", status_code=status.HTTP_200_OK)
-def get_notification_cron_info(notification_name: str, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def get_notification_cron_info(notification_name: str, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         site_id = auth.get("metadata", {}).get("site_id")
-        notification_cron_info = service.GetNotificationCronInfo(site_id, notification_name)
+        notification_cron_info = await call_service("GetNotificationCronInfo", site_id, notification_name)
         if notification_cron_info == {}:
-            return responses.ResponseModel(notification_cron_info, True, f"{notification_name} is not configured for {site_id} currently.")
-        return responses.ResponseModel(notification_cron_info, True, "Notification Cron Info Retreived Successfully")
+            return responses.JSONResponseModel(notification_cron_info, True, f"{notification_name} is not configured for {site_id} currently.")
+        return responses.JSONResponseModel(notification_cron_info, True, "Notification Cron Info Retreived Successfully")
     except exceptions.InvalidNotificationException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 @app.post(BASE_PREFIX + "/set_notification_cron_info", status_code=status.HTTP_200_OK)
-def set_notification_cron_info(payload: schemas.NotificationCronInfoPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def set_notification_cron_info(payload: schemas.NotificationCronInfoPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         try:
             encoded_payload = completer.general_completer_user(payload, auth["metadata"])
         except Exception as e:
             return responses.ErrorResponseModel("Error at completion!", False, str(e))
-        service.SetNotificationCronInfo(encoded_payload)
-        return responses.ResponseModel("", True, "Notification Cron Info Updated Successfully.")
+        await call_service("SetNotificationCronInfo", encoded_payload)
+        return responses.JSONResponseModel("", True, "Notification Cron Info Updated Successfully.")
     except exceptions.InvalidTimezoneException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except exceptions.InvalidDayFreqException as e:
@@ -181,21 +318,114 @@ def set_notification_cron_info(payload: schemas.NotificationCronInfoPayload, aut
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except exceptions.InvalidBeatTimeFormatException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.InvalidCronExpressionException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
 
 @app.post(BASE_PREFIX + "/delete_notification_cron_info", status_code=status.HTTP_200_OK)
-def delete_notification_cron_info(payload: schemas.NotificationCronInfoPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
+async def delete_notification_cron_info(payload: schemas.NotificationCronInfoPayload, auth = Depends(auth.verifyEDITAuthenticationAndAuthorizationRequest)):
     try:
         try:
             encoded_payload = completer.general_completer_user(payload, auth["metadata"])
         except Exception as e:
             return responses.ErrorResponseModel("Error at completion!", False, str(e))
-        service.DeleteNotificationCronInfo(encoded_payload)
-        return responses.ResponseModel("", True, "Notification Cron Info Deleted Successfully.")
+        await call_service("DeleteNotificationCronInfo", encoded_payload)
+        return responses.JSONResponseModel("", True, "Notification Cron Info Deleted Successfully.")
     except exceptions.NotConfigurableNotificationsCronsException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except exceptions.NotificationCronDoesNotExistException as e:
         return responses.HTTPExceptionResponse(status_code=400, message=str(e))
     except Exception as e:
         return responses.HTTPExceptionResponse(status_code=500, message=str(e))
+
+@app.get(BASE_PREFIX + "/get_notification_forecast", status_code=status.HTTP_200_OK)
+async def get_notification_forecast(minutes: int = 60, auth = Depends(auth.verifyADMINAuthenticationAndAuthorizationRequest)):
+    if minutes <= 0 or minutes > FORECAST_MAX_MINUTES:
+        return responses.HTTPExceptionResponse(status_code=400, message=f"minutes must be between 1 and {FORECAST_MAX_MINUTES}.")
+    try:
+        notification_forecast = await run_in_threadpool(forecast.GetNotificationForecast, minutes)
+        return responses.JSONResponseModel(notification_forecast, True, f"Notifications firing in the next {minutes} minutes.")
+    except Exception as e:
+        return responses.HTTPExceptionResponse(status_code=500, message=str(e))
+
+@app.get(BASE_PREFIX + "/get_notification_sites", status_code=status.HTTP_200_OK)
+async def get_notification_sites(request: Request, notification_name: str, cursor: Optional[str] = None, limit: Optional[int] = None, auth = Depends(auth.verifyADMINAuthenticationAndAuthorizationRequest)):
+    # Always paged: the full result spans the fleet.
+    return await list_page_response(
+        request, cursor, limit, "Notification Sites",
+        service.GetNotificationSitesPage, service.IterNotificationSites, notification_name
+    )
+
+@app.get(BASE_PREFIX + "/get_slow_queries", status_code=status.HTTP_200_OK)
+async def get_slow_queries(limit: int = 100, auth = Depends(auth.verifyADMINAuthenticationAndAuthorizationRequest)):
+    slow_query_summary = slow_queries.slow_query_log.get_summary(limit)
+    return responses.JSONResponseModel(slow_query_summary, True, f"Query shapes slower than {SLOW_QUERY_THRESHOLD_MS}ms.")
+
+@app.post(BASE_PREFIX + "/reset_slow_queries", status_code=status.HTTP_200_OK)
+async def reset_slow_queries(auth = Depends(auth.verifyADMINAuthenticationAndAuthorizationRequest)):
+    reset_count = slow_queries.slow_query_log.reset()
+    return responses.JSONResponseModel({"reset_count": reset_count}, True, "Slow Query Log Reset Successfully.")
+
+@app.post(BASE_PREFIX + "/create_admin_job", status_code=status.HTTP_201_CREATED)
+async def create_admin_job(payload: schemas.AdminJobPayload, auth = Depends(auth.verifyADMINAuthenticationAndAuthorizationRequest)):
+    encoded_payload = payload.dict()
+    encoded_payload["event_initiator_id"] = auth.get("metadata", {}).get("user_id")
+    try:
+        job = await run_in_threadpool(jobs.CreateJob, encoded_payload)
+        return responses.JSONResponseModel(job, True, "Admin Job Created Successfully", status_code=status.HTTP_201_CREATED)
+    except exceptions.InvalidAdminJobException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.InvalidNotificationException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.NotConfigurableNotificationsCronsException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.InvalidTimezoneException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.InvalidDayFreqException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.InvalidBeatFreqFormatException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.InvalidBeatTimeFormatException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except exceptions.InvalidCronExpressionException as e:
+        return responses.HTTPExceptionResponse(status_code=400, message=str(e))
+    except Exception as e:
+        return responses.HTTPExceptionResponse(status_code=500, message=str(e))
+
+@app.get(BASE_PREFIX + "/get_admin_job", status_code=status.HTTP_200_OK)
+async def get_admin_job(job_id: str, auth = Depends(auth.verifyADMINAuthenticationAndAuthorizationRequest)):
+    try:
+        job = await run_in_threadpool(jobs.GetJob, job_id)
+        return responses.JSONResponseModel(job, True, "Admin Job Retreived Successfully")
+    except exceptions.AdminJobDoesNotExistException as e:
+        return responses.HTTPExceptionResponse(status_code=404, message=str(e))
+    except Exception as e:
+        return responses.HTTPExceptionResponse(status_code=500, message=str(e))
+
+@app.get(BASE_PREFIX + "/get_admin_job_sites", status_code=status.HTTP_200_OK)
+async def get_admin_job_sites(job_id: str, status: Optional[str] = None, skip: int = 0, limit: int = 100, auth = Depends(auth.verifyADMINAuthenticationAndAuthorizationRequest)):
+    try:
+        job_sites = await run_in_threadpool(jobs.GetJobSites, job_id, status, max(skip, 0), min(max(limit, 1), 1000))
+        return responses.JSONResponseModel(job_sites, True, "Admin Job Sites Retreived Successfully")
+    except exceptions.AdminJobDoesNotExistException as e:
+        return responses.HTTPExceptionResponse(status_code=404, message=str(e))
+    except Exception as e:
+        return responses.HTTPExceptionResponse(status_code=500, message=str(e))
+
+@app.post(BASE_PREFIX + "/cancel_admin_job", status_code=status.HTTP_200_OK)
+async def cancel_admin_job(job_id: str, auth = Depends(auth.verifyADMINAuthenticationAndAuthorizationRequest)):
+    try:
+        job = await run_in_threadpool(jobs.CancelJob, job_id)
+        return responses.JSONResponseModel(job, True, "Admin Job Cancellation Requested")
+    except exceptions.AdminJobDoesNotExistException as e:
+        return responses.HTTPExceptionResponse(status_code=404, message=str(e))
+    except Exception as e:
+        return responses.HTTPExceptionResponse(status_code=500, message=str(e))
+
+@app.post(BASE_PREFIX + "/evict_auth_cache", status_code=status.HTTP_200_OK)
+def evict_auth_cache(payload: schemas.EvictTokenPayload, admin_auth = Depends(auth.verifyADMINAuthenticationAndAuthorizationRequest)):
+    # Drops the token's cached verification results on this instance only, so its next request
+    # is re-verified upstream. It revokes nothing, and other replicas keep their entries until they expire.
+    evicted = auth.evictToken(payload.token)
+    return responses.JSONResponseModel({"evicted": evicted}, True, "Token evicted from this instance's auth cache.")
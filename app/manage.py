@@ -0,0 +1,155 @@
+#============================================================================================
+# MAINTENANCE COMMANDS.
+# Usage: python -m app.manage <command>
+#============================================================================================
+import argparse
+import asyncio
+import sys
+from . import service, outbox, indexes, storage, notification_sites
+
+
+def migrate_crons(args):
+    migrated = service.MigrateCronInfo(batch_size=args.batch_size)
+    print(f"Migrated {migrated} site cron settings from Crons to CronSettings.")
+    service.CreateCronInfoView()
+    print("CronsView is up to date.")
+
+
+def drain_outbox(args):
+    async def drain():
+        delivered = 0
+        while True:
+            claimed = await outbox.dispatcher.drain_once()
+            if claimed == 0:
+                return delivered
+            delivered += claimed
+    print(f"Processed {asyncio.run(drain())} outbox entries.")
+
+
+def ensure_indexes(args):
+    indexes.PrintIndexResults(indexes.EnsureSharedIndexes())
+    if args.shared_only or storage.GetStorageMode() == storage.StorageModeShared:
+        return
+    site_ids = args.site_id or indexes.GetFleetSiteIds()
+    done = 0
+
+    def on_site(site_id, results):
+        nonlocal done
+        done += 1
+        indexes.PrintIndexResults(results)
+        if done % 500 == 0:
+            print(f"Ensured indexes on {done}/{len(site_ids)} sites.")
+    failures = indexes.EnsureFleetIndexes(site_ids, max_workers=args.workers, on_site=on_site)
+    print(f"Ensured indexes on {len(site_ids)} sites; {len(failures)} collections failed.")
+    if failures:
+        sys.exit(1)
+
+
+def verify_indexes(args):
+    report = indexes.VerifyIndexes(args.site_id)
+    for entry in report:
+        verdict = {True: "index", False: "NO INDEX", None: "unknown"}[entry["uses_index"]]
+        detail = entry["error"] or f"{' > '.join(entry['stages'])} [{', '.join(entry['indexes'])}]"
+        print(f"{verdict:9s} {entry['database']}.{entry['collection']}  {entry['query']}: {detail}")
+    unindexed = [entry for entry in report if entry["uses_index"] == False]
+    print(f"{len(report) - len(unindexed)}/{len(report)} queries use an index or could not be checked.")
+    if unindexed:
+        sys.exit(1)
+
+
+def migrate_storage(args):
+    site_ids = args.site_id or indexes.GetFleetSiteIds()
+    done = copied_total = 0
+
+    def on_site(site_id, copied, error):
+        nonlocal done, copied_total
+        done += 1
+        copied_total += copied
+        if error is not None:
+            print(f"Storage migration failed for {site_id}: {error}")
+        if done % 500 == 0:
+            print(f"Migrated {done}/{len(site_ids)} sites.")
+    failures = storage.MigrateFleet(site_ids, max_workers=args.workers, on_site=on_site)
+    print(f"Migrated {len(site_ids) - len(failures)}/{len(site_ids)} sites; copied {copied_total} documents into the shared collections.")
+    if failures:
+        sys.exit(1)
+
+
+def reconcile_notification_sites(args, repair):
+    # Sites created in the shared layout have no database of their own, so every site is checked.
+    site_ids = args.site_id or indexes.GetFleetSiteIds(existing_only=False)
+    done = 0
+
+    def on_site(site_id, discrepancies, error):
+        nonlocal done
+        done += 1
+        if error is not None:
+            print(f"NotificationSites check failed for {site_id}: {error}")
+        for discrepancy in discrepancies:
+            print(f"{discrepancy['problem']:10s} {site_id}: {discrepancy['notification_name']}")
+        if done % 500 == 0:
+            print(f"Checked {done}/{len(site_ids)} sites.")
+    discrepancies, failures = notification_sites.CheckFleet(
+        site_ids, repair=repair, include_orphans=not args.site_id, max_workers=args.workers, on_site=on_site
+    )
+    for discrepancy in discrepancies:
+        if discrepancy["problem"] == notification_sites.ProblemOrphaned:
+            print(f"{discrepancy['problem']:10s} {discrepancy['site_id']}: {discrepancy['notification_name']}")
+    print(f"Checked {len(site_ids)} sites: {len(discrepancies)} NotificationSites entries {'repaired' if repair else 'out of date'}, {len(failures)} sites failed.")
+    return discrepancies, failures
+
+
+def rebuild_notification_sites(args):
+    _, failures = reconcile_notification_sites(args, repair=True)
+    if failures:
+        sys.exit(1)
+
+
+def check_notification_sites(args):
+    discrepancies, failures = reconcile_notification_sites(args, repair=False)
+    if discrepancies or failures:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_crons_parser = subparsers.add_parser("migrate_crons", help="Split the legacy Crons documents into per-site CronSettings documents.")
+    migrate_crons_parser.add_argument("--batch-size", type=int, default=1000)
+    migrate_crons_parser.set_defaults(func=migrate_crons)
+
+    drain_outbox_parser = subparsers.add_parser("drain_outbox", help="Deliver every due email in the outbox once and exit.")
+    drain_outbox_parser.set_defaults(func=drain_outbox)
+
+    ensure_indexes_parser = subparsers.add_parser("ensure_indexes", help="Create every index in the manifest on the shared and per-site databases.")
+    ensure_indexes_parser.add_argument("--shared-only", action="store_true", help="Skip the per-site databases.")
+    ensure_indexes_parser.add_argument("--site-id", action="append", help="Only this site (repeatable); default is every site with a database.")
+    ensure_indexes_parser.add_argument("--workers", type=int, default=indexes.INDEX_BOOTSTRAP_WORKERS)
+    ensure_indexes_parser.set_defaults(func=ensure_indexes)
+
+    verify_indexes_parser = subparsers.add_parser("verify_indexes", help="Explain every service query and report those that scan a collection.")
+    verify_indexes_parser.add_argument("--site-id", help="Site database to explain per-site queries against; default is the first site.")
+    verify_indexes_parser.set_defaults(func=verify_indexes)
+
+    migrate_storage_parser = subparsers.add_parser("migrate_storage", help="Copy per-site NotificationList/ConfigurationsList data into the shared collections (run with STORAGE_MODE=dual).")
+    migrate_storage_parser.add_argument("--site-id", action="append", help="Only this site (repeatable); default is every site with a database.")
+    migrate_storage_parser.add_argument("--workers", type=int, default=storage.STORAGE_MIGRATION_WORKERS)
+    migrate_storage_parser.set_defaults(func=migrate_storage)
+
+    rebuild_notification_sites_parser = subparsers.add_parser("rebuild_notification_sites", help="Bring NotificationSites in line with every site's NotificationList, writing only what differs.")
+    rebuild_notification_sites_parser.add_argument("--site-id", action="append", help="Only this site (repeatable); default is every site, plus entries of sites no longer in Site.sites.")
+    rebuild_notification_sites_parser.add_argument("--workers", type=int, default=notification_sites.NOTIFICATION_SITES_WORKERS)
+    rebuild_notification_sites_parser.set_defaults(func=rebuild_notification_sites)
+
+    check_notification_sites_parser = subparsers.add_parser("check_notification_sites", help="Report NotificationSites entries that are missing, stale or left over; exits 1 if any are found.")
+    check_notification_sites_parser.add_argument("--site-id", action="append", help="Only this site (repeatable); default is every site, plus entries of sites no longer in Site.sites.")
+    check_notification_sites_parser.add_argument("--workers", type=int, default=notification_sites.NOTIFICATION_SITES_WORKERS)
+    check_notification_sites_parser.set_defaults(func=check_notification_sites)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#============================================================================================
+# PROMETHEUS METRICS.
+# Request latency per route, Mongo command latency per database/collection, and auth and
+# email latency/outcomes, served in the Prometheus text format at /metrics. Label children
+# are resolved once (per route, per collection) so a request costs a few dict lookups and
+# histogram observations.
+#============================================================================================
+import threading
+import time
+from fastapi.routing import APIRoute
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from pymongo import monitoring
+from .constants import NotificationsDatabase, SitesDatabase, ParkLoyaltyDatabase
+from .exporter import METRICS_ENABLED
+
+MetricsContentType = CONTENT_TYPE_LATEST
+# Per-site databases are named after the site; they share one label so the series count stays fixed.
+SiteDatabaseLabel = "site"
+SharedDatabases = {NotificationsDatabase, SitesDatabase, ParkLoyaltyDatabase, "admin", "config", "local"}
+LatencyBuckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "notification_handler_request_duration_seconds",
+    "Time spent handling a request, including auth and serialization.",
+    ["method", "route"],
+    buckets=LatencyBuckets
+)
+REQUESTS = Counter(
+    "notification_handler_requests_total",
+    "Requests handled, by response status code.",
+    ["method", "route", "status"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "notification_handler_requests_in_flight",
+    "Requests currently being handled.",
+    ["method", "route"]
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "notification_handler_mongo_command_duration_seconds",
+    "Mongo command round-trip time as reported by the driver.",
+    ["database", "collection", "command"],
+    buckets=LatencyBuckets
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "notification_handler_mongo_command_failures_total",
+    "Mongo commands that returned an error.",
+    ["database", "collection", "command"]
+)
+AUTH_CHECK_LATENCY = Histogram(
+    "notification_handler_auth_check_duration_seconds",
+    "Time spent in checkAuth calls to the auth module.",
+    buckets=LatencyBuckets
+)
+AUTH_CHECKS = Counter(
+    "notification_handler_auth_checks_total",
+    "checkAuth calls by outcome (allowed, denied, inactive, unavailable).",
+    ["outcome"]
+)
+EMAIL_SEND_LATENCY = Histogram(
+    "notification_handler_email_send_duration_seconds",
+    "Time spent handing email to the transport.",
+    ["operation"],
+    buckets=LatencyBuckets
+)
+EMAIL_SEND_ERRORS = Counter(
+    "notification_handler_email_send_errors_total",
+    "Email sends that raised.",
+    ["operation"]
+)
+
+AuthOutcomeAllowed = "allowed"
+AuthOutcomeDenied = "denied"
+AuthOutcomeInactive = "inactive"
+AuthOutcomeUnavailable = "unavailable"
+
+
+def get_metrics() -> bytes:
+    return generate_latest()
+
+
+def get_database_label(database_name: str) -> str:
+    return database_name if database_name in SharedDatabases else SiteDatabaseLabel
+
+
+def get_auth_outcome(auth_response: dict) -> str:
+    if auth_response.get("token_active") == False:
+        return AuthOutcomeInactive
+    if auth_response.get("status") == False:
+        return AuthOutcomeDenied
+    return AuthOutcomeAllowed
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that records latency, status and in-flight count under the route's path template."""
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+        if not METRICS_ENABLED:
+            return route_handler
+        method = ",".join(sorted(self.methods))
+        latency = REQUEST_LATENCY.labels(method, self.path)
+        in_flight = REQUESTS_IN_FLIGHT.labels(method, self.path)
+        status_counters = {}
+
+        async def timed_route_handler(request):
+            in_flight.inc()
+            started_at = time.perf_counter()
+            status_code = 500
+            try:
+                response = await route_handler(request)
+                status_code = response.status_code
+                return response
+            except Exception as e:
+                # HTTPExceptions are turned into responses by the exception middleware further out.
+                status_code = getattr(e, "status_code", 500)
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started_at)
+                in_flight.dec()
+                counter = status_counters.get(status_code)
+                if counter is None:
+                    counter = status_counters[status_code] = REQUESTS.labels(method, self.path, str(status_code))
+                counter.inc()
+        return timed_route_handler
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command on the clients in database.py.
+
+    The driver reports the duration itself; started() only remembers which
+    collection the command targeted, keyed on (connection, request id).
+    """
+    def __init__(self) -> None:
+        self._targets = {}
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _get_children(self, database_name: str, collection_name: str, command_name: str):
+        key = (database_name, collection_name, command_name)
+        children = self._children.get(key)
+        if children is None:
+            with self._lock:
+                labels = (get_database_label(database_name), collection_name, command_name)
+                children = self._children[key] = (MONGO_COMMAND_LATENCY.labels(*labels), MONGO_COMMAND_FAILURES.labels(*labels))
+        return children
+
+    def started(self, event) -> None:
+        command_name = event.command_name
+        # getMore names the collection under "collection"; every other command under its own name.
+        collection_name = event.command.get("collection" if command_name == "getMore" else command_name)
+        if not isinstance(collection_name, str):
+            collection_name = ""
+        self._targets[(event.connection_id, event.request_id)] = (event.database_name, collection_name)
+
+    def _finish(self, event):
+        database_name, collection_name = self._targets.pop((event.connection_id, event.request_id), (event.database_name, ""))
+        return self._get_children(database_name, collection_name, event.command_name)
+
+    def succeeded(self, event) -> None:
+        self._finish(event)[0].observe(event.duration_micros / 1e6)
+
+    def failed(self, event) -> None:
+        latency, failures = self._finish(event)
+        latency.observe(event.duration_micros / 1e6)
+        failures.inc()
+
+mongo_listener = MongoCommandListener()
+
+def get_mongo_event_listeners() -> list:
+    return [mongo_listener] if METRICS_ENABLED else []
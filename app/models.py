@@ -1,16 +1,18 @@
 import enum
+import functools
 import re
 from wsgiref import validate
 import pytz
+import pymongo
 import datetime
-from . import exceptions
-from .database import get_mongo_client
+from . import exceptions, crontab, storage, outbox, notification_sites
 from .constants import NotificationsDatabase, NotificationListCollection
 
 class CronType(enum.Enum):
     NonConfigurableCron = "non_configurable"
     PeriodicCron = "periodic"
     ScheduledCron = "schedule"
+    CrontabCron = "crontab"
 
 class CronDayFreq(enum.Enum):
     daily = "daily"
@@ -20,6 +22,24 @@ class CronDayFreq(enum.Enum):
     def has_value(cls, value):
         return value in cls._value2member_map_
 
+BeatTimeRegex = re.compile(r"^(?:2[0-3]|[01][0-9]):[0-5][0-9]$")
+
+@functools.lru_cache(maxsize=None)
+def is_valid_timezone(timezone_name: str) -> bool:
+    try:
+        pytz.timezone(timezone_name)
+    except pytz.exceptions.UnknownTimeZoneError:
+        return False
+    return True
+
+# DeleteNotificationCronInfo leaves a {deleted: true} tombstone in CronSettings so the legacy
+# Crons migration cannot bring the setting back; every reader skips tombstones.
+CronSettingTombstone = {"deleted": True}
+ActiveCronSettingFilter = {"deleted": {"$ne": True}}
+
+def IsCronSettingTombstone(cron_setting_doc: dict) -> bool:
+    return cron_setting_doc.get("deleted") == True
+
 class Cron():
     def __init__(self, timezone, freq) -> None:
         self.timezone = timezone
@@ -28,9 +48,7 @@ class Cron():
         self.validate_freq(self.freq)
 
     def validate_timezone(self, timezone_name: str):
-        try:
-            pytz.timezone(timezone_name)
-        except pytz.exceptions.UnknownTimeZoneError:
+        if not is_valid_timezone(timezone_name):
             raise exceptions.InvalidTimezoneException(timezone_name)
 
     def validate_freq(self, freq: str):
@@ -54,40 +72,68 @@ class ScheduledCron(Cron):
         self.validate_beat_time(self.beat_time)
 
     def validate_beat_time(self, beat_time: str):
-        tz_regex_pattern = r"^(?:2[0-3]|[01][0-9]):[0-5][0-9]$"
-        tz_regex = re.compile(tz_regex_pattern)
-        if not bool(re.fullmatch(tz_regex, beat_time)):
+        if not bool(BeatTimeRegex.fullmatch(beat_time)):
             raise exceptions.InvalidBeatTimeFormatException(beat_time)
 
+class CrontabCron(Cron):
+    """A full crontab expression; the day rules live in the expression, so there is no freq."""
+    def __init__(self, cron_expression, timezone) -> None:
+        self.timezone = timezone or "UTC"
+        self.cron_expression = " ".join(cron_expression.split()) if isinstance(cron_expression, str) else cron_expression
+        self.validate_timezone(self.timezone)
+        self.validate_cron_expression(self.cron_expression)
+
+    def validate_cron_expression(self, cron_expression: str):
+        if not isinstance(cron_expression, str):
+            raise exceptions.InvalidCronExpressionException(cron_expression)
+        crontab.parse_crontab(cron_expression)
+
+    def get_expression(self) -> "crontab.CrontabExpression":
+        return crontab.parse_crontab(self.cron_expression)
+
+BulkOperationCreate = "create"
+BulkOperationUpdate = "update"
+BulkOperationDelete = "delete"
+
+# Filled once at import time by SiteNotification.__init_subclass__, in class definition order.
+_NotificationRegistry = {}
+_ValidNotifications = []
+_RegistryVersion = 0
+
+def get_registry_version() -> int:
+    return _RegistryVersion
+
 def get_valid_notifications():
-    valid_notifications = [
-        NoPermitUploadNotification.NotificationName,
-        NoScofflawUploadNotification.NotificationName,
-        DailyCitationNotification.NotificationName,
-        CitationCountNotification.NotificationName,
-        SiteExportNotification.NotificationName,
-        HighLatencyNotification.NotificationName,
-        NoTransactionNotification.NotificationName,
-    ]
-    return valid_notifications
+    return _ValidNotifications
+
+def get_cron_notification_names() -> dict:
+    """Map each configurable NotificationCronName to its notification name."""
+    return {
+        notification_class.NotificationCronName: notification_name
+        for notification_name, notification_class in _NotificationRegistry.items()
+        if notification_class.NotificationCronName is not None
+    }
 
 def get_notification_class(notification_name: str):
-    notification_class_dict = {
-        NoPermitUploadNotification.NotificationName: NoPermitUploadNotification,
-        NoScofflawUploadNotification.NotificationName: NoScofflawUploadNotification,
-        DailyCitationNotification.NotificationName: DailyCitationNotification,
-        CitationCountNotification.NotificationName: CitationCountNotification,
-        SiteExportNotification.NotificationName: SiteExportNotification,
-        HighLatencyNotification.NotificationName: HighLatencyNotification,
-        NoTransactionNotification.NotificationName: NoTransactionNotification,
-    }
-    notification_class = notification_class_dict.get(notification_name, None)
+    notification_class = _NotificationRegistry.get(notification_name, None)
     if notification_class is None:
         raise exceptions.InvalidNotificationException(notification_name)
     return notification_class
 
 class SiteNotification():
     NotificationMetadataKeys = {}
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        global _RegistryVersion
+        super().__init_subclass__(**kwargs)
+        notification_name = cls.__dict__.get("NotificationName")
+        if notification_name is None:
+            return
+        if notification_name not in _NotificationRegistry:
+            _ValidNotifications.append(notification_name)
+        _NotificationRegistry[notification_name] = cls
+        _RegistryVersion += 1
+
     def __init__(self, site_id, email_recipients) -> None:
         self.site_id = site_id
         self.email_recipients = email_recipients
@@ -109,93 +155,167 @@ class SiteNotification():
         email_list = email_str.split(",")
         return email_list
 
-    def DoesNotificationExist(self) -> bool:
-        db_instance = get_mongo_client()[self.site_id]
-        collection = db_instance[NotificationListCollection]
-        doc = collection.find_one({
-            "entity_details": {"$elemMatch": {"notification_name": self.notification_name}}
-            })
-        if doc is None:
-            return False
-        return True
+    def NotificationListFilter(self, notification_exists: bool, site_filter: dict = {}) -> dict:
+        """site_filter comes from storage.GetSiteCollection and scopes shared collections to the site."""
+        if notification_exists:
+            notification_filter = self.notification_name
+        else:
+            notification_filter = {"$ne": self.notification_name}
+        return {**site_filter, "entity_type": "NotificationList", "entity_details.notification_name": notification_filter}
 
-    def CreateNotification(self):
-        new_notification = self.__dict__
-        new_notification["email"] = self.FormatEmailListForDatabase(new_notification.get("email", []))
-        db_instance = get_mongo_client()[self.site_id]
-        collection = db_instance[NotificationListCollection]
-        doc = collection.find_one({"entity_type": "NotificationList"})
-        if doc is None:
-            new_notification_list = {
-                "entity_type": "NotificationList",
-                "entity_details": [new_notification],
-                "created_at": self.created_at,
-                "site_id": self.site_id
-            }
-            collection.insert_one(new_notification_list)
+    def FormatNotificationForDatabase(self) -> dict:
+        notification = self.__dict__
+        notification["email"] = self.FormatEmailListForDatabase(notification.get("email", []))
+        return notification
+
+    def NewNotificationUpdate(self) -> dict:
+        return {
+            "$push": {"entity_details": self.FormatNotificationForDatabase()},
+            "$setOnInsert": {"created_at": self.created_at, "site_id": self.site_id}
+        }
+
+    def ReplaceNotificationUpdate(self) -> dict:
+        return {"$set": {"entity_details.$": self.FormatNotificationForDatabase()}}
+
+    def RemoveNotificationUpdate(self) -> dict:
+        return {"$pull": {"entity_details": {"notification_name": self.notification_name}}}
+
+    def FormatNotificationFromDatabase(self, doc):
+        if doc is None or not doc.get("entity_details"):
+            raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
+        notification = doc["entity_details"][0]
+        notification["email"] = self.FormatEmailStringForResponse(notification.get("email", ""))
+        return notification
+
+    def BulkWriteRequest(self, operation: str, site_filter: dict = {}):
+        """The single-notification write for operation, as a request for collection.bulk_write."""
+        if operation == BulkOperationCreate:
+            return pymongo.UpdateOne(self.NotificationListFilter(False, site_filter), self.NewNotificationUpdate(), upsert=True)
+        if operation == BulkOperationUpdate:
+            return pymongo.UpdateOne(self.NotificationListFilter(True, site_filter), self.ReplaceNotificationUpdate())
+        return pymongo.UpdateOne(self.NotificationListFilter(True, site_filter), self.RemoveNotificationUpdate())
+
+    @staticmethod
+    def FormatWriteResult(result) -> dict:
+        return {"matched_count": result.matched_count, "modified_count": result.modified_count}
+
+    # The create upsert relies on a unique entity_type index (site_id, entity_type in the shared
+    # collection) so that a second NotificationList document can never be inserted when the
+    # notification already exists. Keyed on the collection's full name.
+    _IndexedSites = set()
+
+    @staticmethod
+    def NotificationListIndexKeys(site_filter: dict) -> list:
+        if site_filter:
+            return [("site_id", pymongo.ASCENDING), ("entity_type", pymongo.ASCENDING)]
+        return [("entity_type", pymongo.ASCENDING)]
+
+    @staticmethod
+    def ReportNotificationListIndexFailure(collection, error) -> None:
+        # Typically a site that already holds duplicate NotificationList documents. Writes go
+        # on without the guard rather than failing; `python -m app.manage ensure_indexes`
+        # reports the same failure until an operator merges the duplicates.
+        print(f"Unique NotificationList index could not be created on {collection.full_name}: {error}")
+
+    def EnsureNotificationListIndex(self, collection, site_filter: dict = {}) -> None:
+        if collection.full_name in SiteNotification._IndexedSites:
+            return
+        try:
+            collection.create_index(self.NotificationListIndexKeys(site_filter), unique=True)
+        except pymongo.errors.OperationFailure as e:
+            self.ReportNotificationListIndexFailure(collection, e)
+        SiteNotification._IndexedSites.add(collection.full_name)
+
+    async def EnsureNotificationListIndexAsync(self, collection, site_filter: dict = {}) -> None:
+        if collection.full_name in SiteNotification._IndexedSites:
             return
-        
-        notification_list = doc.get("entity_details", [])
-        for notification in notification_list:
-            if notification.get("notification_name") == self.notification_name:
-                raise exceptions.DuplicateNotificationException(self.site_id, self.notification_name)
-        notification_list.append(new_notification)
-        collection.update_one({"entity_type": "NotificationList"}, {"$set": {"entity_details": notification_list}})
-        return
+        try:
+            await collection.create_index(self.NotificationListIndexKeys(site_filter), unique=True)
+        except pymongo.errors.OperationFailure as e:
+            self.ReportNotificationListIndexFailure(collection, e)
+        SiteNotification._IndexedSites.add(collection.full_name)
+
+    def CreateNotification(self):
+        collection, site_filter = storage.GetSiteCollection(self.site_id, NotificationListCollection, write=True)
+        self.EnsureNotificationListIndex(collection, site_filter)
+
+        def create_notification(session):
+            result = collection.update_one(self.NotificationListFilter(False, site_filter), self.NewNotificationUpdate(), upsert=True, session=session)
+            notification_sites.UpsertNotificationSite(self.site_id, self.FormatNotificationForDatabase(), session=session)
+            return result
+        try:
+            result = outbox.RunInTransaction(create_notification)
+        except pymongo.errors.DuplicateKeyError:
+            raise exceptions.DuplicateNotificationException(self.site_id, self.notification_name)
+        return self.FormatWriteResult(result)
 
     def GetNotificationInfo(self):
-        db_instance = get_mongo_client()[self.site_id]
-        collection = db_instance[NotificationListCollection]
-        doc = collection.find_one({
-            "entity_details": {"$elemMatch": {"notification_name": self.notification_name}}
-            })
-        if doc is None:
-            raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
-        notification_list = doc.get("entity_details", [])
-        for notification in notification_list:
-            if notification.get("notification_name") == self.notification_name:
-                notification["email"] = self.FormatEmailStringForResponse(notification.get("email", ""))
-                return notification
-        raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
+        collection, site_filter = storage.GetSiteCollection(self.site_id, NotificationListCollection)
+        doc = collection.find_one(self.NotificationListFilter(True, site_filter), {"_id": 0, "entity_details.$": 1})
+        return self.FormatNotificationFromDatabase(doc)
 
     def UpdateNotification(self):
-        notification = self.__dict__
-        notification["email"] = self.FormatEmailListForDatabase(notification.get("email", []))
-        db_instance = get_mongo_client()[self.site_id]
-        collection = db_instance[NotificationListCollection]
-        doc = collection.find_one({"entity_type": "NotificationList"})
-        if doc is None:
-            raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
-        notification_list = doc.get("entity_details", [])
-        notification_exists = False
-        for idx, notification_doc in enumerate(notification_list):
-            if notification_doc.get("notification_name") == self.notification_name:
-                notification_list[idx] = notification
-                notification_exists = True
-                break
-        if not notification_exists:
-            raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
-        collection.update_one({"entity_type": "NotificationList"}, {"$set": {"entity_details": notification_list}})
-        return
+        collection, site_filter = storage.GetSiteCollection(self.site_id, NotificationListCollection, write=True)
+
+        def update_notification(session):
+            result = collection.update_one(self.NotificationListFilter(True, site_filter), self.ReplaceNotificationUpdate(), session=session)
+            if result.matched_count == 0:
+                raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
+            notification_sites.UpsertNotificationSite(self.site_id, self.FormatNotificationForDatabase(), session=session)
+            return result
+        return self.FormatWriteResult(outbox.RunInTransaction(update_notification))
 
     def DeleteNotification(self):
-        db_instance = get_mongo_client()[self.site_id]
-        collection = db_instance[NotificationListCollection]
-        doc = collection.find_one({"entity_type": "NotificationList"})
-        if doc is None:
-            raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
-        notification_list = doc.get("entity_details", [])
-        notification_exists = False
-        for idx, notification_doc in enumerate(notification_list):
-            if notification_doc.get("notification_name") == self.notification_name:
-                notification_exists = True
-                break
-        if not notification_exists:
-            raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
-        else:
-            notification_list.pop(idx)
-            collection.update_one({"entity_type": "NotificationList"}, {"$set": {"entity_details": notification_list}})
-        return
+        collection, site_filter = storage.GetSiteCollection(self.site_id, NotificationListCollection, write=True)
+
+        def delete_notification(session):
+            result = collection.update_one(self.NotificationListFilter(True, site_filter), self.RemoveNotificationUpdate(), session=session)
+            if result.matched_count == 0:
+                raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
+            notification_sites.RemoveNotificationSite(self.site_id, self.notification_name, session=session)
+            return result
+        return self.FormatWriteResult(outbox.RunInTransaction(delete_notification))
+
+    async def CreateNotificationAsync(self):
+        collection, site_filter = await storage.GetAsyncSiteCollection(self.site_id, NotificationListCollection, write=True)
+        await self.EnsureNotificationListIndexAsync(collection, site_filter)
+
+        async def create_notification(session):
+            result = await collection.update_one(self.NotificationListFilter(False, site_filter), self.NewNotificationUpdate(), upsert=True, session=session)
+            await notification_sites.UpsertNotificationSiteAsync(self.site_id, self.FormatNotificationForDatabase(), session=session)
+            return result
+        try:
+            result = await outbox.RunInTransactionAsync(create_notification)
+        except pymongo.errors.DuplicateKeyError:
+            raise exceptions.DuplicateNotificationException(self.site_id, self.notification_name)
+        return self.FormatWriteResult(result)
+
+    async def GetNotificationInfoAsync(self):
+        collection, site_filter = await storage.GetAsyncSiteCollection(self.site_id, NotificationListCollection)
+        doc = await collection.find_one(self.NotificationListFilter(True, site_filter), {"_id": 0, "entity_details.$": 1})
+        return self.FormatNotificationFromDatabase(doc)
+
+    async def UpdateNotificationAsync(self):
+        collection, site_filter = await storage.GetAsyncSiteCollection(self.site_id, NotificationListCollection, write=True)
+
+        async def update_notification(session):
+            result = await collection.update_one(self.NotificationListFilter(True, site_filter), self.ReplaceNotificationUpdate(), session=session)
+            if result.matched_count == 0:
+                raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
+            await notification_sites.UpsertNotificationSiteAsync(self.site_id, self.FormatNotificationForDatabase(), session=session)
+            return result
+        return self.FormatWriteResult(await outbox.RunInTransactionAsync(update_notification))
+
+    async def DeleteNotificationAsync(self):
+        collection, site_filter = await storage.GetAsyncSiteCollection(self.site_id, NotificationListCollection, write=True)
+
+        async def delete_notification(session):
+            result = await collection.update_one(self.NotificationListFilter(True, site_filter), self.RemoveNotificationUpdate(), session=session)
+            if result.matched_count == 0:
+                raise exceptions.NotificationDoesNotExistException(self.site_id, self.notification_name)
+            await notification_sites.RemoveNotificationSiteAsync(self.site_id, self.notification_name, session=session)
+            return result
+        return self.FormatWriteResult(await outbox.RunInTransactionAsync(delete_notification))
 
     @property
     def __dict__(self) -> dict:
@@ -0,0 +1,182 @@
+#============================================================================================
+# NOTIFICATION SITES INDEX.
+# Notifications.NotificationSites holds one document per configured (notification_name,
+# site_id) with the notification's metadata and recipient count, so "which sites have this
+# notification, and with what thresholds" is one indexed query instead of a scan of every
+# site's NotificationList. Single-notification writes update it in the same transaction as
+# the site write; bulk writes re-sync the site afterwards. Drift is found and repaired by
+# `python -m app.manage check_notification_sites` / `rebuild_notification_sites`.
+#============================================================================================
+import datetime
+import pymongo
+from .database import get_mongo_client, get_async_mongo_client
+from .constants import NotificationsDatabase, NotificationListCollection, NotificationSitesCollection
+from .exporter import NOTIFICATION_SITES_WORKERS
+from .utils import FormatEmailStringToList
+from . import storage, fanout
+
+ProblemMissing = "missing"
+ProblemStale = "stale"
+ProblemUnexpected = "unexpected"
+ProblemOrphaned = "orphaned"
+
+# The fields of an entry that must match the site's NotificationList.
+EntryFields = ("metadata", "recipient_count")
+EntryProjection = {"_id": 0, "notification_name": 1, "site_id": 1, "metadata": 1, "recipient_count": 1, "updated_at": 1}
+SiteListProjection = {"_id": 0, "entity_details.notification_name": 1, "entity_details.email": 1, "entity_details.metadata": 1}
+
+
+def GetNotificationSitesCollection():
+    return get_mongo_client()[NotificationsDatabase][NotificationSitesCollection]
+
+def GetAsyncNotificationSitesCollection():
+    return get_async_mongo_client()[NotificationsDatabase][NotificationSitesCollection]
+
+def BuildNotificationSiteEntry(site_id: str, notification: dict) -> dict:
+    """The index entry for one entity_details entry, as stored (email is a comma-separated string)."""
+    return {
+        "notification_name": notification.get("notification_name"),
+        "site_id": site_id,
+        "metadata": notification.get("metadata", {}),
+        "recipient_count": len(FormatEmailStringToList(notification.get("email", ""))),
+    }
+
+def EntryFilter(site_id: str, notification_name: str) -> dict:
+    return {"notification_name": notification_name, "site_id": site_id}
+
+def EntryUpdate(entry: dict) -> dict:
+    return {"$set": {**{field: entry[field] for field in EntryFields}, "updated_at": datetime.datetime.utcnow()}}
+
+def UpsertEntryRequest(entry: dict) -> pymongo.UpdateOne:
+    return pymongo.UpdateOne(EntryFilter(entry["site_id"], entry["notification_name"]), EntryUpdate(entry), upsert=True)
+
+def UpsertNotificationSite(site_id: str, notification: dict, session=None) -> None:
+    entry = BuildNotificationSiteEntry(site_id, notification)
+    GetNotificationSitesCollection().update_one(EntryFilter(site_id, entry["notification_name"]), EntryUpdate(entry), upsert=True, session=session)
+
+async def UpsertNotificationSiteAsync(site_id: str, notification: dict, session=None) -> None:
+    entry = BuildNotificationSiteEntry(site_id, notification)
+    await GetAsyncNotificationSitesCollection().update_one(EntryFilter(site_id, entry["notification_name"]), EntryUpdate(entry), upsert=True, session=session)
+
+def RemoveNotificationSite(site_id: str, notification_name: str, session=None) -> None:
+    GetNotificationSitesCollection().delete_one(EntryFilter(site_id, notification_name), session=session)
+
+async def RemoveNotificationSiteAsync(site_id: str, notification_name: str, session=None) -> None:
+    await GetAsyncNotificationSitesCollection().delete_one(EntryFilter(site_id, notification_name), session=session)
+
+
+#============================================================================================
+# QUERIES.
+#============================================================================================
+def NotificationSitesQuery(notification_name: str, cursor: str = None) -> dict:
+    """Entries for notification_name after cursor, which is the last site_id of the previous page."""
+    query = {"notification_name": notification_name}
+    if cursor is not None:
+        query["site_id"] = {"$gt": cursor}
+    return query
+
+def FindNotificationSites(notification_name: str, cursor: str = None, limit: int = None, **kwargs):
+    """Cursor over the entries in site_id order; served by the (notification_name, site_id) index."""
+    notification_sites = GetNotificationSitesCollection().find(
+        NotificationSitesQuery(notification_name, cursor), EntryProjection, **kwargs
+    ).sort("site_id", pymongo.ASCENDING)
+    if limit is not None:
+        notification_sites = notification_sites.limit(limit)
+    return notification_sites
+
+
+#============================================================================================
+# CONSISTENCY CHECK AND REBUILD.
+#============================================================================================
+def GetExpectedEntries(site_id: str, doc) -> dict:
+    """notification_name -> entry for a site's NotificationList document (or None)."""
+    if doc is None:
+        return {}
+    entries = [BuildNotificationSiteEntry(site_id, notification) for notification in doc.get("entity_details", [])]
+    return {entry["notification_name"]: entry for entry in entries}
+
+def DiffSiteEntries(site_id: str, expected: dict, actual: dict) -> list:
+    """Discrepancies between the entries a site should have and the ones it has."""
+    discrepancies = []
+    for notification_name, entry in expected.items():
+        current = actual.get(notification_name)
+        if current is None:
+            discrepancies.append({"site_id": site_id, "notification_name": notification_name, "problem": ProblemMissing})
+        elif any(current.get(field) != entry[field] for field in EntryFields):
+            discrepancies.append({"site_id": site_id, "notification_name": notification_name, "problem": ProblemStale})
+    for notification_name in actual:
+        if notification_name not in expected:
+            discrepancies.append({"site_id": site_id, "notification_name": notification_name, "problem": ProblemUnexpected})
+    return discrepancies
+
+def RepairRequests(site_id: str, expected: dict, discrepancies: list) -> list:
+    requests = []
+    for discrepancy in discrepancies:
+        if discrepancy["problem"] in (ProblemMissing, ProblemStale):
+            requests.append(UpsertEntryRequest(expected[discrepancy["notification_name"]]))
+        else:
+            requests.append(pymongo.DeleteOne(EntryFilter(site_id, discrepancy["notification_name"])))
+    return requests
+
+def CheckSite(site_id: str, repair: bool = False) -> list:
+    """Compare the site's entries with its NotificationList; with repair, write only the differences."""
+    site_collection, site_filter = storage.GetSiteCollection(site_id, NotificationListCollection)
+    expected = GetExpectedEntries(site_id, site_collection.find_one({**site_filter, "entity_type": "NotificationList"}, SiteListProjection))
+    collection = GetNotificationSitesCollection()
+    actual = {entry["notification_name"]: entry for entry in collection.find({"site_id": site_id}, EntryProjection)}
+    discrepancies = DiffSiteEntries(site_id, expected, actual)
+    if repair and discrepancies:
+        collection.bulk_write(RepairRequests(site_id, expected, discrepancies), ordered=False)
+    return discrepancies
+
+def SyncSite(site_id: str) -> list:
+    return CheckSite(site_id, repair=True)
+
+async def SyncSiteAsync(site_id: str) -> list:
+    site_collection, site_filter = await storage.GetAsyncSiteCollection(site_id, NotificationListCollection)
+    expected = GetExpectedEntries(site_id, await site_collection.find_one({**site_filter, "entity_type": "NotificationList"}, SiteListProjection))
+    collection = GetAsyncNotificationSitesCollection()
+    actual = {entry["notification_name"]: entry async for entry in collection.find({"site_id": site_id}, EntryProjection)}
+    discrepancies = DiffSiteEntries(site_id, expected, actual)
+    if discrepancies:
+        await collection.bulk_write(RepairRequests(site_id, expected, discrepancies), ordered=False)
+    return discrepancies
+
+def CheckOrphanedSites(site_ids: list, repair: bool = False) -> list:
+    """Entries whose site is not in site_ids (the whole fleet); with repair, delete them."""
+    collection = GetNotificationSitesCollection()
+    orphaned_site_ids = sorted(set(collection.distinct("site_id")) - set(site_ids))
+    if not orphaned_site_ids:
+        return []
+    discrepancies = [
+        {"site_id": entry["site_id"], "notification_name": entry["notification_name"], "problem": ProblemOrphaned}
+        for entry in collection.find({"site_id": {"$in": orphaned_site_ids}}, EntryProjection)
+    ]
+    if repair:
+        collection.delete_many({"site_id": {"$in": orphaned_site_ids}})
+    return discrepancies
+
+def CheckFleet(site_ids: list, repair: bool = False, include_orphans: bool = True, max_workers: int = NOTIFICATION_SITES_WORKERS, on_site=None) -> tuple:
+    """CheckSite for every site with at most max_workers sites in flight.
+
+    Returns (discrepancies, failures): everything found (and, with repair, fixed)
+    and {site_id: error} for sites that could not be checked. on_site(site_id,
+    discrepancies, error) is called as each site finishes. include_orphans should
+    only be set when site_ids is the whole fleet.
+    """
+    discrepancies, failures = [], {}
+
+    def check_site(site_id):
+        site_discrepancies, error = [], None
+        try:
+            site_discrepancies = CheckSite(site_id, repair)
+            discrepancies.extend(site_discrepancies)
+        except pymongo.errors.PyMongoError as e:
+            error = failures[site_id] = str(e)
+        if on_site is not None:
+            on_site(site_id, site_discrepancies, error)
+
+    fanout.ForEachBounded(check_site, site_ids, max_workers, "notification-sites")
+    if include_orphans:
+        discrepancies.extend(CheckOrphanedSites(site_ids, repair))
+    return discrepancies, failures
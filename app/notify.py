@@ -1,6 +1,7 @@
 import enum
 from datetime import datetime
 from pipes import Template
+from starlette.concurrency import run_in_threadpool
 from . import exceptions, email, utils
 from .exporter import SENDGRID_API_KEY
 from .constants import *
@@ -24,6 +25,26 @@ class NotificationCronEmail():
         self.method = method
         self.metadata = metadata
 
+    def to_outbox_payload(self) -> dict:
+        return {
+            "site_id": self.site_id,
+            "site_name": self.site_name,
+            "cron_type": self.cron_type,
+            "method": self.method.value,
+            "metadata": self.metadata,
+        }
+
+    @classmethod
+    def from_outbox_payload(cls, payload: dict):
+        # The site was validated when the email was queued, so skip the site lookup in __init__.
+        email = cls.__new__(cls)
+        email.site_id = payload["site_id"]
+        email.site_name = payload["site_name"]
+        email.cron_type = payload["cron_type"]
+        email.method = NotificationCronEmailMethods(payload["method"])
+        email.metadata = payload.get("metadata", {})
+        return email
+
     def generate_email_body(self):
         date = datetime.utcnow().strftime("%Y-%m-%d")
         timestamp = datetime.utcnow().strftime("%H:%M %p")
@@ -48,7 +69,7 @@ class NotificationCronEmail():
         email_recepients = FormatEmailStringToList(email_doc.get("emails", ""))
         return email_recepients
 
-    def send_email(self):
+    async def send_email(self):
         email_body = email.render_email_template(NotificationCronEmail.TemplateName, self.generate_email_body())
         # DEV: Debug write output to file
         # email.write_debug_output(email_body)
@@ -56,9 +77,17 @@ class NotificationCronEmail():
             subject = f"Reconfigure Notification Cron - {self.site_name} [{self.site_id}]"
         elif self.method == NotificationCronEmailMethods.DeleteNotificationCron:
             subject = f"Delete Notification Cron - {self.site_name} [{self.site_id}]"
-        email_recepients = self.get_email_recepients()
+        email_recepients = await run_in_threadpool(self.get_email_recepients)
         source_email = NOTIFICATION_SOURCE_EMAIL_ID
         try:
-            email.send_email(source_email, email_recepients, subject, email_body)
+            await email.send_email(source_email, email_recepients, subject, email_body)
         except exceptions.EmailNotSentException as e:
-            raise exceptions.EmailNotSentException(f"Could not send email to {self.method} for site {self.site_name} (SiteID - {self.site_id}). Kindly contact the IT Support Team immediately.")
\ No newline at end of file
+            raise exceptions.EmailNotSentException(f"Could not send email to {self.method} for site {self.site_name} (SiteID - {self.site_id}). Kindly contact the IT Support Team immediately.")
+
+
+def render_notification_cron_emails(emails: list):
+    """Render many NotificationCronEmail bodies with one template lookup."""
+    return email.render_email_templates(
+        NotificationCronEmail.TemplateName,
+        [notification_email.generate_email_body() for notification_email in emails]
+    )
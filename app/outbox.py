@@ -0,0 +1,172 @@
+#============================================================================================
+# TRANSACTIONAL EMAIL OUTBOX.
+# Emails are recorded in the same transaction as the change that triggers them and are
+# delivered later by OutboxDispatcher, so requests never wait on SendGrid.
+#============================================================================================
+import asyncio
+import datetime
+import random
+import pymongo
+from .database import get_mongo_client, get_async_mongo_client
+from .constants import ParkLoyaltyDatabase, EmailOutboxCollection
+from .exporter import *
+from . import notify, profiling
+
+StatusPending = "pending"
+StatusSending = "sending"
+StatusSent = "sent"
+StatusDead = "dead"
+
+
+def BuildOutboxEntry(email: "notify.NotificationCronEmail") -> dict:
+    now = datetime.datetime.utcnow()
+    return {
+        "status": StatusPending,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+        "payload": email.to_outbox_payload(),
+    }
+
+def EnqueueEmail(email, session=None):
+    collection = get_mongo_client()[ParkLoyaltyDatabase][EmailOutboxCollection]
+    with profiling.span("outbox_enqueue"):
+        collection.insert_one(BuildOutboxEntry(email), session=session)
+
+async def EnqueueEmailAsync(email, session=None):
+    collection = get_async_mongo_client()[ParkLoyaltyDatabase][EmailOutboxCollection]
+    with profiling.span("outbox_enqueue"):
+        await collection.insert_one(BuildOutboxEntry(email), session=session)
+
+# Whether the server accepts transactions, detected once when MONGO_TRANSACTIONS_ENABLED is "auto".
+_transactions_supported = None
+
+def IsTransactionCapable(hello: dict) -> bool:
+    """A standalone mongod rejects transactions; replica set members and mongos accept them."""
+    return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+def TransactionsEnabled() -> bool:
+    global _transactions_supported
+    if MONGO_TRANSACTIONS_ENABLED != "auto":
+        return MONGO_TRANSACTIONS_ENABLED == "true"
+    if _transactions_supported is None:
+        _transactions_supported = IsTransactionCapable(get_mongo_client().admin.command("isMaster"))
+    return _transactions_supported
+
+async def TransactionsEnabledAsync() -> bool:
+    global _transactions_supported
+    if MONGO_TRANSACTIONS_ENABLED != "auto":
+        return MONGO_TRANSACTIONS_ENABLED == "true"
+    if _transactions_supported is None:
+        _transactions_supported = IsTransactionCapable(await get_async_mongo_client().admin.command("isMaster"))
+    return _transactions_supported
+
+def RunInTransaction(callback):
+    """Run callback(session) in a transaction, or with session=None when transactions are disabled (standalone mongod)."""
+    if not TransactionsEnabled():
+        return callback(None)
+    with get_mongo_client().start_session() as session:
+        return session.with_transaction(callback)
+
+async def RunInTransactionAsync(callback):
+    """Async RunInTransaction; callback is a coroutine function taking the session."""
+    if not await TransactionsEnabledAsync():
+        return await callback(None)
+    async with await get_async_mongo_client().start_session() as session:
+        return await session.with_transaction(callback)
+
+def GetRetryDelay(attempts: int) -> float:
+    delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class OutboxDispatcher():
+    """Drains the email outbox in the background.
+
+    Due entries are claimed with a lease (so a crashed worker's entries are
+    picked up again), sent with at most max_concurrency emails in flight, and
+    retried with exponential backoff until max_attempts, after which they are
+    marked dead and left for an operator.
+    """
+    def __init__(self, max_concurrency=OUTBOX_MAX_CONCURRENCY, max_attempts=OUTBOX_MAX_ATTEMPTS) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self._task = None
+        self._stopping = asyncio.Event()
+
+    def get_collection(self):
+        return get_async_mongo_client()[ParkLoyaltyDatabase][EmailOutboxCollection]
+
+    async def claim_next(self):
+        now = datetime.datetime.utcnow()
+        return await self.get_collection().find_one_and_update(
+            {"$or": [
+                {"status": StatusPending, "next_attempt_at": {"$lte": now}},
+                {"status": StatusSending, "locked_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": StatusSending, "locked_until": now + datetime.timedelta(seconds=OUTBOX_LEASE_SECONDS)}},
+            sort=[("next_attempt_at", pymongo.ASCENDING)],
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+
+    async def deliver(self, entry) -> None:
+        collection = self.get_collection()
+        try:
+            email = notify.NotificationCronEmail.from_outbox_payload(entry["payload"])
+            await email.send_email()
+        except Exception as e:
+            attempts = entry.get("attempts", 0) + 1
+            update = {"attempts": attempts, "last_error": str(e)}
+            if attempts >= self.max_attempts:
+                update["status"] = StatusDead
+            else:
+                update["status"] = StatusPending
+                update["next_attempt_at"] = datetime.datetime.utcnow() + datetime.timedelta(seconds=GetRetryDelay(attempts))
+            await collection.update_one({"_id": entry["_id"]}, {"$set": update, "$unset": {"locked_until": ""}})
+            return
+        await collection.update_one(
+            {"_id": entry["_id"]},
+            {"$set": {"status": StatusSent, "sent_at": datetime.datetime.utcnow()}, "$unset": {"locked_until": ""}}
+        )
+
+    async def drain_once(self) -> int:
+        """Claim and deliver up to max_concurrency due entries; returns how many were claimed."""
+        deliveries = []
+        while len(deliveries) < self.max_concurrency:
+            entry = await self.claim_next()
+            if entry is None:
+                break
+            deliveries.append(asyncio.create_task(self.deliver(entry)))
+        if deliveries:
+            await asyncio.gather(*deliveries)
+        return len(deliveries)
+
+    async def run(self) -> None:
+        try:
+            await self.get_collection().create_index([("status", pymongo.ASCENDING), ("next_attempt_at", pymongo.ASCENDING)])
+        except Exception as e:
+            print(f"Email outbox index creation failed: {e}")
+        while not self._stopping.is_set():
+            try:
+                claimed = await self.drain_once()
+            except Exception as e:
+                print(f"Email outbox dispatcher error: {e}")
+                claimed = 0
+            if claimed == 0:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+dispatcher = OutboxDispatcher()
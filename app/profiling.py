@@ -0,0 +1,124 @@
+#============================================================================================
+# REQUEST TIMING AND OPT-IN PROFILING.
+# Request phases (auth, site lookup, Mongo writes, rendering, email) are recorded as spans
+# and returned in the Server-Timing header. A request that carries PROFILING_TOKEN in the
+# X-Profile-Request header, or is picked by PROFILING_SAMPLE_RATE, is also profiled with
+# pyinstrument and the report written to PROFILING_OUTPUT_DIR.
+#============================================================================================
+import contextvars
+import datetime
+import hmac
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from pyinstrument import Profiler
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from .exporter import SERVER_TIMING_ENABLED, PROFILING_TOKEN, PROFILING_SAMPLE_RATE, PROFILING_INTERVAL_SECONDS, PROFILING_OUTPUT_DIR
+
+ProfileRequestHeader = b"x-profile-request"
+ProfileIdHeader = "X-Profile-Id"
+ServerTimingHeader = "Server-Timing"
+# Total time until the response headers were sent.
+AppSpanName = "app"
+
+# Spans of the current request; None outside a timed request, which makes span() a no-op.
+# The list object is shared with threadpool calls, which run in a copy of the context.
+_spans = contextvars.ContextVar("request_timing_spans", default=None)
+# pyinstrument runs one profiler per thread, so at most one request is profiled at a time.
+_profile_lock = threading.Lock()
+
+
+class span():
+    """Time a block as one Server-Timing entry: `with profiling.span("auth"): ...`."""
+    __slots__ = ("name", "spans", "started_at")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self):
+        self.spans = _spans.get()
+        if self.spans is not None:
+            self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        if self.spans is not None:
+            self.spans.append((self.name, time.perf_counter() - self.started_at))
+        return False
+
+
+def format_server_timing(spans: list, total_seconds: float) -> str:
+    """Sum repeated spans by name (in first-seen order) and render them in milliseconds."""
+    durations = {}
+    for name, seconds in spans:
+        durations[name] = durations.get(name, 0.0) + seconds
+    durations[AppSpanName] = total_seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in durations.items())
+
+
+def wants_profile(scope) -> bool:
+    if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return True
+    if not PROFILING_TOKEN:
+        return False
+    for header_name, header_value in scope["headers"]:
+        if header_name == ProfileRequestHeader:
+            return hmac.compare_digest(header_value, PROFILING_TOKEN.encode("utf-8"))
+    return False
+
+
+def get_profile_id(scope) -> str:
+    path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+    return f"{datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{path}-{uuid.uuid4().hex[:8]}"
+
+
+def save_profile(profiler: Profiler, profile_id: str) -> str:
+    os.makedirs(PROFILING_OUTPUT_DIR, exist_ok=True)
+    file_path = os.path.join(PROFILING_OUTPUT_DIR, profile_id + ".html")
+    with open(file_path, "w") as fh:
+        fh.write(profiler.output_html())
+    return file_path
+
+
+class RequestTimingMiddleware():
+    """ASGI middleware that collects span() timings into Server-Timing and runs opt-in profiles."""
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profiler = profile_id = None
+        if (PROFILING_SAMPLE_RATE > 0 or PROFILING_TOKEN) and wants_profile(scope) and _profile_lock.acquire(blocking=False):
+            profile_id = get_profile_id(scope)
+            profiler = Profiler(interval=PROFILING_INTERVAL_SECONDS, async_mode="enabled")
+            profiler.start()
+        elif not SERVER_TIMING_ENABLED:
+            return await self.app(scope, receive, send)
+
+        spans = []
+        spans_token = _spans.set(spans)
+        started_at = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(ServerTimingHeader, format_server_timing(spans, time.perf_counter() - started_at))
+                if profile_id is not None:
+                    headers.append(ProfileIdHeader, profile_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(spans_token)
+            if profiler is not None:
+                try:
+                    profiler.stop()
+                    await run_in_threadpool(save_profile, profiler, profile_id)
+                finally:
+                    _profile_lock.release()
@@ -1,4 +1,5 @@
 from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
 
 def InternalResponseModel(status, response, metadata):
     return {
@@ -14,6 +15,10 @@ def ResponseModel(data, status, message):
         "message": message,
     }
 
+def JSONResponseModel(data, status, message, status_code: int = 200, headers=None):
+    # Returning a Response skips FastAPI's jsonable_encoder pass; orjson encodes enums and datetimes itself.
+    return ORJSONResponse(ResponseModel(data, status, message), status_code=status_code, headers=headers)
+
 def ErrorResponseModel(error, status, message):
     return {"error": error, "status": status, "message": message}
 
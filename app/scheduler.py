@@ -0,0 +1,328 @@
+#============================================================================================
+# IN-PROCESS DUE-NOTIFICATION SCHEDULER.
+# Every CronSettings schedule sits in one min-heap keyed on its next fire time. Due
+# (site_id, notification_name) jobs go to a bounded worker pool. Only the instance holding
+# the scheduler lease in Mongo fires jobs.
+#============================================================================================
+import datetime
+import heapq
+import itertools
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pymongo
+from .database import get_mongo_client
+from .constants import ParkLoyaltyDatabase, CronSettingsCollection, SchedulerLeaseCollection, DueNotificationsCollection
+from .exporter import *
+from . import forecast, models
+
+SchedulerLeaseId = "notification-scheduler"
+
+
+class DueJob():
+    __slots__ = ("cron_type", "site_id", "notification_name", "fire_at")
+
+    def __init__(self, cron_type, site_id, notification_name, fire_at) -> None:
+        self.cron_type = cron_type
+        self.site_id = site_id
+        self.notification_name = notification_name
+        self.fire_at = fire_at
+
+
+def RecordDueNotification(job: DueJob) -> None:
+    """Default job handler: record the due notification once per (cron_type, site_id, fire_at)."""
+    collection = get_mongo_client()[ParkLoyaltyDatabase][DueNotificationsCollection]
+    try:
+        collection.insert_one({
+            "cron_type": job.cron_type,
+            "site_id": job.site_id,
+            "notification_name": job.notification_name,
+            "fire_at": datetime.datetime.utcfromtimestamp(job.fire_at),
+            "created_at": datetime.datetime.utcnow(),
+        })
+    except pymongo.errors.DuplicateKeyError:
+        # Already recorded by a previous lease holder.
+        pass
+
+
+class SchedulerLease():
+    """A single lease document; whoever renews it before expires_at is the active scheduler."""
+    def __init__(self, lease_seconds: float = SCHEDULER_LEASE_SECONDS) -> None:
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.expires_at = 0.0
+
+    def get_collection(self):
+        return get_mongo_client()[ParkLoyaltyDatabase][SchedulerLeaseCollection]
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; returns whether this instance holds it."""
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(seconds=self.lease_seconds)
+        try:
+            self.get_collection().find_one_and_update(
+                {"_id": SchedulerLeaseId, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": expires_at}},
+                upsert=True
+            )
+        except pymongo.errors.DuplicateKeyError:
+            # The lease exists and is held by another live instance.
+            self.expires_at = 0.0
+            return False
+        self.expires_at = time.time() + self.lease_seconds
+        return True
+
+    def held(self) -> bool:
+        return time.time() < self.expires_at
+
+    def release(self) -> None:
+        if self.expires_at:
+            self.get_collection().delete_one({"_id": SchedulerLeaseId, "owner": self.owner})
+            self.expires_at = 0.0
+
+
+class NotificationScheduler():
+    """Min-heap of (next_fire_at, seq, key) over every (cron_type, site_id) schedule.
+
+    load() compiles all settings into one ForecastEngine and seeds the heap with
+    a single vectorized pass. Schedules changed later get their own one-row
+    engine. A heap entry is valid only while its seq matches the schedule's
+    current seq, so upserts and removals never search the heap. Fired entries are
+    rescheduled in one vectorized call per engine. tick() holds no I/O so it can
+    be driven with a synthetic clock.
+    """
+    def __init__(self, handler=RecordDueNotification, max_workers: int = SCHEDULER_WORKERS,
+                 max_pending: int = SCHEDULER_MAX_PENDING_JOBS) -> None:
+        self.handler = handler
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.running = False
+        self.lease = SchedulerLease()
+        self._heap = []
+        self._schedules = {}
+        self._setting_ids = {}
+        self._seq = itertools.count()
+        self._cron_notification_names = {}
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+    def get_collection(self):
+        return get_mongo_client()[ParkLoyaltyDatabase][CronSettingsCollection]
+
+    def load_settings(self, cron_settings, now: float = None) -> None:
+        """Replace every schedule; cron_settings holds (cron_type, site_id, setting) tuples."""
+        cron_settings = list(cron_settings)
+        engine = forecast.ForecastEngine()
+        engine.compile(cron_settings)
+        fire_times = engine.next_fire_times(time.time() if now is None else now, 1)[:, 0].tolist()
+        with self._condition:
+            self._cron_notification_names = models.get_cron_notification_names()
+            self._schedules = {}
+            self._heap = []
+            for row, (cron_type, site_id) in enumerate(zip(engine.cron_types, engine.site_ids)):
+                seq = next(self._seq)
+                self._schedules[(cron_type, site_id)] = (engine, row, seq)
+                self._heap.append((fire_times[row], seq, (cron_type, site_id)))
+            heapq.heapify(self._heap)
+            self._loaded = True
+            self._condition.notify()
+
+    def load(self) -> int:
+        get_mongo_client()[ParkLoyaltyDatabase][DueNotificationsCollection].create_index(
+            [("cron_type", pymongo.ASCENDING), ("site_id", pymongo.ASCENDING), ("fire_at", pymongo.ASCENDING)],
+            unique=True
+        )
+        setting_docs = list(self.get_collection().find(models.ActiveCronSettingFilter, {"cron_type": 1, "site_id": 1, "setting": 1}))
+        self._setting_ids = {setting_doc["_id"]: (setting_doc["cron_type"], setting_doc["site_id"]) for setting_doc in setting_docs}
+        self.load_settings(
+            (setting_doc["cron_type"], setting_doc["site_id"], setting_doc.get("setting", {}))
+            for setting_doc in setting_docs
+        )
+        return len(self._schedules)
+
+    def upsert(self, cron_type: str, site_id: str, setting: dict, now: float = None) -> None:
+        if not self._loaded:
+            return
+        engine = forecast.ForecastEngine()
+        engine.compile([(cron_type, site_id, setting)])
+        if len(engine) == 0:
+            self.remove(cron_type, site_id)
+            return
+        fire_at = int(engine.next_fire_times(time.time() if now is None else now, 1)[0, 0])
+        with self._condition:
+            seq = next(self._seq)
+            self._schedules[(cron_type, site_id)] = (engine, 0, seq)
+            heapq.heappush(self._heap, (fire_at, seq, (cron_type, site_id)))
+            self._condition.notify()
+
+    def remove(self, cron_type: str, site_id: str) -> None:
+        # The heap entry is left behind and skipped once its seq no longer matches.
+        with self._condition:
+            self._schedules.pop((cron_type, site_id), None)
+
+    def next_fire_at(self):
+        with self._condition:
+            self._discard_stale_locked()
+            return self._heap[0][0] if self._heap else None
+
+    def _discard_stale_locked(self) -> None:
+        while self._heap:
+            _, seq, key = self._heap[0]
+            schedule = self._schedules.get(key)
+            if schedule is not None and schedule[2] == seq:
+                return
+            heapq.heappop(self._heap)
+            if len(self._heap) > 2 * len(self._schedules) + 1024:
+                # Mostly stale after many upserts; rebuild instead of popping one by one.
+                self._heap = [entry for entry in self._heap if self._schedules.get(entry[2], (None, None, None))[2] == entry[1]]
+                heapq.heapify(self._heap)
+
+    def tick(self, now: float) -> list:
+        """Pop every schedule due at or before now, reschedule it, and return the DueJobs to run.
+
+        Runs more than SCHEDULER_MISFIRE_GRACE_SECONDS late are skipped rather than fired.
+        """
+        jobs = []
+        with self._condition:
+            due = {}
+            while True:
+                self._discard_stale_locked()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                fire_at, seq, key = heapq.heappop(self._heap)
+                engine, row, _ = self._schedules[key]
+                if now - fire_at <= SCHEDULER_MISFIRE_GRACE_SECONDS:
+                    jobs.append(DueJob(key[0], key[1], self._cron_notification_names.get(key[0]), fire_at))
+                due.setdefault(id(engine), (engine, []))[1].append((row, seq, key, fire_at))
+            for engine, entries in due.values():
+                next_fire_times = self._next_fire_times_after(engine, [entry[0] for entry in entries], now)
+                for (_, seq, key, _), next_fire_at in zip(entries, next_fire_times):
+                    heapq.heappush(self._heap, (next_fire_at, seq, key))
+        return jobs
+
+    @staticmethod
+    def _next_fire_times_after(engine, rows: list, now: float) -> list:
+        """Each row's next fire time strictly after now.
+
+        A schedule rescheduled at or before now would be popped again by the next
+        tick without the clock moving (a busy loop), so such a time is skipped.
+        """
+        after = math.floor(now) + 1
+        next_fire_times = engine.next_fire_times(after, 1, rows=rows)[:, 0].tolist()
+        for position, next_fire_at in enumerate(next_fire_times):
+            if next_fire_at > now:
+                continue
+            print(f"Scheduler: {engine.cron_types[rows[position]]} for {engine.site_ids[rows[position]]} forecast {next_fire_at} at {now}; skipping ahead")
+            retry_at = max(after, next_fire_at) + 60
+            next_fire_times[position] = max(int(engine.next_fire_times(retry_at, 1, rows=[rows[position]])[0, 0]), retry_at)
+        return next_fire_times
+
+    def _run_job(self, job: DueJob) -> None:
+        try:
+            # The job may have queued past the lease; by then another instance fires it.
+            if not self.lease.held():
+                print(f"Scheduler lease lost; dropping {job.cron_type} for {job.site_id} at {job.fire_at}")
+                return
+            self.handler(job)
+        except Exception as e:
+            print(f"Scheduler job {job.cron_type} for {job.site_id} failed: {e}")
+        finally:
+            self._pending.release()
+
+    def dispatch(self, jobs: list) -> None:
+        for position, job in enumerate(jobs):
+            # Blocks once max_pending jobs are queued so a slow handler applies back-pressure,
+            # but not past the lease: after that another instance may be firing the same jobs.
+            if not self._pending.acquire(timeout=max(0.0, self.lease.expires_at - time.time())):
+                print(f"Scheduler lease expired with {len(jobs) - position} jobs undispatched")
+                return
+            if not self.lease.held():
+                self._pending.release()
+                print(f"Scheduler lease expired with {len(jobs) - position} jobs undispatched")
+                return
+            self._executor.submit(self._run_job, job)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                if not self.lease.held() or self.lease.expires_at - time.time() < SCHEDULER_LEASE_SECONDS / 2:
+                    if not self.lease.acquire():
+                        self._loaded = False
+                        self._stop_event.wait(SCHEDULER_LEASE_SECONDS / 2)
+                        continue
+                if not self._loaded:
+                    self.load()
+                self.dispatch(self.tick(time.time()))
+                next_fire_at = self.next_fire_at()
+                wait_seconds = SCHEDULER_LEASE_SECONDS / 4
+                if next_fire_at is not None:
+                    wait_seconds = max(0.0, min(wait_seconds, next_fire_at - time.time()))
+                with self._condition:
+                    self._condition.wait(wait_seconds)
+            except pymongo.errors.PyMongoError as e:
+                print(f"Scheduler error: {e}")
+                self._stop_event.wait(SCHEDULER_LEASE_SECONDS / 4)
+
+    def _watch(self) -> None:
+        with self.get_collection().watch(full_document="updateLookup", max_await_time_ms=1000) as stream:
+            while not self._stop_event.is_set():
+                change = stream.try_next()
+                if change is None or not self._loaded:
+                    continue
+                if change["operationType"] in ("insert", "update", "replace") and change.get("fullDocument"):
+                    setting_doc = change["fullDocument"]
+                    self._setting_ids[setting_doc["_id"]] = (setting_doc["cron_type"], setting_doc["site_id"])
+                    if models.IsCronSettingTombstone(setting_doc):
+                        self.remove(setting_doc["cron_type"], setting_doc["site_id"])
+                        continue
+                    self.upsert(setting_doc["cron_type"], setting_doc["site_id"], setting_doc.get("setting", {}))
+                elif change["operationType"] == "delete":
+                    key = self._setting_ids.pop(change["documentKey"]["_id"], None)
+                    if key is not None:
+                        self.remove(*key)
+
+    def _refresh(self) -> None:
+        # Settings changed on other instances reach the leader through the change stream, or
+        # (standalone mongod) through a full reload every SCHEDULER_RELOAD_SECONDS.
+        while not self._stop_event.is_set():
+            try:
+                self._watch()
+            except pymongo.errors.OperationFailure:
+                while not self._stop_event.wait(SCHEDULER_RELOAD_SECONDS):
+                    if self._loaded:
+                        self.load()
+            except pymongo.errors.PyMongoError as e:
+                print(f"Scheduler refresh error: {e}")
+                self._stop_event.wait(SCHEDULER_RELOAD_SECONDS)
+
+    def start(self) -> None:
+        self.running = True
+        self._stop_event.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scheduler-job")
+        threading.Thread(target=self._run, name="notification-scheduler", daemon=True).start()
+        threading.Thread(target=self._refresh, name="notification-scheduler-refresh", daemon=True).start()
+
+    def stop(self) -> None:
+        self.running = False
+        self._loaded = False
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        try:
+            self.lease.release()
+        except pymongo.errors.PyMongoError as e:
+            print(f"Scheduler lease release error: {e}")
+
+scheduler = NotificationScheduler()
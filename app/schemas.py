@@ -10,6 +10,13 @@ class SiteNotificationPayload(BaseModel):
     class Config:
         orm_mode = True
 
+class BulkSiteNotificationPayload(BaseModel):
+    notifications: List[SiteNotificationPayload]
+    ordered: Optional[bool] = True
+
+    class Config:
+        orm_mode = True
+
 class EnforcementHoursPayload(BaseModel):
     enforcement_from: str
     enforcement_to: str
@@ -23,6 +30,22 @@ class NotificationCronInfoPayload(BaseModel):
     freq: Optional[str] = None
     beat_freq: Optional[str] = None
     beat_time: Optional[str] = None
+    cron_expression: Optional[str] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class AdminJobPayload(BaseModel):
+    action: str
+    payload: Dict
+    site_ids: Optional[List[str]] = None
+    site_query: Optional[Dict] = None
+
+    class Config:
+        orm_mode = True
+
+class EvictTokenPayload(BaseModel):
+    token: str
+
+    class Config:
+        orm_mode = True
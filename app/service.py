@@ -1,9 +1,11 @@
 import site
 import pymongo
+import datetime
 from pytz import timezone
 from .database import get_mongo_client
 from .constants import *
-from . import exceptions, models, utils, notify
+from .exporter import LIST_CURSOR_BATCH_SIZE
+from . import exceptions, models, utils, notify, outbox, scheduler, profiling, storage, notification_sites
 
 def GetNotificationList(filters: dict):
     db_instance = get_mongo_client()[NotificationsDatabase]
@@ -11,24 +13,95 @@ def GetNotificationList(filters: dict):
     notification_documents = collection.find(filters)
     notification_list = []
     for notification_document in notification_documents:
-        notification = {}
-        notification["notification_name"] = notification_document.get("notification_name", "")
-        Notification = models.get_notification_class(notification["notification_name"])
-        notification["notification_cron_name"] = Notification.NotificationCronName
-        notification["cron_type"] = Notification.NotificationCronType
-        notification["is_cron_configurable"] = Notification.isCronConfigurable
-        notification["metadata_keys"] = Notification.NotificationMetadataKeys
-        notification_list.append(notification)
+        notification_list.append(FormatNotificationListEntry(notification_document))
     return notification_list
 
-def GetSiteNotificationList(site_id: str):
-    db_instance = get_mongo_client()[site_id]
+def FormatNotificationListEntry(notification_document: dict):
+    notification = {}
+    notification["notification_name"] = notification_document.get("notification_name", "")
+    Notification = models.get_notification_class(notification["notification_name"])
+    notification["notification_cron_name"] = Notification.NotificationCronName
+    notification["cron_type"] = Notification.NotificationCronType
+    notification["is_cron_configurable"] = Notification.isCronConfigurable
+    notification["metadata_keys"] = Notification.NotificationMetadataKeys
+    return notification
+
+# Paged and streamed reads fetch only the name; everything else comes from the class registry.
+NotificationListProjection = {"notification_name": 1}
+
+def NotificationListQuery(filters: dict, cursor: str = None) -> dict:
+    query = dict(filters)
+    if cursor is not None:
+        query["_id"] = {"$gt": utils.parse_object_id_cursor(cursor)}
+    return query
+
+def GetNotificationListPage(filters: dict, cursor: str = None, limit: int = 100):
+    """Return (notification_list, next_cursor); the cursor is the last _id of the page."""
+    db_instance = get_mongo_client()[NotificationsDatabase]
     collection = db_instance[NotificationListCollection]
-    notification_list = list(collection.find({}, {"_id": 0}))
+    notification_documents = list(
+        collection.find(NotificationListQuery(filters, cursor), NotificationListProjection).sort("_id", pymongo.ASCENDING).limit(limit + 1)
+    )
+    next_cursor = str(notification_documents[limit - 1]["_id"]) if len(notification_documents) > limit else None
+    return [FormatNotificationListEntry(doc) for doc in notification_documents[:limit]], next_cursor
+
+def IterNotificationList(filters: dict, cursor: str = None, limit: int = None):
+    db_instance = get_mongo_client()[NotificationsDatabase]
+    collection = db_instance[NotificationListCollection]
+    notification_documents = collection.find(
+        NotificationListQuery(filters, cursor), NotificationListProjection, batch_size=LIST_CURSOR_BATCH_SIZE
+    ).sort("_id", pymongo.ASCENDING)
+    if limit is not None:
+        notification_documents = notification_documents.limit(limit)
+    return (FormatNotificationListEntry(doc) for doc in notification_documents)
+
+def GetNotificationSitesPage(notification_name: str, cursor: str = None, limit: int = 100):
+    """Return (notification_sites, next_cursor); the cursor is the last site_id of the page."""
+    models.get_notification_class(notification_name)
+    notification_sites_page = list(notification_sites.FindNotificationSites(notification_name, cursor, limit + 1))
+    next_cursor = notification_sites_page[limit - 1]["site_id"] if len(notification_sites_page) > limit else None
+    return notification_sites_page[:limit], next_cursor
+
+def IterNotificationSites(notification_name: str, cursor: str = None, limit: int = None):
+    models.get_notification_class(notification_name)
+    return notification_sites.FindNotificationSites(notification_name, cursor, limit, batch_size=LIST_CURSOR_BATCH_SIZE)
+
+def GetSiteNotificationList(site_id: str):
+    collection, site_filter = storage.GetSiteCollection(site_id, NotificationListCollection)
+    notification_list = list(collection.find(site_filter, {"_id": 0}))
     if notification_list:
         return notification_list[0].get("entity_details", [])
     return notification_list
 
+def SiteNotificationListPipeline(offset: int, limit: int = None, site_filter: dict = {}) -> list:
+    pipeline = [
+        {"$match": {**site_filter, "entity_type": "NotificationList"}},
+        {"$project": {"_id": 0, "entity_details": 1}},
+        {"$unwind": "$entity_details"},
+        {"$replaceRoot": {"newRoot": "$entity_details"}},
+        {"$skip": offset},
+    ]
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    return pipeline
+
+def GetSiteNotificationListPage(site_id: str, cursor: str = None, limit: int = 100):
+    """Return (notification_list, next_cursor); the cursor is an offset into entity_details."""
+    offset = utils.parse_offset_cursor(cursor)
+    collection, site_filter = storage.GetSiteCollection(site_id, NotificationListCollection)
+    doc = collection.find_one(
+        {**site_filter, "entity_type": "NotificationList"},
+        {"_id": 0, "entity_details": {"$slice": [offset, limit + 1]}}
+    )
+    notification_list = doc.get("entity_details", []) if doc else []
+    next_cursor = str(offset + limit) if len(notification_list) > limit else None
+    return notification_list[:limit], next_cursor
+
+def IterSiteNotificationList(site_id: str, cursor: str = None, limit: int = None):
+    offset = utils.parse_offset_cursor(cursor)
+    collection, site_filter = storage.GetSiteCollection(site_id, NotificationListCollection)
+    return collection.aggregate(SiteNotificationListPipeline(offset, limit, site_filter), batchSize=LIST_CURSOR_BATCH_SIZE)
+
 def CreateNotification(payload: dict):
     notification_name = payload.get("notification_name", "")
     Notification = models.get_notification_class(notification_name)
@@ -37,8 +110,7 @@ def CreateNotification(payload: dict):
         email_recipients=payload.get("email_recipients", []),
         metadata=payload.get("metadata", {})
     )
-    notification.CreateNotification()
-    return
+    return notification.CreateNotification()
 
 def UpdateNotification(payload: dict):
     notification_name = payload.get("notification_name", "")
@@ -48,8 +120,7 @@ def UpdateNotification(payload: dict):
         email_recipients=payload.get("email_recipients", []),
         metadata=payload.get("metadata", {})
     )
-    notification.UpdateNotification()
-    return
+    return notification.UpdateNotification()
 
 def DeleteNotification(payload: dict):
     notification_name = payload.get("notification_name", "")
@@ -57,8 +128,7 @@ def DeleteNotification(payload: dict):
     notification = Notification(
         site_id=payload.get("site_id", "")
     )
-    notification.DeleteNotification()
-    return
+    return notification.DeleteNotification()
 
 def GetNotificationInfo(site_id: str, notification_name: str):
     Notification = models.get_notification_class(notification_name)
@@ -67,18 +137,127 @@ def GetNotificationInfo(site_id: str, notification_name: str):
     )
     return notification.GetNotificationInfo()
 
+BulkStatusApplied = "applied"
+BulkStatusFailed = "failed"
+BulkStatusSkipped = "skipped"
+
+def GetSiteNotificationNames(site_id: str) -> set:
+    collection, site_filter = storage.GetSiteCollection(site_id, NotificationListCollection)
+    doc = collection.find_one({**site_filter, "entity_type": "NotificationList"}, {"_id": 0, "entity_details.notification_name": 1})
+    return FormatSiteNotificationNames(doc)
+
+def FormatSiteNotificationNames(doc) -> set:
+    if doc is None:
+        return set()
+    return {notification.get("notification_name") for notification in doc.get("entity_details", [])}
+
+def PlanBulkNotificationWrite(site_id: str, operation: str, notifications: list, existing_names: set, ordered: bool, site_filter: dict = {}):
+    """Validate every entry against the registry and the site's current notifications.
+
+    Returns (results, requests, request_items): one result per entry, the bulk_write
+    requests for the entries that passed, and the entry index behind each request.
+    In ordered mode everything after the first failure is skipped.
+    """
+    names = set(existing_names)
+    results, requests, request_items = [], [], []
+    failed = False
+    for item_idx, item in enumerate(notifications):
+        notification_name = item.get("notification_name", "")
+        result = {"index": item_idx, "notification_name": notification_name, "status": BulkStatusApplied, "error": None}
+        results.append(result)
+        if failed and ordered:
+            result["status"] = BulkStatusSkipped
+            continue
+        try:
+            Notification = models.get_notification_class(notification_name)
+            if operation == models.BulkOperationCreate and notification_name in names:
+                raise exceptions.DuplicateNotificationException(site_id, notification_name)
+            if operation != models.BulkOperationCreate and notification_name not in names:
+                raise exceptions.NotificationDoesNotExistException(site_id, notification_name)
+            notification = Notification(
+                site_id=site_id,
+                email_recipients=item.get("email_recipients", []),
+                metadata=item.get("metadata", {})
+            )
+        except (exceptions.InvalidNotificationException, exceptions.DuplicateNotificationException, exceptions.NotificationDoesNotExistException) as e:
+            result["status"], result["error"] = BulkStatusFailed, str(e)
+            failed = True
+            continue
+        if operation == models.BulkOperationDelete:
+            names.discard(notification_name)
+        else:
+            names.add(notification_name)
+        requests.append(notification.BulkWriteRequest(operation, site_filter))
+        request_items.append(item_idx)
+    return results, requests, request_items
+
+def ApplyBulkWriteErrors(site_id: str, results: list, request_items: list, write_errors: list, ordered: bool) -> None:
+    for write_error in write_errors:
+        result = results[request_items[write_error["index"]]]
+        result["status"] = BulkStatusFailed
+        if write_error.get("code") == 11000:
+            result["error"] = str(exceptions.DuplicateNotificationException(site_id, result["notification_name"]))
+        else:
+            result["error"] = write_error.get("errmsg", "Write failed")
+    if ordered and write_errors:
+        for item_idx in request_items[write_errors[0]["index"] + 1:]:
+            results[item_idx]["status"] = BulkStatusSkipped
+
+def ReconcileBulkNotificationWrite(site_id: str, operation: str, results: list, names_after: set) -> None:
+    """Mark entries whose write matched nothing because the list changed after it was read."""
+    for result in results:
+        if result["status"] != BulkStatusApplied:
+            continue
+        present = result["notification_name"] in names_after
+        if operation == models.BulkOperationDelete and present:
+            result["status"], result["error"] = BulkStatusFailed, "Notification changed concurrently; nothing was deleted."
+        elif operation != models.BulkOperationDelete and not present:
+            result["status"] = BulkStatusFailed
+            result["error"] = str(exceptions.NotificationDoesNotExistException(site_id, result["notification_name"]))
+
+def CountBulkWriteMatches(result) -> int:
+    return result.matched_count + result.upserted_count
+
+def BulkWriteNotifications(payload: dict, operation: str):
+    site_id = payload.get("site_id", "")
+    ordered = payload.get("ordered", True)
+    collection, site_filter = storage.GetSiteCollection(site_id, NotificationListCollection, write=True)
+    results, requests, request_items = PlanBulkNotificationWrite(
+        site_id, operation, payload.get("notifications", []), GetSiteNotificationNames(site_id), ordered, site_filter
+    )
+    if not requests:
+        return results
+    models.SiteNotification(site_id, []).EnsureNotificationListIndex(collection, site_filter)
+    try:
+        result = collection.bulk_write(requests, ordered=ordered)
+        matched, expected = CountBulkWriteMatches(result), len(requests)
+    except pymongo.errors.BulkWriteError as e:
+        ApplyBulkWriteErrors(site_id, results, request_items, e.details.get("writeErrors", []), ordered)
+        matched = e.details.get("nMatched", 0) + e.details.get("nUpserted", 0)
+        expected = sum(1 for result in results if result["status"] == BulkStatusApplied)
+    if matched < expected:
+        ReconcileBulkNotificationWrite(site_id, operation, results, GetSiteNotificationNames(site_id))
+    # Bulk writes can partially apply, so the site's NotificationSites entries are re-synced from its list.
+    notification_sites.SyncSite(site_id)
+    return results
+
+def BulkCreateNotifications(payload: dict):
+    return BulkWriteNotifications(payload, models.BulkOperationCreate)
+
+def BulkUpdateNotifications(payload: dict):
+    return BulkWriteNotifications(payload, models.BulkOperationUpdate)
+
+def BulkDeleteNotifications(payload: dict):
+    return BulkWriteNotifications(payload, models.BulkOperationDelete)
+
 def GetEnforcementHours(site_id: str):
-    db_instance = get_mongo_client()[site_id]
-    collection = db_instance[ConfigurationListCollection]
-    enforcement_config = collection.find_one({"config_type": "enforcement_hours"})
+    collection, site_filter = storage.GetSiteCollection(site_id, ConfigurationListCollection)
+    enforcement_config = collection.find_one({**site_filter, "config_type": "enforcement_hours"})
     if enforcement_config is None:
         return {}
     return enforcement_config.get("metadata", {})
 
-def SetEnforcementHours(payload: dict):
-    site_id = payload.get("site_id")
-    db_instance = get_mongo_client()[site_id]
-    collection = db_instance[ConfigurationListCollection]
+def BuildEnforcementHoursConfig(payload: dict):
     utils.validate_enforcement_hours(payload.get("enforcement_from", ""), payload.get("enforcement_to", ""))
     enforcement_config = {
         "config_type": "enforcement_hours",
@@ -87,14 +266,19 @@ def SetEnforcementHours(payload: dict):
             "enforcement_to": payload.get("enforcement_to", "23:59")
         }
     }
-    collection.update_one({"config_type": "enforcement_hours"}, {"$set": enforcement_config}, upsert=True)
+    return enforcement_config
+
+def SetEnforcementHours(payload: dict):
+    site_id = payload.get("site_id")
+    collection, site_filter = storage.GetSiteCollection(site_id, ConfigurationListCollection, write=True)
+    enforcement_config = BuildEnforcementHoursConfig(payload)
+    collection.update_one({**site_filter, "config_type": "enforcement_hours"}, {"$set": enforcement_config}, upsert=True)
     return
 
 def DeleteEnforcementHours(payload: dict):
     site_id = payload.get("site_id")
-    db_instance = get_mongo_client()[site_id]
-    collection = db_instance[ConfigurationListCollection]
-    collection.delete_one({"config_type": "enforcement_hours"})
+    collection, site_filter = storage.GetSiteCollection(site_id, ConfigurationListCollection, write=True)
+    collection.delete_one({**site_filter, "config_type": "enforcement_hours"})
     return
 
 def GetTimezoneList():
@@ -111,38 +295,99 @@ def SetTimezoneList():
     for timezone_doc in timezone_docs:
         timezone_doc["offset"] = timezone_doc["offset_str"]
         timezone_doc.pop("offset_str")
+        # $set rather than $setOnInsert so offsets stored before a DST change are corrected.
         requests.append(
                 pymongo.UpdateOne(
-                    {"timezone": timezone_doc["timezone"]}, {"$setOnInsert": timezone_doc}, upsert=True
+                    {"timezone": timezone_doc["timezone"]}, {"$set": timezone_doc}, upsert=True
                 )
             )
     collection.bulk_write(requests) 
 
-def GetNotificationCronInfo(site_id: str, notification_name: str):
+# Cron settings are stored one document per (cron_type, site_id) in CronSettings.
+# This pipeline folds them back into the legacy Crons shape: {cron_type, sites, mapping}.
+CronInfoViewPipeline = [
+    {"$match": models.ActiveCronSettingFilter},
+    {"$sort": {"cron_type": 1, "site_id": 1}},
+    {"$group": {
+        "_id": "$cron_type",
+        "sites": {"$push": "$site_id"},
+        "mapping": {"$push": {"k": "$site_id", "v": "$setting"}},
+    }},
+    {"$project": {"_id": 0, "cron_type": "$_id", "sites": 1, "mapping": {"$arrayToObject": "$mapping"}}},
+]
+
+_cron_settings_indexed = False
+
+def GetCronSettingsCollection():
+    global _cron_settings_indexed
     db_instance = get_mongo_client()[ParkLoyaltyDatabase]
-    collection = db_instance[CronInfoCollection]
+    collection = db_instance[CronSettingsCollection]
+    if not _cron_settings_indexed:
+        collection.create_index([("cron_type", pymongo.ASCENDING), ("site_id", pymongo.ASCENDING)], unique=True)
+        _cron_settings_indexed = True
+    return collection
+
+def GetLegacyCronInfoCollection():
+    return get_mongo_client()[ParkLoyaltyDatabase][CronInfoCollection]
+
+# Until MigrateCronInfo has run, a site's setting may exist only in the legacy Crons
+# document for its cron_type. Reads fall back to it and deletes remove the site from it,
+# so a later (re-)run of the migration cannot bring a deleted setting back.
+def LegacyCronSettingQuery(cron_type: str, site_id: str):
+    return {"cron_type": cron_type, "sites": site_id}
+
+def LegacyCronSettingProjection(site_id: str):
+    return {"_id": 0, f"mapping.{site_id}": 1}
+
+def LegacyCronSettingRemoval(site_id: str):
+    return {"$pull": {"sites": site_id}, "$unset": {f"mapping.{site_id}": ""}}
+
+def CronSettingTombstoneUpdate():
+    """Replaces a deleted setting with a tombstone, so MigrateCronInfo's $setOnInsert cannot restore it."""
+    return {"$set": {**models.CronSettingTombstone, "updated_at": datetime.datetime.utcnow()}, "$unset": {"setting": ""}}
+
+def GetCronInfoView(cron_type: str = None):
+    collection = GetCronSettingsCollection()
+    pipeline = CronInfoViewPipeline
+    if cron_type is not None:
+        pipeline = [{"$match": {"cron_type": cron_type}}] + pipeline
+    return list(collection.aggregate(pipeline))
+
+def GetNotificationCronInfo(site_id: str, notification_name: str):
     notification = models.get_notification_class(notification_name)
     if not notification.isCronConfigurable:
         raise exceptions.NotConfigurableNotificationsCronsException(notification_name)
     notification_cron_name = notification.NotificationCronName
-    notification_cron_info = collection.find_one({
-        "cron_type": notification_cron_name, 
-        "sites": {"$in": [site_id]}
-    }, {"_id": 0})
+    collection = GetCronSettingsCollection()
+    cron_setting_doc = collection.find_one({
+        "cron_type": notification_cron_name,
+        "site_id": site_id
+    }, {"_id": 0, "setting": 1, "deleted": 1})
+    if cron_setting_doc is not None:
+        return {} if models.IsCronSettingTombstone(cron_setting_doc) else cron_setting_doc.get("setting", {})
+    notification_cron_info = GetLegacyCronInfoCollection().find_one(
+        LegacyCronSettingQuery(notification_cron_name, site_id), LegacyCronSettingProjection(site_id)
+    )
     if notification_cron_info is None:
         return {}
     return notification_cron_info.get("mapping", {}).get(site_id, {})
 
-def SetNotificationCronInfo(payload: dict):
+def BuildNotificationCronSetting(payload: dict):
     notification_name = payload.get("notification_name")
-    site_id = payload.get("site_id")
     notification = models.get_notification_class(notification_name)
     if not notification.isCronConfigurable:
         raise exceptions.NotConfigurableNotificationsCronsException(notification_name)
     notification_cron_name = notification.NotificationCronName
     notification_cron_type = notification.NotificationCronType
     cron_setting = {}
-    if notification_cron_type == models.CronType.PeriodicCron:
+    if payload.get("cron_expression"):
+        # Any configurable notification may be given a crontab schedule instead of its default cron type.
+        cron = models.CrontabCron(
+            cron_expression=payload.get("cron_expression"),
+            timezone=payload.get("timezone")
+        )
+        cron_setting = cron.__dict__
+    elif notification_cron_type == models.CronType.PeriodicCron:
         cron = models.PeriodicCron(
             beat_freq=payload.get("beat_freq"),
             timezone=payload.get("timezone"),
@@ -158,35 +403,31 @@ def SetNotificationCronInfo(payload: dict):
         cron_setting = cron.__dict__
     else:
         raise exceptions.NotConfigurableNotificationsCronsException(notification_name)
-    
-    db_instance = get_mongo_client()[ParkLoyaltyDatabase]
-    collection = db_instance[CronInfoCollection]
-    notification_cron_info = collection.find_one({
-        "cron_type": notification_cron_name,
-    }, {"_id": 0})
-    if notification_cron_info is None:
-        notification_cron_info = {}
-    active_sites = notification_cron_info.get("sites", [])
-    mapping = notification_cron_info.get("mapping", {})
-    if site_id not in active_sites:
-        active_sites.append(site_id)
-    mapping[site_id] = cron_setting
-    notification_cron_info["cron_type"] = notification_cron_name
-    notification_cron_info["sites"] = active_sites
-    notification_cron_info["mapping"] = mapping
-    try:
-        email = notify.NotificationCronEmail(
-            site_id, 
-            notification_cron_name, 
-            notify.NotificationCronEmailMethods.ReconfigureNotificationCron, 
-            metadata=cron_setting
-        )
-        email.send_email()
-    except exceptions.EmailNotSentException as e: 
-        raise e
-    except Exception as e:
-        raise e
-    collection.update_one({"cron_type": notification_cron_name}, {"$set": notification_cron_info}, upsert=True)
+    return notification_cron_name, cron_setting
+
+def SetNotificationCronInfo(payload: dict):
+    site_id = payload.get("site_id")
+    notification_cron_name, cron_setting = BuildNotificationCronSetting(payload)
+    email = notify.NotificationCronEmail(
+        site_id, 
+        notification_cron_name, 
+        notify.NotificationCronEmailMethods.ReconfigureNotificationCron, 
+        metadata=cron_setting
+    )
+    collection = GetCronSettingsCollection()
+
+    def write_cron_setting(session):
+        with profiling.span("cron_write"):
+            collection.update_one(
+                {"cron_type": notification_cron_name, "site_id": site_id},
+                {"$set": {"setting": cron_setting, "updated_at": datetime.datetime.utcnow()}, "$unset": {"deleted": ""}},
+                upsert=True,
+                session=session
+            )
+        outbox.EnqueueEmail(email, session=session)
+    with profiling.span("transaction"):
+        outbox.RunInTransaction(write_cron_setting)
+    scheduler.scheduler.upsert(notification_cron_name, site_id, cron_setting)
     return
 
 def DeleteNotificationCronInfo(payload: dict):
@@ -196,36 +437,68 @@ def DeleteNotificationCronInfo(payload: dict):
     if not notification.isCronConfigurable:
         raise exceptions.NotConfigurableNotificationsCronsException(notification_name)
     notification_cron_name = notification.NotificationCronName
-    
-    db_instance = get_mongo_client()[ParkLoyaltyDatabase]
-    collection = db_instance[CronInfoCollection]
-    notification_cron_info = collection.find_one({
-        "cron_type": notification_cron_name,
-        "sites": {"$in": [site_id]}
-    }, {"_id": 0})
-    if notification_cron_info is None:
-        raise exceptions.NotificationCronDoesNotExistException(site_id, notification_name)
-    active_sites = notification_cron_info.get("sites", [])
-    mapping = notification_cron_info.get("mapping", {})
-    for idx, active_site_id in enumerate(active_sites):
-        if site_id == active_site_id:
-            del active_sites[idx]
-            break
-    mapping.pop(site_id)
-    notification_cron_info["cron_type"] = notification_cron_name
-    notification_cron_info["sites"] = active_sites
-    notification_cron_info["mapping"] = mapping
-    
-    try:
-        email = notify.NotificationCronEmail(
-            site_id, 
-            notification_cron_name, 
-            notify.NotificationCronEmailMethods.DeleteNotificationCron, 
-        )
-        email.send_email()
-    except exceptions.EmailNotSentException as e: 
-        raise e
-    except Exception as e:
-        raise e
-    collection.update_one({"cron_type": notification_cron_name}, {"$set": notification_cron_info}, upsert=True)
+    email = notify.NotificationCronEmail(
+        site_id, 
+        notification_cron_name, 
+        notify.NotificationCronEmailMethods.DeleteNotificationCron, 
+    )
+    collection = GetCronSettingsCollection()
+    legacy_collection = GetLegacyCronInfoCollection()
+
+    def delete_cron_setting(session):
+        with profiling.span("cron_write"):
+            previous = collection.find_one_and_update(
+                {"cron_type": notification_cron_name, "site_id": site_id},
+                CronSettingTombstoneUpdate(),
+                {"_id": 0, "deleted": 1},
+                upsert=True,
+                session=session
+            )
+            legacy_result = legacy_collection.update_one(
+                LegacyCronSettingQuery(notification_cron_name, site_id), LegacyCronSettingRemoval(site_id), session=session
+            )
+        existed = previous is not None and not models.IsCronSettingTombstone(previous)
+        if not existed and legacy_result.modified_count == 0:
+            raise exceptions.NotificationCronDoesNotExistException(site_id, notification_name)
+        outbox.EnqueueEmail(email, session=session)
+    with profiling.span("transaction"):
+        outbox.RunInTransaction(delete_cron_setting)
+    scheduler.scheduler.remove(notification_cron_name, site_id)
     return
+
+def MigrateCronInfo(batch_size: int = 1000):
+    """Copy every legacy Crons document into per-site CronSettings documents.
+
+    Safe to re-run and to run while the service is live: only missing documents
+    are inserted ($setOnInsert), and DeleteNotificationCronInfo leaves a
+    tombstone, so neither a newer setting nor a deletion is ever overwritten
+    with a legacy value.
+    """
+    legacy_collection = GetLegacyCronInfoCollection()
+    collection = GetCronSettingsCollection()
+    migrated = 0
+    requests = []
+    for notification_cron_info in legacy_collection.find({}, {"_id": 0}):
+        cron_type = notification_cron_info.get("cron_type")
+        for site_id, cron_setting in notification_cron_info.get("mapping", {}).items():
+            requests.append(pymongo.UpdateOne(
+                {"cron_type": cron_type, "site_id": site_id},
+                {"$setOnInsert": {"setting": cron_setting, "updated_at": datetime.datetime.utcnow()}},
+                upsert=True
+            ))
+            if len(requests) >= batch_size:
+                collection.bulk_write(requests, ordered=False)
+                migrated += len(requests)
+                requests = []
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+        migrated += len(requests)
+    return migrated
+
+def CreateCronInfoView():
+    """Expose CronSettings in the legacy Crons shape as a read-only view for cron consumers."""
+    db_instance = get_mongo_client()[ParkLoyaltyDatabase]
+    if CronInfoViewCollection in db_instance.list_collection_names():
+        db_instance.command("collMod", CronInfoViewCollection, viewOn=CronSettingsCollection, pipeline=CronInfoViewPipeline)
+    else:
+        db_instance.create_collection(CronInfoViewCollection, viewOn=CronSettingsCollection, pipeline=CronInfoViewPipeline)
@@ -0,0 +1,124 @@
+#============================================================================================
+# IN-MEMORY SITE DIRECTORY.
+# Mirrors {site_id: site_name, enable} from Site.sites so lookups do not hit Mongo.
+#============================================================================================
+import threading
+import time
+from collections import OrderedDict
+import pymongo
+from .database import get_mongo_client
+from .constants import SitesDatabase, SiteListCollection
+from .exporter import SITE_DIRECTORY_MAX_SIZE, SITE_DIRECTORY_POLL_SECONDS
+
+SiteProjection = {"_id": 0, "site_id": 1, "site_name": 1, "enable": 1, "updated_at": 1}
+
+
+class SiteDirectory():
+    """Bounded LRU map of site_id -> {"site_name", "enable"}.
+
+    It is bulk-loaded in the background on start and kept fresh from a change stream on
+    Site.sites, falling back to polling on updated_at where change streams are
+    unavailable (standalone mongod). Sites evicted by the LRU bound, or never
+    loaded, are fetched on demand. Until start() is called every lookup goes
+    straight to Mongo, so short-lived processes never see stale data.
+    """
+    def __init__(self, max_size: int = SITE_DIRECTORY_MAX_SIZE) -> None:
+        self.max_size = max_size
+        self.running = False
+        self._sites = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_updated_at = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def get_collection(self):
+        return get_mongo_client()[SitesDatabase][SiteListCollection]
+
+    def _put_locked(self, site_doc: dict) -> None:
+        site_id = site_doc.get("site_id")
+        self._sites[site_id] = {"site_name": site_doc.get("site_name", ""), "enable": site_doc.get("enable", False)}
+        self._sites.move_to_end(site_id)
+        while len(self._sites) > self.max_size:
+            self._sites.popitem(last=False)
+        updated_at = site_doc.get("updated_at")
+        if updated_at is not None and (self._last_updated_at is None or updated_at > self._last_updated_at):
+            self._last_updated_at = updated_at
+
+    def apply(self, site_doc: dict) -> None:
+        with self._lock:
+            self._put_locked(site_doc)
+
+    def remove(self, site_id: str) -> None:
+        with self._lock:
+            self._sites.pop(site_id, None)
+
+    def load(self) -> int:
+        site_docs = self.get_collection().find({}, SiteProjection).sort("updated_at", pymongo.DESCENDING).limit(self.max_size)
+        with self._lock:
+            self._sites.clear()
+            for site_doc in site_docs:
+                self._put_locked(site_doc)
+            return len(self._sites)
+
+    def get(self, site_id: str):
+        if self.running:
+            with self._lock:
+                site = self._sites.get(site_id)
+                if site is not None:
+                    self._sites.move_to_end(site_id)
+                    return site
+        site_doc = self.get_collection().find_one({"site_id": site_id}, SiteProjection)
+        if site_doc is None:
+            return None
+        if self.running:
+            self.apply(site_doc)
+        return {"site_name": site_doc.get("site_name", ""), "enable": site_doc.get("enable", False)}
+
+    def _watch(self) -> None:
+        # Change streams need a replica set; on a standalone mongod this raises and we poll instead.
+        with self.get_collection().watch(full_document="updateLookup", max_await_time_ms=1000) as stream:
+            while not self._stop_event.is_set():
+                change = stream.try_next()
+                if change is None:
+                    continue
+                if change["operationType"] in ("insert", "update", "replace") and change.get("fullDocument"):
+                    self.apply(change["fullDocument"])
+                elif change["operationType"] == "delete":
+                    # Delete events only carry the _id, so drop everything and reload.
+                    self.load()
+
+    def _poll(self) -> None:
+        while not self._stop_event.wait(SITE_DIRECTORY_POLL_SECONDS):
+            site_filter = {}
+            if self._last_updated_at is not None:
+                site_filter = {"updated_at": {"$gt": self._last_updated_at}}
+            for site_doc in self.get_collection().find(site_filter, SiteProjection):
+                self.apply(site_doc)
+
+    def _refresh(self) -> None:
+        loaded = False
+        while not self._stop_event.is_set():
+            try:
+                if not loaded:
+                    self.load()
+                    loaded = True
+                try:
+                    self._watch()
+                except pymongo.errors.OperationFailure:
+                    self._poll()
+            except pymongo.errors.PyMongoError as e:
+                print(f"Site directory refresh error: {e}")
+                time.sleep(SITE_DIRECTORY_POLL_SECONDS)
+
+    def start(self) -> None:
+        # The bulk load runs on the refresh thread; lookups made before it finishes fall through to Mongo.
+        self.running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh, name="site-directory", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        self._stop_event.set()
+
+directory = SiteDirectory()
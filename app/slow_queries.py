@@ -0,0 +1,205 @@
+#============================================================================================
+# MONGO SLOW-QUERY LOG.
+# Commands slower than SLOW_QUERY_THRESHOLD_MS are logged with their query shape (the filter
+# or pipeline with every value replaced by "?") and aggregated per shape. The first time a
+# shape is seen it is explained (queryPlanner) on a background thread, so collection scans
+# show up in /get_slow_queries without anyone running explain by hand.
+#============================================================================================
+import datetime
+import json
+import queue
+import threading
+from pymongo import monitoring
+import pymongo
+from .exporter import SLOW_QUERY_LOG_ENABLED, SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_EXPLAIN_ENABLED, SLOW_QUERY_MAX_SHAPES
+from . import metrics
+
+# Command name -> function returning the part of the command that determines the plan.
+QueryParts = {
+    "find": lambda command: {"filter": command.get("filter", {}), "sort": command.get("sort"), "projection": command.get("projection")},
+    "aggregate": lambda command: {"pipeline": command.get("pipeline", [])},
+    "count": lambda command: {"query": command.get("query", {})},
+    "distinct": lambda command: {"key": command.get("key"), "query": command.get("query", {})},
+    "findAndModify": lambda command: {"query": command.get("query", {}), "sort": command.get("sort")},
+    "update": lambda command: {"updates": [update.get("q", {}) for update in command.get("updates", [])]},
+    "delete": lambda command: {"deletes": [delete.get("q", {}) for delete in command.get("deletes", [])]},
+}
+# Session and transport fields that explain rejects or that belong to the original call only.
+NonExplainFields = {
+    "lsid", "txnNumber", "$clusterTime", "$db", "$readPreference", "readConcern", "writeConcern",
+    "startTransaction", "autocommit", "apiVersion", "apiStrict", "apiDeprecationErrors",
+}
+ExplainQueueSize = 100
+
+
+def shape_value(value):
+    """The value with every scalar replaced by "?"; lists keep one entry per distinct shape."""
+    if isinstance(value, dict):
+        return {key: shape_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            item_shape = shape_value(item)
+            if item_shape not in shapes:
+                shapes.append(item_shape)
+        return shapes
+    return "?"
+
+
+def get_query_shape(command_name: str, command) -> str:
+    query_parts = {key: item for key, item in QueryParts[command_name](command).items() if item is not None}
+    # Sort, projection and distinct key are kept as they are: they pick the plan and hold no data.
+    for key in ("filter", "pipeline", "query", "updates", "deletes"):
+        if key in query_parts:
+            query_parts[key] = shape_value(query_parts[key])
+    return json.dumps(query_parts, default=str)
+
+
+def get_explain_command(command) -> dict:
+    return {key: item for key, item in command.items() if key not in NonExplainFields}
+
+
+def summarize_plan(explain_doc: dict) -> dict:
+    """Stages and indexes of the winning plan(s) anywhere in an explain document."""
+    stages, indexes = [], []
+
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            for key, item in node.items():
+                if key == "rejectedPlans":
+                    continue
+                if in_plan and key == "stage" and isinstance(item, str) and item not in stages:
+                    stages.append(item)
+                if in_plan and key == "indexName" and item not in indexes:
+                    indexes.append(item)
+                walk(item, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+    walk(explain_doc, False)
+    return {"collscan": "COLLSCAN" in stages, "stages": stages, "indexes": indexes}
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """Command listener that records slow commands per (database, collection, command, shape).
+
+    started() keeps a reference to each command until it completes; everything
+    else only happens for commands over the threshold.
+    """
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, max_shapes: int = SLOW_QUERY_MAX_SHAPES) -> None:
+        self.threshold_micros = threshold_ms * 1000
+        self.max_shapes = max_shapes
+        self.shapes = {}
+        self._commands = {}
+        self._lock = threading.Lock()
+        self._explain_queue = queue.Queue(maxsize=ExplainQueueSize)
+        self._stop_event = threading.Event()
+
+    def started(self, event) -> None:
+        if event.command_name in QueryParts:
+            self._commands[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event) -> None:
+        self._finish(event, None)
+
+    def failed(self, event) -> None:
+        self._finish(event, str(event.failure.get("errmsg", "")) if isinstance(event.failure, dict) else str(event.failure))
+
+    def _finish(self, event, error) -> None:
+        started = self._commands.pop((event.connection_id, event.request_id), None)
+        if started is None or event.duration_micros < self.threshold_micros:
+            return
+        database_name, command = started
+        try:
+            self.record(database_name, event.command_name, command, event.duration_micros / 1000, error)
+        except Exception as e:
+            print(f"Slow query log error: {e}")
+
+    def record(self, database_name: str, command_name: str, command, duration_ms: float, error=None) -> None:
+        collection_name = command.get(command_name)
+        collection_name = collection_name if isinstance(collection_name, str) else ""
+        query_shape = get_query_shape(command_name, command)
+        # Per-site databases share one entry per shape; the first one seen is kept for explain.
+        key = (metrics.get_database_label(database_name), collection_name, command_name, query_shape)
+        print(f"Slow Mongo {command_name} on {database_name}.{collection_name} took {duration_ms:.1f}ms: {query_shape}")
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            entry = self.shapes.get(key)
+            if entry is None:
+                if len(self.shapes) >= self.max_shapes:
+                    return
+                entry = self.shapes[key] = {
+                    "database": key[0],
+                    "collection": collection_name,
+                    "command": command_name,
+                    "shape": query_shape,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "errors": 0,
+                    "first_seen": now,
+                    "last_seen": now,
+                    "sample_database": database_name,
+                    "explain": None,
+                }
+                if SLOW_QUERY_EXPLAIN_ENABLED:
+                    try:
+                        self._explain_queue.put_nowait((key, database_name, get_explain_command(command)))
+                    except queue.Full:
+                        pass
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["errors"] += error is not None
+            entry["last_seen"] = now
+
+    def explain(self, database_name: str, explain_command: dict) -> dict:
+        # Imported here: database.py registers this listener when it creates the clients.
+        from .database import get_mongo_client
+        try:
+            explain_doc = get_mongo_client()[database_name].command({"explain": explain_command, "verbosity": "queryPlanner"})
+        except pymongo.errors.PyMongoError as e:
+            return {"error": str(e)}
+        return summarize_plan(explain_doc)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                key, database_name, explain_command = self._explain_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            plan = self.explain(database_name, explain_command)
+            with self._lock:
+                if key in self.shapes:
+                    self.shapes[key]["explain"] = plan
+            if plan.get("collscan"):
+                print(f"Collection scan: {key[2]} on {database_name}.{key[1]}: {key[3]}")
+
+    def get_summary(self, limit: int = 100) -> list:
+        """Recorded shapes, slowest in total first."""
+        with self._lock:
+            entries = [dict(entry) for entry in self.shapes.values()]
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        for entry in entries:
+            entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 2) if entry["count"] else 0.0
+            entry["total_ms"] = round(entry["total_ms"], 2)
+            entry["max_ms"] = round(entry["max_ms"], 2)
+        return entries[:limit]
+
+    def reset(self) -> int:
+        with self._lock:
+            count = len(self.shapes)
+            self.shapes = {}
+        return count
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        threading.Thread(target=self._run, name="slow-query-explain", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+slow_query_log = SlowQueryLog()
+
+def get_mongo_event_listeners() -> list:
+    return [slow_query_log] if SLOW_QUERY_LOG_ENABLED else []
@@ -0,0 +1,151 @@
+#============================================================================================
+# SITE DATA STORAGE LAYOUT.
+# NotificationList and ConfigurationsList live either in each site's own database (per_site)
+# or in shared collections keyed by site_id (shared). The dual mode is the online migration
+# path between the two: a site is copied to the shared collections on its first write (or
+# by `python -m app.manage migrate_storage`) and read from its own database until then.
+#============================================================================================
+import datetime
+import threading
+import pymongo
+from starlette.concurrency import run_in_threadpool
+from .database import get_mongo_client, get_async_mongo_client
+from .constants import *
+from .exporter import STORAGE_MODE, STORAGE_MIGRATION_WORKERS
+from . import fanout
+
+StorageModePerSite = "per_site"
+StorageModeDual = "dual"
+StorageModeShared = "shared"
+StorageModes = (StorageModePerSite, StorageModeDual, StorageModeShared)
+
+# Per-site collection -> (shared collection, field that identifies a document within a site).
+SharedCollections = {
+    NotificationListCollection: (SharedNotificationListCollection, "entity_type"),
+    ConfigurationListCollection: (SharedConfigurationListCollection, "config_type"),
+}
+
+# Sites known to be in the shared collections. Sites are never un-migrated, so only
+# positive results are cached; a negative one is re-checked on the next access.
+_migrated_sites = set()
+_migrated_sites_lock = threading.Lock()
+
+
+def GetStorageMode() -> str:
+    if STORAGE_MODE not in StorageModes:
+        raise ValueError(f"STORAGE_MODE must be one of {', '.join(StorageModes)}, not {STORAGE_MODE}.")
+    return STORAGE_MODE
+
+def GetMigrationsCollection():
+    return get_mongo_client()[NotificationsDatabase][StorageMigrationsCollection]
+
+def IsSiteMigrated(site_id: str) -> bool:
+    if site_id in _migrated_sites:
+        return True
+    if GetMigrationsCollection().find_one({"_id": site_id}, {"_id": 1}) is None:
+        return False
+    with _migrated_sites_lock:
+        _migrated_sites.add(site_id)
+    return True
+
+async def IsSiteMigratedAsync(site_id: str) -> bool:
+    if site_id in _migrated_sites:
+        return True
+    collection = get_async_mongo_client()[NotificationsDatabase][StorageMigrationsCollection]
+    if await collection.find_one({"_id": site_id}, {"_id": 1}) is None:
+        return False
+    with _migrated_sites_lock:
+        _migrated_sites.add(site_id)
+    return True
+
+def MigrateSite(site_id: str) -> int:
+    """Copy the site's per-site documents into the shared collections and mark it migrated.
+
+    Documents are inserted with $setOnInsert, so re-running (or racing another
+    instance) never overwrites a shared document written after the copy. The
+    per-site database is left in place. Returns the number of documents copied.
+    """
+    if IsSiteMigrated(site_id):
+        return 0
+    client = get_mongo_client()
+    copied = 0
+    for collection_name, (shared_collection_name, key_field) in SharedCollections.items():
+        requests = []
+        for doc in client[site_id][collection_name].find({}):
+            doc.pop("_id", None)
+            doc.pop("site_id", None)
+            key = doc.pop(key_field, None)
+            requests.append(pymongo.UpdateOne({"site_id": site_id, key_field: key}, {"$setOnInsert": doc}, upsert=True))
+        if not requests:
+            continue
+        try:
+            result = client[NotificationsDatabase][shared_collection_name].bulk_write(requests, ordered=False)
+            copied += result.upserted_count
+        except pymongo.errors.BulkWriteError as e:
+            # Duplicate keys mean another instance upserted the same document first.
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            copied += e.details.get("nUpserted", 0)
+    GetMigrationsCollection().update_one(
+        {"_id": site_id}, {"$setOnInsert": {"migrated_at": datetime.datetime.utcnow(), "copied": copied}}, upsert=True
+    )
+    with _migrated_sites_lock:
+        _migrated_sites.add(site_id)
+    return copied
+
+def UsesSharedStorage(site_id: str, write: bool = False) -> bool:
+    storage_mode = GetStorageMode()
+    if storage_mode == StorageModePerSite:
+        return False
+    if storage_mode == StorageModeShared or IsSiteMigrated(site_id):
+        return True
+    if write:
+        MigrateSite(site_id)
+        return True
+    return False
+
+async def UsesSharedStorageAsync(site_id: str, write: bool = False) -> bool:
+    storage_mode = GetStorageMode()
+    if storage_mode == StorageModePerSite:
+        return False
+    if storage_mode == StorageModeShared or await IsSiteMigratedAsync(site_id):
+        return True
+    if write:
+        # A one-off copy per site during the dual period; not worth a Motor version.
+        await run_in_threadpool(MigrateSite, site_id)
+        return True
+    return False
+
+def GetSiteCollection(site_id: str, collection_name: str, write: bool = False):
+    """Return (collection, site_filter) for a per-site collection.
+
+    site_filter must be merged into every filter used on the collection (and the
+    first $match of every pipeline); it is {} in the per-site layout.
+    """
+    if UsesSharedStorage(site_id, write):
+        return get_mongo_client()[NotificationsDatabase][SharedCollections[collection_name][0]], {"site_id": site_id}
+    return get_mongo_client()[site_id][collection_name], {}
+
+async def GetAsyncSiteCollection(site_id: str, collection_name: str, write: bool = False):
+    if await UsesSharedStorageAsync(site_id, write):
+        return get_async_mongo_client()[NotificationsDatabase][SharedCollections[collection_name][0]], {"site_id": site_id}
+    return get_async_mongo_client()[site_id][collection_name], {}
+
+def MigrateFleet(site_ids: list, max_workers: int = STORAGE_MIGRATION_WORKERS, on_site=None) -> dict:
+    """MigrateSite for every site with at most max_workers sites in flight; returns {site_id: error}.
+
+    on_site(site_id, copied, error) is called as each site finishes.
+    """
+    failures = {}
+
+    def migrate_site(site_id):
+        copied, error = 0, None
+        try:
+            copied = MigrateSite(site_id)
+        except pymongo.errors.PyMongoError as e:
+            error = failures[site_id] = str(e)
+        if on_site is not None:
+            on_site(site_id, copied, error)
+
+    fanout.ForEachBounded(migrate_site, site_ids, max_workers, "migrate-storage")
+    return failures
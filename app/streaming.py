@@ -0,0 +1,47 @@
+#============================================================================================
+# PAGINATION AND NDJSON STREAMING HELPERS FOR LIST ENDPOINTS.
+#============================================================================================
+import datetime
+import enum
+import json
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+from . import exceptions
+from .exporter import LIST_PAGE_DEFAULT_LIMIT, LIST_PAGE_MAX_LIMIT
+
+NDJSONMediaType = "application/x-ndjson"
+NextCursorHeader = "X-Next-Cursor"
+
+
+def wants_ndjson(request) -> bool:
+    return NDJSONMediaType in request.headers.get("accept", "")
+
+def is_paginated(request, cursor, limit) -> bool:
+    return cursor is not None or limit is not None or wants_ndjson(request)
+
+def resolve_limit(limit, ndjson: bool):
+    """A page size within bounds; NDJSON streams are unbounded unless a limit is given."""
+    if limit is None:
+        return None if ndjson else LIST_PAGE_DEFAULT_LIMIT
+    if limit < 1 or limit > LIST_PAGE_MAX_LIMIT:
+        raise exceptions.InvalidPageLimitException(limit, LIST_PAGE_MAX_LIMIT)
+    return limit
+
+def _encode_default(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def ndjson_lines(docs):
+    for doc in docs:
+        yield json.dumps(doc, default=_encode_default, separators=(",", ":")).encode("utf-8") + b"\n"
+
+def NDJSONResponse(docs, next_cursor=None) -> StreamingResponse:
+    """Stream docs one JSON document per line. A sync iterable (e.g. a pymongo cursor) is
+    consumed on the threadpool by StreamingResponse, so the event loop never blocks on it."""
+    headers = {NextCursorHeader: next_cursor} if next_cursor is not None else None
+    return StreamingResponse(ndjson_lines(docs), media_type=NDJSONMediaType, headers=headers)
@@ -1,29 +1,118 @@
-import pytz
+#============================================================================================
+# IN-PROCESS DST-AWARE TIMEZONE INDEX.
+# Offsets for every pytz zone are computed once from the zone's transition table; a zone is
+# only recomputed after its next DST transition has passed.
+#============================================================================================
+import bisect
 import datetime
+import gzip
+import hashlib
+import heapq
+import json
+import threading
+import pytz
+
+NoTransition = float("inf")
 
-timezones = list(set(pytz.all_timezones))
-sorted_timezones = []
 
-for tz in timezones:
-    curr_time = datetime.datetime.now(pytz.timezone(tz))
-    offset = curr_time.utcoffset().total_seconds()/60/60
+def format_utc_offset(offset: float) -> str:
     hours = int(offset)
     minutes = int((offset - hours) * 60)
-    offset_str = f"{hours:02d}:{minutes:02d}"
-    tz_info = {
-        "timezone": tz,
-        "offset_str": offset_str,
-        "offset": offset
-    }
-    sorted_timezones.append(tz_info)
-
-sorted_timezones=sorted(sorted_timezones, key=lambda x: (x["offset"], x["timezone"]))
-
-tz1 = pytz.timezone("Asia/Kolkata")
-print(tz1)
-
-try:
-    tz2 = pytz.timezone("ABC")
-    print(tz2)
-except pytz.exceptions.UnknownTimeZoneError as e:
-    print("Unknown Timezone Error: " + str(e))
+    return f"{hours:02d}:{minutes:02d}"
+
+
+def get_zone_offset(tz, now: datetime.datetime):
+    """Return (utc offset in hours, UTC timestamp of the zone's next transition) at naive-UTC now."""
+    transition_times = getattr(tz, "_utc_transition_times", None)
+    if not transition_times:
+        return tz.utcoffset(now).total_seconds() / 3600, NoTransition
+    idx = bisect.bisect_right(transition_times, now)
+    utc_offset = tz._transition_info[max(idx - 1, 0)][0]
+    if idx < len(transition_times):
+        next_transition = transition_times[idx].replace(tzinfo=datetime.timezone.utc).timestamp()
+    else:
+        next_transition = NoTransition
+    return utc_offset.total_seconds() / 3600, next_transition
+
+
+class TimezoneIndex():
+    """Current UTC offset of every pytz zone, plus the serialized /get_timezone_list response.
+
+    Zones sit in a min-heap keyed on their next transition instant; refresh()
+    pops and recomputes only the zones whose transition has passed, and the
+    serialized (and gzip-compressed) body is rebuilt only when something moved.
+    """
+    ResponseMessage = "Notification Timezone List Retreived Successfully"
+
+    def __init__(self) -> None:
+        self.offsets = {}
+        self.response = None
+        self._transitions = []
+        self._lock = threading.Lock()
+
+    def build(self, now: datetime.datetime = None) -> None:
+        now = now or datetime.datetime.utcnow()
+        with self._lock:
+            self.offsets = {}
+            self._transitions = []
+            for tz_name in set(pytz.all_timezones):
+                self._compute_locked(tz_name, now)
+            heapq.heapify(self._transitions)
+            self._serialize_locked()
+
+    def _compute_locked(self, tz_name: str, now: datetime.datetime) -> None:
+        offset, next_transition = get_zone_offset(pytz.timezone(tz_name), now)
+        self.offsets[tz_name] = offset
+        if next_transition != NoTransition:
+            self._transitions.append((next_transition, tz_name))
+
+    def refresh(self, now: datetime.datetime = None) -> int:
+        """Recompute zones whose next transition has passed; returns how many changed."""
+        now = now or datetime.datetime.utcnow()
+        now_ts = now.replace(tzinfo=datetime.timezone.utc).timestamp()
+        if self.response is None:
+            self.build(now)
+            return len(self.offsets)
+        if not self._transitions or self._transitions[0][0] > now_ts:
+            return 0
+        with self._lock:
+            refreshed = 0
+            while self._transitions and self._transitions[0][0] <= now_ts:
+                _, tz_name = heapq.heappop(self._transitions)
+                offset, next_transition = get_zone_offset(pytz.timezone(tz_name), now)
+                self.offsets[tz_name] = offset
+                if next_transition != NoTransition:
+                    heapq.heappush(self._transitions, (next_transition, tz_name))
+                refreshed += 1
+            self._serialize_locked()
+            return refreshed
+
+    def get_timezone_docs(self) -> list:
+        """The zones sorted by (offset, name), with the numeric offset and its formatted string."""
+        return [
+            {"timezone": tz_name, "offset_str": format_utc_offset(offset), "offset": offset}
+            for tz_name, offset in sorted(self.offsets.items(), key=lambda item: (item[1], item[0]))
+        ]
+
+    def get_timezone_list(self) -> list:
+        """The /get_timezone_list entries: {"timezone", "offset"} with the formatted offset."""
+        return [
+            {"timezone": timezone_doc["timezone"], "offset": timezone_doc["offset_str"]}
+            for timezone_doc in self.get_timezone_docs()
+        ]
+
+    def _serialize_locked(self) -> None:
+        timezone_list = self.get_timezone_list()
+        body = json.dumps(
+            {"data": timezone_list, "status": True, "message": self.ResponseMessage},
+            separators=(",", ":")
+        ).encode("utf-8")
+        # Published as one tuple so readers never pair a body with another version's ETag.
+        self.response = (body, gzip.compress(body, compresslevel=6), '"' + hashlib.sha1(body).hexdigest() + '"')
+
+    def get(self):
+        """Return (body, gzip_body, etag) for the current offsets."""
+        self.refresh()
+        return self.response
+
+index = TimezoneIndex()
@@ -0,0 +1,240 @@
+#============================================================================================
+# EMAIL TRANSPORTS.
+# Every backend is async, keeps its connections open between sends and caps the number of
+# sends in flight. Select one with EMAIL_TRANSPORT: sendgrid, smtp, memory or file.
+#============================================================================================
+import asyncio
+import datetime
+import json
+import os
+import time
+import uuid
+from email.message import EmailMessage as MIMEMessage
+import aiosmtplib
+import httpx
+from .exporter import *
+from . import exceptions
+
+TransportSendGrid = "sendgrid"
+TransportSMTP = "smtp"
+TransportMemory = "memory"
+TransportFile = "file"
+
+
+class OutgoingEmail():
+    def __init__(self, source_email, email_recepients, email_subject, email_body) -> None:
+        self.source_email = source_email
+        self.email_recepients = list(email_recepients)
+        self.email_subject = email_subject
+        self.email_body = email_body
+
+    @property
+    def content_key(self):
+        return (self.source_email, self.email_subject, self.email_body)
+
+    @property
+    def __dict__(self) -> dict:
+        return {
+            "from": self.source_email,
+            "to": self.email_recepients,
+            "subject": self.email_subject,
+            "html_content": self.email_body,
+        }
+
+
+class EmailTransport():
+    def __init__(self, max_concurrency: int = EMAIL_MAX_CONCURRENT_SENDS) -> None:
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it belongs to the running event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def send(self, message: OutgoingEmail) -> None:
+        async with self.semaphore:
+            await self._send(message)
+
+    async def send_many(self, messages: list) -> None:
+        await asyncio.gather(*[self.send(message) for message in messages])
+
+    async def _send(self, message: OutgoingEmail) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class SendGridTransport(EmailTransport):
+    """Posts to the SendGrid v3 API over a pooled keep-alive HTTP client.
+
+    Every recipient gets its own personalization (they never see each other),
+    and messages that share sender, subject and body are merged into a single
+    API call of up to MaxPersonalizations recipients.
+    """
+    ApiUrl = "https://api.sendgrid.com/v3/mail/send"
+    MaxPersonalizations = 1000
+
+    def __init__(self, api_key: str = SENDGRID_API_KEY, max_concurrency: int = EMAIL_MAX_CONCURRENT_SENDS) -> None:
+        super().__init__(max_concurrency)
+        self.api_key = api_key
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(EMAIL_SEND_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            )
+        return self._client
+
+    def build_request_bodies(self, messages: list) -> list:
+        grouped_recepients = {}
+        for message in messages:
+            grouped_recepients.setdefault(message.content_key, []).extend(message.email_recepients)
+        request_bodies = []
+        for (source_email, email_subject, email_body), email_recepients in grouped_recepients.items():
+            for start in range(0, len(email_recepients), self.MaxPersonalizations):
+                request_bodies.append({
+                    "personalizations": [
+                        {"to": [{"email": recepient}]} for recepient in email_recepients[start:start + self.MaxPersonalizations]
+                    ],
+                    "from": {"email": source_email},
+                    "subject": email_subject,
+                    "content": [{"type": "text/html", "value": email_body}],
+                })
+        return request_bodies
+
+    async def _post(self, request_body: dict) -> None:
+        async with self.semaphore:
+            response = await self.client.post(self.ApiUrl, json=request_body)
+        if response.status_code >= 400:
+            raise exceptions.EmailNotSentException(f"SendGrid responded {response.status_code}: {response.text}")
+
+    async def send(self, message: OutgoingEmail) -> None:
+        await self.send_many([message])
+
+    async def send_many(self, messages: list) -> None:
+        messages = [message for message in messages if message.email_recepients]
+        await asyncio.gather(*[self._post(request_body) for request_body in self.build_request_bodies(messages)])
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class SMTPTransport(EmailTransport):
+    """Sends through an SMTP relay, reusing up to max_concurrency open connections.
+
+    An idle connection is reused only if it has been idle less than
+    SMTP_MAX_IDLE_SECONDS and still answers NOOP; otherwise a new one is opened.
+    """
+    def __init__(self, max_concurrency: int = EMAIL_MAX_CONCURRENT_SENDS) -> None:
+        super().__init__(max_concurrency)
+        # (connection, monotonic time it went idle)
+        self._idle_connections = []
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        connection = aiosmtplib.SMTP(
+            hostname=SMTP_HOST,
+            port=SMTP_PORT,
+            use_tls=SMTP_USE_TLS,
+            timeout=EMAIL_SEND_TIMEOUT_SECONDS
+        )
+        await connection.connect()
+        if SMTP_USERNAME:
+            await connection.login(SMTP_USERNAME, SMTP_PASSWORD)
+        return connection
+
+    async def _checkout(self) -> aiosmtplib.SMTP:
+        while self._idle_connections:
+            connection, idle_since = self._idle_connections.pop()
+            if time.monotonic() - idle_since < SMTP_MAX_IDLE_SECONDS and connection.is_connected:
+                try:
+                    await connection.noop()
+                    return connection
+                except aiosmtplib.SMTPException:
+                    pass
+            connection.close()
+        return await self._connect()
+
+    async def _send(self, message: OutgoingEmail) -> None:
+        mime_message = MIMEMessage()
+        mime_message["From"] = message.source_email
+        mime_message["To"] = ", ".join(message.email_recepients)
+        mime_message["Subject"] = message.email_subject
+        mime_message.set_content(message.email_body, subtype="html")
+        try:
+            connection = await self._checkout()
+        except aiosmtplib.SMTPException as e:
+            raise exceptions.EmailNotSentException(str(e))
+        try:
+            await connection.send_message(mime_message, sender=message.source_email, recipients=message.email_recepients)
+        except aiosmtplib.SMTPException as e:
+            # A broken connection is dropped rather than returned to the pool.
+            connection.close()
+            raise exceptions.EmailNotSentException(str(e))
+        self._idle_connections.append((connection, time.monotonic()))
+
+    async def close(self) -> None:
+        while self._idle_connections:
+            connection, _ = self._idle_connections.pop()
+            try:
+                await connection.quit()
+            except aiosmtplib.SMTPException:
+                connection.close()
+
+
+class MemoryTransport(EmailTransport):
+    """Keeps sent emails in memory; used to exercise the email flow offline."""
+    def __init__(self) -> None:
+        super().__init__()
+        self.sent = []
+
+    async def _send(self, message: OutgoingEmail) -> None:
+        self.sent.append(message.__dict__)
+
+
+class FileTransport(EmailTransport):
+    """Writes each email as a JSON file under EMAIL_FILE_SINK_DIR."""
+    def __init__(self, directory: str = EMAIL_FILE_SINK_DIR) -> None:
+        super().__init__()
+        self.directory = directory
+
+    def _write(self, message: OutgoingEmail) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        file_name = f"{datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex}.json"
+        with open(os.path.join(self.directory, file_name), "w") as fh:
+            json.dump(message.__dict__, fh)
+
+    async def _send(self, message: OutgoingEmail) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._write, message)
+
+
+_transport = None
+
+def get_email_transport() -> EmailTransport:
+    global _transport
+    if _transport is None:
+        transports = {
+            TransportSendGrid: SendGridTransport,
+            TransportSMTP: SMTPTransport,
+            TransportMemory: MemoryTransport,
+            TransportFile: FileTransport,
+        }
+        if EMAIL_TRANSPORT not in transports:
+            raise ValueError(f"{EMAIL_TRANSPORT} is not a valid EMAIL_TRANSPORT.")
+        _transport = transports[EMAIL_TRANSPORT]()
+    return _transport
+
+async def close_email_transport() -> None:
+    global _transport
+    if _transport is not None:
+        await _transport.close()
+        _transport = None
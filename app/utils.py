@@ -1,8 +1,10 @@
 import pytz
 import datetime
 import pymongo
+from bson import ObjectId
 from .database import get_mongo_client
-from .exceptions import InvalidEnforcementHoursException, InvalidTimezoneException
+from . import sites, timezones, profiling
+from .exceptions import InvalidEnforcementHoursException, InvalidTimezoneException, InvalidCursorException
 from .constants import *
 
 def validate_enforcement_hours(enforcement_from, enforcement_to):
@@ -21,29 +23,44 @@ def validate_enforcement_hours(enforcement_from, enforcement_to):
     return True
 
 def get_timezone_docs():
-    timezones = list(set(pytz.all_timezones))
-    sorted_timezones = []
-    for tz in timezones:
-        curr_time = datetime.datetime.now(pytz.timezone(tz))
-        offset = curr_time.utcoffset().total_seconds()/60/60
-        hours = int(offset)
-        minutes = int((offset - hours) * 60)
-        offset_str = f"{hours:02d}:{minutes:02d}"
-        tz_info = {
-            "timezone": tz,
-            "offset_str": offset_str,
-            "offset": offset
-        }
-        sorted_timezones.append(tz_info)
-    return sorted(sorted_timezones, key=lambda x: (x["offset"], x["timezone"]))
+    timezones.index.refresh()
+    return timezones.index.get_timezone_docs()
+
+def parse_offset_cursor(cursor) -> int:
+    if cursor is None:
+        return 0
+    if not cursor.isdigit():
+        raise InvalidCursorException(cursor)
+    return int(cursor)
+
+def parse_object_id_cursor(cursor):
+    if not ObjectId.is_valid(cursor):
+        raise InvalidCursorException(cursor)
+    return ObjectId(cursor)
+
+def get_timezone_list_page(cursor, limit):
+    offset = parse_offset_cursor(cursor)
+    timezones.index.refresh()
+    timezone_list = timezones.index.get_timezone_list()
+    next_cursor = str(offset + limit) if len(timezone_list) > offset + limit else None
+    return timezone_list[offset:offset + limit], next_cursor
+
+def iter_timezone_list(cursor, limit=None):
+    offset = parse_offset_cursor(cursor)
+    timezones.index.refresh()
+    timezone_list = timezones.index.get_timezone_list()
+    return timezone_list[offset:offset + limit if limit is not None else None]
 
 def get_site_name(site_id: str):
-    db_instance = get_mongo_client()[SitesDatabase]
-    collection = db_instance[SiteListCollection]
-    site_doc = collection.find_one({"site_id": site_id, "enable": True})
-    if site_doc is None:
+    with profiling.span("site_lookup"):
+        site = sites.directory.get(site_id)
+    if site is None or not site.get("enable"):
         return None
-    return site_doc.get("site_name", "")
+    return site.get("site_name", "")
+
+def site_exists(site_id: str) -> bool:
+    site = sites.directory.get(site_id)
+    return site is not None and bool(site.get("enable"))
 
 def FormatEmailListToString(email_list: list):
     if len(email_list) == 0:
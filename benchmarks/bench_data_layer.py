@@ -0,0 +1,71 @@
+"""Throughput of the sync (threadpool) vs async (Motor) data layer.
+
+Seeds one site database on a local mongod and drives the read/write service
+functions from N concurrent clients, the way the routes in app/main.py call
+them through call_service.
+
+    MONGO_DB_LINK=mongodb://localhost:27017 python -m benchmarks.bench_data_layer --clients 500
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("MONGO_DB_LINK", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TRANSACTIONAL_DB_LINK", os.environ["MONGO_DB_LINK"])
+
+from starlette.concurrency import run_in_threadpool
+from app import service, async_service
+from app.database import get_mongo_client
+
+BENCH_SITE_ID = "bench_data_layer_site"
+
+
+def seed():
+    get_mongo_client().drop_database(BENCH_SITE_ID)
+    service.CreateNotification({
+        "site_id": BENCH_SITE_ID,
+        "notification_name": "Integration Latency Notification",
+        "email_recipients": ["ops@example.com"],
+        "metadata": {},
+    })
+    service.SetEnforcementHours({"site_id": BENCH_SITE_ID, "enforcement_from": "08:00", "enforcement_to": "18:00"})
+
+
+async def run_client(use_async, ops_per_client):
+    for i in range(ops_per_client):
+        if use_async:
+            if i % 2:
+                await async_service.GetNotificationInfo(BENCH_SITE_ID, "Integration Latency Notification")
+            else:
+                await async_service.GetEnforcementHours(BENCH_SITE_ID)
+        else:
+            if i % 2:
+                await run_in_threadpool(service.GetNotificationInfo, BENCH_SITE_ID, "Integration Latency Notification")
+            else:
+                await run_in_threadpool(service.GetEnforcementHours, BENCH_SITE_ID)
+
+
+async def bench(use_async, clients, ops_per_client):
+    started_at = time.perf_counter()
+    await asyncio.gather(*[run_client(use_async, ops_per_client) for _ in range(clients)])
+    elapsed = time.perf_counter() - started_at
+    return clients * ops_per_client / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--ops", type=int, default=20)
+    args = parser.parse_args()
+
+    seed()
+    for use_async in (False, True):
+        ops_per_second = asyncio.run(bench(use_async, args.clients, args.ops))
+        layer = "async (motor)" if use_async else "sync (threadpool)"
+        print(f"{layer:>18}: {ops_per_second:10.0f} ops/s with {args.clients} concurrent clients")
+    get_mongo_client().drop_database(BENCH_SITE_ID)
+
+
+if __name__ == "__main__":
+    main()
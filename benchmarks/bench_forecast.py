@@ -0,0 +1,106 @@
+"""Next-fire-time forecast over a synthetic fleet of site cron schedules.
+
+Compiles N random periodic/scheduled settings spread over the pytz common
+zones and times the vectorized engine in app/forecast.py against evaluating
+each schedule one by one with pytz, as a hand-written loop over Crons would.
+Needs no database.
+
+    python -m benchmarks.bench_forecast --sites 50000 --k 10
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+
+os.environ.setdefault("MONGO_DB_LINK", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TRANSACTIONAL_DB_LINK", os.environ["MONGO_DB_LINK"])
+
+import pytz
+from app import forecast
+
+BEAT_FREQS = [1, 5, 10, 15, 30, 60, 120, 240]
+
+
+def build_settings(sites, seed):
+    rng = random.Random(seed)
+    zones = pytz.common_timezones
+    cron_settings = []
+    for i in range(sites):
+        setting = {"timezone": rng.choice(zones), "freq": rng.choice(["daily", "weekday"])}
+        if rng.random() < 0.5:
+            setting["beat_time"] = f"{rng.randrange(24):02d}:{rng.randrange(0, 60, 15):02d}"
+            cron_type = "DailyCitationNotificationsCron"
+        else:
+            setting["beat_freq"] = rng.choice(BEAT_FREQS)
+            cron_type = "IntegrationLatencyNotificationsCron"
+        cron_settings.append((cron_type, f"site_{i}", setting))
+    return cron_settings
+
+
+def scalar_next_fire_times(setting, now, k):
+    """One schedule at a time: walk local days and localize each slot with pytz."""
+    tz = pytz.timezone(setting["timezone"])
+    if "beat_time" in setting:
+        hours, minutes = setting["beat_time"].split(":")
+        slots = [int(hours) * 60 + int(minutes)]
+    else:
+        slots = range(0, forecast.MinutesPerDay, setting["beat_freq"])
+    day = datetime.datetime.fromtimestamp(now, tz).date()
+    fire_times = []
+    while len(fire_times) < k:
+        if setting["freq"] != "weekday" or day.weekday() < 5:
+            for slot in slots:
+                wall = datetime.datetime.combine(day, datetime.time()) + datetime.timedelta(minutes=slot)
+                fire_at = tz.localize(wall).timestamp()
+                if fire_at >= now:
+                    fire_times.append(fire_at)
+                    if len(fire_times) == k:
+                        break
+        day += datetime.timedelta(days=1)
+    return fire_times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=50000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scalar-sample", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    cron_settings = build_settings(args.sites, args.seed)
+    now = time.time()
+
+    started_at = time.perf_counter()
+    engine = forecast.ForecastEngine()
+    engine.compile(cron_settings)
+    compile_seconds = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    for _ in range(args.repeat):
+        engine.next_fire_times(now, args.k)
+    next_k_seconds = (time.perf_counter() - started_at) / args.repeat
+
+    started_at = time.perf_counter()
+    for _ in range(args.repeat):
+        due = engine.fires_within(now, args.minutes)
+    fires_within_seconds = (time.perf_counter() - started_at) / args.repeat
+
+    sample = cron_settings[:args.scalar_sample]
+    started_at = time.perf_counter()
+    for _, _, setting in sample:
+        scalar_next_fire_times(setting, now, args.k)
+    scalar_seconds = (time.perf_counter() - started_at) * args.sites / max(len(sample), 1)
+
+    print(f"sites={args.sites} zones={len(engine.zone_names)} k={args.k}")
+    print(f"compile:                  {compile_seconds * 1000:9.1f} ms")
+    print(f"next {args.k} fire times (numpy): {next_k_seconds * 1000:9.1f} ms")
+    print(f"next {args.k} fire times (pytz):  {scalar_seconds * 1000:9.1f} ms (extrapolated from {len(sample)} sites)")
+    print(f"fires within {args.minutes} min:      {fires_within_seconds * 1000:9.1f} ms ({len(due)} fires)")
+
+
+if __name__ == "__main__":
+    main()
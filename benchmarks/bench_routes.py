@@ -0,0 +1,155 @@
+"""Per-request CPU of every route in app/main.py, before and after the orjson path.
+
+"before" rebuilds each route with the old behaviour: the completer runs
+jsonable_encoder and strftime, and responses are dicts that FastAPI
+passes through jsonable_encoder into the stdlib JSONResponse. "after" is
+the app as shipped. Auth is overridden and the data layer stubbed with
+representative results, so only the request/serialization path is
+measured.
+
+    python -m benchmarks.bench_routes --requests 2000
+"""
+import argparse
+import datetime
+import os
+import time
+
+os.environ.setdefault("MONGO_DB_LINK", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TRANSACTIONAL_DB_LINK", os.environ["MONGO_DB_LINK"])
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from starlette.routing import request_response
+from app import main, auth, completer, responses, catalog, timezones, forecast, jobs, service, models
+
+P = main.BASE_PREFIX
+NOW = datetime.datetime(2022, 7, 1, 12, 0, 0)
+NOTIFICATION = {"notification_name": "Integration Latency Notification", "email": "ops@example.com", "created_at": NOW,
+                "metadata": {"num_of_transactions": 10, "latency_threshold": 200, "latency_duration_threshold": 15}}
+JOB = {"job_id": "a" * 32, "action": "create_notification", "payload": {"notification_name": "No Transaction Notification"},
+       "status": "running", "total": 2000, "succeeded": 1200, "failed": 3, "skipped": 0, "completed": 1203,
+       "progress": 0.6015, "created_at": NOW}
+SERVICE_RESULTS = {
+    "GetSiteNotificationList": [dict(NOTIFICATION, notification_name=name) for name in models.get_valid_notifications()],
+    "GetNotificationInfo": NOTIFICATION,
+    "GetEnforcementHours": {"enforcement_from": "08:00", "enforcement_to": "18:00"},
+    "GetNotificationCronInfo": {"timezone": "Asia/Kolkata", "freq": "daily", "beat_freq": 15},
+    "BulkCreateNotifications": [
+        {"index": i, "notification_name": "No Transaction Notification", "status": "applied", "error": None} for i in range(50)
+    ],
+}
+BULK_BODY = {"notifications": [{"notification_name": "No Transaction Notification", "email_recipients": ["ops@example.com"]}] * 50}
+REQUESTS = [
+    ("get", "/", {}),
+    ("get", P + "/", {}),
+    ("get", P + "/url_list", {}),
+    ("get", P + "/get_notification_list", {}),
+    ("get", P + "/get_site_notification_list", {}),
+    ("post", P + "/create_notification", {"json": {"notification_name": "No Transaction Notification", "email_recipients": ["a@b.com"]}}),
+    ("post", P + "/update_notification", {"json": {"notification_name": "No Transaction Notification", "email_recipients": ["a@b.com"]}}),
+    ("post", P + "/delete_notification", {"json": {"notification_name": "No Transaction Notification"}}),
+    ("post", P + "/bulk_create_notifications", {"json": BULK_BODY}),
+    ("post", P + "/bulk_update_notifications", {"json": BULK_BODY}),
+    ("post", P + "/bulk_delete_notifications", {"json": BULK_BODY}),
+    ("get", P + "/get_notification_info", {"params": {"notification_name": "Integration Latency Notification"}}),
+    ("get", P + "/get_enforcement_hours", {}),
+    ("post", P + "/set_enforcement_hours", {"json": {"enforcement_from": "08:00", "enforcement_to": "18:00"}}),
+    ("post", P + "/delete_enforcement_hours", {}),
+    ("get", P + "/get_timezone_list", {}),
+    ("get", P + "/get_notification_cron_info", {"params": {"notification_name": "Integration Latency Notification"}}),
+    ("post", P + "/set_notification_cron_info", {"json": {"notification_name": "Integration Latency Notification", "beat_freq": "15"}}),
+    ("post", P + "/delete_notification_cron_info", {"json": {"notification_name": "Integration Latency Notification"}}),
+    ("get", P + "/get_notification_forecast", {"params": {"minutes": 60}}),
+    ("post", P + "/create_admin_job", {"json": {"action": "create_notification", "payload": {"notification_name": "No Transaction Notification"}, "site_ids": ["s1", "s2"]}}),
+    ("get", P + "/get_admin_job", {"params": {"job_id": "a" * 32}}),
+    ("get", P + "/get_admin_job_sites", {"params": {"job_id": "a" * 32}}),
+    ("post", P + "/cancel_admin_job", {"params": {"job_id": "a" * 32}}),
+    ("post", P + "/evict_auth_cache", {"json": {"token": "t"}}),
+]
+
+
+async def fake_auth():
+    return {"token_active": True, "status": True, "metadata": {"site_id": "s1", "user_id": "u1", "role": "admin"}}
+
+async def fake_call_service(function_name, *args):
+    if function_name.startswith("Bulk"):
+        return SERVICE_RESULTS["BulkCreateNotifications"]
+    return SERVICE_RESULTS.get(function_name, {"matched_count": 1, "modified_count": 1})
+
+def legacy_completer(payload, metadata):
+    encoded_payload = jsonable_encoder(payload)
+    dateTimeObj = datetime.datetime.now()
+    encoded_payload["event_initiator_role"] = metadata["role"]
+    encoded_payload["event_initiator_id"] = metadata["user_id"]
+    encoded_payload["site_id"] = metadata["site_id"]
+    encoded_payload["timestamp"] = dateTimeObj.strftime("%d-%b-%Y (%H:%M:%S.%f)")
+    return encoded_payload
+
+def legacy_response_model(data, status, message, status_code=200, headers=None):
+    return responses.ResponseModel(data, status, message)
+
+
+def stub_data_layer():
+    for dependency in (auth.verifyGETAuthenticationAndAuthorizationRequest, auth.verifyEDITAuthenticationAndAuthorizationRequest,
+                       auth.verifyADMINAuthenticationAndAuthorizationRequest):
+        main.app.dependency_overrides[dependency] = fake_auth
+    main.call_service = fake_call_service
+    catalog.catalog.rebuild = lambda: None
+    catalog.catalog.body, catalog.catalog.etag = b'{"data":[],"status":true,"message":"Notification List"}', '"catalog"'
+    catalog.catalog._registry_version = models.get_registry_version()
+    catalog.catalog.watching = True
+    timezones.index.build()
+    forecast.GetNotificationForecast = lambda minutes: [
+        {"site_id": f"s{i}", "notification_name": "No Transaction Notification", "cron_type": "NoTransactionNotificationsCron",
+         "fire_at": "2022-07-01T12:15:00Z"} for i in range(200)
+    ]
+    jobs.CreateJob = lambda payload: JOB
+    jobs.GetJob = lambda job_id: JOB
+    jobs.CancelJob = lambda job_id: JOB
+    jobs.GetJobSites = lambda job_id, status, skip, limit: [
+        {"site_id": f"s{i}", "status": "succeeded", "error": None, "updated_at": NOW} for i in range(limit)
+    ]
+
+
+def set_mode(legacy: bool):
+    completer.general_completer_user = legacy_completer if legacy else ORIGINAL_COMPLETER
+    responses.JSONResponseModel = legacy_response_model if legacy else ORIGINAL_RESPONSE_MODEL
+    for route in main.app.routes:
+        if isinstance(route, APIRoute):
+            route.response_class = JSONResponse if legacy else ORJSONResponse
+            route.app = request_response(route.get_route_handler())
+
+
+def measure(client, method, path, kwargs, n):
+    for _ in range(min(n, 50)):
+        getattr(client, method)(path, **kwargs)
+    started_at = time.process_time()
+    for _ in range(n):
+        response = getattr(client, method)(path, **kwargs)
+    assert response.status_code < 400, (path, response.status_code, response.text)
+    return (time.process_time() - started_at) / n * 1e6
+
+
+ORIGINAL_COMPLETER = completer.general_completer_user
+ORIGINAL_RESPONSE_MODEL = responses.JSONResponseModel
+
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    stub_data_layer()
+    client = TestClient(main.app)
+    print(f"{'route':48s} {'before us':>10s} {'after us':>10s} {'saved':>7s}")
+    for method, path, kwargs in REQUESTS:
+        set_mode(legacy=True)
+        before = measure(client, method, path, kwargs, args.requests)
+        set_mode(legacy=False)
+        after = measure(client, method, path, kwargs, args.requests)
+        print(f"{method.upper() + ' ' + path:48s} {before:10.1f} {after:10.1f} {(before - after) / before:7.1%}")
+
+
+if __name__ == "__main__":
+    main_()
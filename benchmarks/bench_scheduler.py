@@ -0,0 +1,68 @@
+"""Due-job throughput of the in-process notification scheduler.
+
+Loads N synthetic schedules (the same mix as bench_forecast) into
+app/scheduler.py and drives tick() with a simulated clock, one tick per
+minute, so no database or wall-clock waiting is involved.
+
+    python -m benchmarks.bench_scheduler --sites 50000 --hours 24
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("MONGO_DB_LINK", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TRANSACTIONAL_DB_LINK", os.environ["MONGO_DB_LINK"])
+
+from app import scheduler
+from benchmarks.bench_forecast import build_settings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=50000)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--upserts", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    cron_settings = build_settings(args.sites, args.seed)
+    # Start on a minute boundary so ticks line up with fire times.
+    start = int(time.time()) // 60 * 60
+    notification_scheduler = scheduler.NotificationScheduler(handler=None)
+
+    started_at = time.perf_counter()
+    notification_scheduler.load_settings(cron_settings, now=start)
+    load_seconds = time.perf_counter() - started_at
+
+    jobs, tick_seconds, busiest_tick = 0, 0.0, 0.0
+    first_hour_jobs = 0
+    for minute in range(args.hours * 60):
+        started_at = time.perf_counter()
+        due = notification_scheduler.tick(start + minute * 60)
+        elapsed = time.perf_counter() - started_at
+        tick_seconds += elapsed
+        busiest_tick = max(busiest_tick, elapsed)
+        jobs += len(due)
+        if minute <= 60:
+            first_hour_jobs += len(due)
+
+    engine = scheduler.forecast.ForecastEngine()
+    engine.compile(cron_settings)
+    expected_first_hour = len(engine.fires_within(start, 60))
+
+    now = start + args.hours * 3600
+    started_at = time.perf_counter()
+    for cron_type, site_id, setting in cron_settings[:args.upserts]:
+        notification_scheduler.upsert(cron_type, site_id, setting, now=now)
+    upsert_seconds = time.perf_counter() - started_at
+
+    print(f"sites={args.sites} simulated={args.hours}h")
+    print(f"load:        {load_seconds * 1000:.1f} ms")
+    print(f"ticks:       {tick_seconds:.2f} s total, busiest {busiest_tick * 1000:.1f} ms")
+    print(f"due jobs:    {jobs} ({jobs / tick_seconds:,.0f} jobs/s)")
+    print(f"first hour:  {first_hour_jobs} jobs, forecast says {expected_first_hour}")
+    print(f"upserts:     {args.upserts / upsert_seconds:,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Per-site databases vs shared collections keyed by site_id.
+
+Seeds --sites sites in each layout on a local mongod (one NotificationList and
+one ConfigurationsList document per site), then measures point reads and
+writes through the service functions, a fleet-wide query (one find per site
+database vs one aggregate on the shared collection) and the number of
+namespaces each layout leaves on the server.
+
+    MONGO_DB_LINK=mongodb://localhost:27017 python -m benchmarks.bench_storage --sites 5000
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("MONGO_DB_LINK", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TRANSACTIONAL_DB_LINK", os.environ["MONGO_DB_LINK"])
+os.environ.setdefault("MONGO_TRANSACTIONS_ENABLED", "false")
+
+import pymongo
+from app import indexes, service, storage
+from app.constants import *
+from app.database import get_mongo_client
+
+BENCH_SITE_PREFIX = "bench_storage_"
+BENCH_NOTIFICATION_NAME = "No Permit Uploaded Notification"
+
+
+def get_site_ids(sites):
+    return [f"{BENCH_SITE_PREFIX}{i:05d}" for i in range(sites)]
+
+
+def site_documents(site_id):
+    now = datetime.datetime.utcnow()
+    notification_list = {
+        "entity_type": "NotificationList",
+        "site_id": site_id,
+        "created_at": now,
+        "entity_details": [{"notification_name": BENCH_NOTIFICATION_NAME, "email": "ops@example.com", "created_at": now, "metadata": {}}],
+    }
+    enforcement_hours = {"config_type": "enforcement_hours", "metadata": {"enforcement_from": "08:00", "enforcement_to": "18:00"}}
+    return notification_list, enforcement_hours
+
+
+def clean(site_ids):
+    client = get_mongo_client()
+    for site_id in site_ids:
+        client.drop_database(site_id)
+    site_filter = {"site_id": {"$regex": f"^{BENCH_SITE_PREFIX}"}}
+    client[NotificationsDatabase][SharedNotificationListCollection].delete_many(site_filter)
+    client[NotificationsDatabase][SharedConfigurationListCollection].delete_many(site_filter)
+    client[NotificationsDatabase][StorageMigrationsCollection].delete_many({"_id": {"$regex": f"^{BENCH_SITE_PREFIX}"}})
+
+
+def populate(storage_mode, site_ids):
+    client = get_mongo_client()
+    if storage_mode == storage.StorageModePerSite:
+        for site_id in site_ids:
+            notification_list, enforcement_hours = site_documents(site_id)
+            client[site_id][NotificationListCollection].create_index([("entity_type", pymongo.ASCENDING)], unique=True)
+            client[site_id][NotificationListCollection].insert_one(notification_list)
+            client[site_id][ConfigurationListCollection].insert_one(enforcement_hours)
+        return
+    indexes.PrintIndexResults(indexes.EnsureSharedIndexes())
+    notification_lists, configurations = [], []
+    for site_id in site_ids:
+        notification_list, enforcement_hours = site_documents(site_id)
+        notification_lists.append(notification_list)
+        configurations.append({**enforcement_hours, "site_id": site_id})
+    client[NotificationsDatabase][SharedNotificationListCollection].insert_many(notification_lists)
+    client[NotificationsDatabase][SharedConfigurationListCollection].insert_many(configurations)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.99) - 1] * 1000
+
+
+def time_calls(func, site_ids, ops):
+    samples = []
+    for _ in range(ops):
+        site_id = random.choice(site_ids)
+        started_at = time.perf_counter()
+        func(site_id)
+        samples.append(time.perf_counter() - started_at)
+    return percentiles(samples)
+
+
+def fleet_query(storage_mode, site_ids):
+    """Sites that have BENCH_NOTIFICATION_NAME configured."""
+    client = get_mongo_client()
+    started_at = time.perf_counter()
+    if storage_mode == storage.StorageModePerSite:
+        matches = sum(
+            client[site_id][NotificationListCollection].count_documents({"entity_type": "NotificationList", "entity_details.notification_name": BENCH_NOTIFICATION_NAME}, limit=1)
+            for site_id in site_ids
+        )
+    else:
+        matches = len(list(client[NotificationsDatabase][SharedNotificationListCollection].aggregate([
+            {"$match": {"site_id": {"$regex": f"^{BENCH_SITE_PREFIX}"}, "entity_details.notification_name": BENCH_NOTIFICATION_NAME}},
+            {"$group": {"_id": "$site_id"}},
+        ])))
+    return matches, time.perf_counter() - started_at
+
+
+def count_namespaces():
+    client = get_mongo_client()
+    return sum(len(client[database_name].list_collection_names()) for database_name in client.list_database_names())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=5000)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--keep", action="store_true", help="Leave the seeded data in place.")
+    args = parser.parse_args()
+
+    site_ids = get_site_ids(args.sites)
+    for storage_mode in (storage.StorageModePerSite, storage.StorageModeShared):
+        clean(site_ids)
+        storage.STORAGE_MODE = storage_mode
+        started_at = time.perf_counter()
+        populate(storage_mode, site_ids)
+        print(f"{storage_mode:>8}: populated {len(site_ids)} sites in {time.perf_counter() - started_at:.1f}s, {count_namespaces()} namespaces on the server")
+
+        read_p50, read_p99 = time_calls(lambda site_id: service.GetNotificationInfo(site_id, BENCH_NOTIFICATION_NAME), site_ids, args.ops)
+        write_p50, write_p99 = time_calls(
+            lambda site_id: service.SetEnforcementHours({"site_id": site_id, "enforcement_from": "07:00", "enforcement_to": "19:00"}), site_ids, args.ops
+        )
+        matches, fleet_seconds = fleet_query(storage_mode, site_ids)
+        print(f"{storage_mode:>8}: read p50 {read_p50:.2f}ms p99 {read_p99:.2f}ms | write p50 {write_p50:.2f}ms p99 {write_p99:.2f}ms")
+        print(f"{storage_mode:>8}: fleet query matched {matches} sites in {fleet_seconds * 1000:.0f}ms")
+    if not args.keep:
+        clean(site_ids)
+
+
+if __name__ == "__main__":
+    main()
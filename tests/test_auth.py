@@ -0,0 +1,126 @@
+"""verifyLocalToken against locally generated RSA and EC keys. Needs no database or auth module.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import os
+import time
+
+os.environ.setdefault("MONGO_DB_LINK", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TRANSACTIONAL_DB_LINK", os.environ["MONGO_DB_LINK"])
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from app import auth, exceptions
+
+RsaKey = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+EcKey = ec.generate_private_key(ec.SECP256R1())
+Endpoint = "/notifications"
+
+
+@pytest.fixture(autouse=True)
+def key_store(monkeypatch):
+    monkeypatch.setattr(auth, "_public_keys", auth.PublicKeyStore())
+    auth.registerPublicKey(RsaKey.public_key(), kid="rsa")
+    auth.registerPublicKey(EcKey.public_key(), kid="ec")
+    auth._revocation_cache.clear()
+    yield
+    auth._revocation_cache.clear()
+
+
+@pytest.fixture
+def revocation_checks(monkeypatch):
+    """Replaces checkAuth; each test sets the verdict (a dict, or an exception to raise)."""
+    calls = []
+    verdict = {"response": {"token_active": True, "status": True}}
+
+    async def check_auth(token, endpoint_name, scope_type):
+        calls.append(token)
+        if isinstance(verdict["response"], Exception):
+            raise verdict["response"]
+        return verdict["response"]
+
+    monkeypatch.setattr(auth, "checkAuth", check_auth)
+    return calls, verdict
+
+
+def make_token(key=RsaKey, algorithm="RS256", kid="rsa", **claims):
+    claims.setdefault("exp", int(time.time()) + 300)
+    claims = {name: value for name, value in claims.items() if value is not None}
+    return jwt.encode(claims, key, algorithm=algorithm, headers={"kid": kid} if kid else None)
+
+
+def verify(token, scope_type=auth.ScopeGet):
+    return asyncio.run(auth.verifyLocalToken(token, Endpoint, scope_type))
+
+
+def test_valid_rs256_and_es256_tokens(revocation_checks):
+    assert verify(make_token(scopes=["get"]))["token_active"] is True
+    assert verify(make_token(key=EcKey, algorithm="ES256", kid="ec", scopes=["get"]))["token_active"] is True
+
+
+def test_expired_and_exp_less_tokens_are_rejected(revocation_checks):
+    assert verify(make_token(exp=int(time.time()) - 60, scopes=["get"]))["token_active"] is False
+    assert verify(make_token(exp=None, scopes=["get"]))["token_active"] is False
+
+
+def test_hs256_and_none_tokens_are_rejected(revocation_checks):
+    hs256_token = make_token(key="shared-secret", algorithm="HS256", scopes=["get"])
+    none_token = make_token(key=None, algorithm="none", scopes=["get"])
+    assert verify(hs256_token)["token_active"] is False
+    assert verify(none_token)["token_active"] is False
+
+
+def test_unknown_kid_is_rejected(revocation_checks):
+    assert verify(make_token(kid="retired", scopes=["get"]))["token_active"] is False
+
+
+def test_signature_from_another_key_is_rejected(revocation_checks):
+    other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    assert verify(make_token(key=other_key, scopes=["get"]))["token_active"] is False
+
+
+def test_scopes_and_metadata_mapping(revocation_checks):
+    token = make_token(scopes=["get", "edit"], site_id="site_0", user_id="user_0", role="manager")
+    auth_response = verify(token, auth.ScopeEdit)
+    assert auth_response["status"] is True
+    assert auth_response["metadata"] == {"site_id": "site_0", "user_id": "user_0", "role": "manager", "scopes": ["get", "edit"]}
+    assert verify(token, auth.ScopeDelete)["status"] is False
+
+    # An OAuth-style space-separated "scope" claim and "sub" work too.
+    auth_response = verify(make_token(scope="get create", sub="user_1"), auth.ScopeCreate)
+    assert auth_response["status"] is True
+    assert auth_response["metadata"]["user_id"] == "user_1"
+    assert auth_response["metadata"]["scopes"] == ["get", "create"]
+
+
+def test_revoked_token_is_rejected(revocation_checks):
+    calls, verdict = revocation_checks
+    verdict["response"] = {"token_active": False, "status": False}
+    assert verify(make_token(scopes=["get"]))["token_active"] is False
+    assert len(calls) == 1
+
+
+def test_revocation_verdict_is_cached(revocation_checks):
+    calls, _ = revocation_checks
+    token = make_token(scopes=["get"])
+    assert verify(token)["token_active"] is True
+    assert verify(token)["token_active"] is True
+    assert len(calls) == 1
+
+
+def test_unavailable_auth_module_keeps_unknown_verdict_briefly(monkeypatch, revocation_checks):
+    calls, verdict = revocation_checks
+    monkeypatch.setattr(auth, "AUTH_CACHE_NEGATIVE_TTL_SECONDS", 0.05)
+    verdict["response"] = exceptions.ServiceUnavailableException("Auth Module")
+    token = make_token(scopes=["get"])
+    assert verify(token)["token_active"] is True
+    assert verify(token)["token_active"] is True
+    assert len(calls) == 1
+
+    # Once the unknown verdict expires, revocation is checked again.
+    verdict["response"] = {"token_active": False, "status": False}
+    time.sleep(0.1)
+    assert verify(token)["token_active"] is False
+    assert len(calls) == 2
@@ -0,0 +1,72 @@
+"""CircuitBreaker state transitions, including abandoned half-open trials. Needs no database.
+
+    python -m pytest -q tests
+"""
+import time
+
+from app import breaker
+
+
+def open_breaker(reset_timeout=0.05):
+    circuit_breaker = breaker.CircuitBreaker("test", failure_threshold=2, reset_timeout=reset_timeout)
+    circuit_breaker.record_failure()
+    circuit_breaker.record_failure()
+    return circuit_breaker
+
+
+def test_opens_after_threshold_and_rejects():
+    circuit_breaker = breaker.CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    circuit_breaker.record_failure()
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == breaker.StateOpen
+    assert not circuit_breaker.allow_request()
+
+
+def test_success_resets_failure_count():
+    circuit_breaker = breaker.CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    circuit_breaker.record_failure()
+    circuit_breaker.record_success()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == breaker.StateClosed
+
+
+def test_half_open_allows_one_trial():
+    circuit_breaker = open_breaker()
+    time.sleep(0.06)
+    assert circuit_breaker.allow_request()
+    assert circuit_breaker.state == breaker.StateHalfOpen
+    assert not circuit_breaker.allow_request()
+
+
+def test_trial_outcome_closes_or_reopens():
+    circuit_breaker = open_breaker()
+    time.sleep(0.06)
+    circuit_breaker.allow_request()
+    circuit_breaker.record_success()
+    assert circuit_breaker.state == breaker.StateClosed
+
+    circuit_breaker = open_breaker()
+    time.sleep(0.06)
+    circuit_breaker.allow_request()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == breaker.StateOpen
+    assert not circuit_breaker.allow_request()
+
+
+def test_abandoned_trial_hands_the_trial_to_the_next_call():
+    circuit_breaker = open_breaker(reset_timeout=60)
+    circuit_breaker.opened_at -= 61
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_abandoned()
+    assert circuit_breaker.state == breaker.StateOpen
+    assert circuit_breaker.allow_request()
+
+
+def test_trial_that_never_reports_back_expires():
+    circuit_breaker = open_breaker()
+    time.sleep(0.06)
+    assert circuit_breaker.allow_request()
+    assert not circuit_breaker.allow_request()
+    time.sleep(0.06)
+    assert circuit_breaker.allow_request()
@@ -0,0 +1,129 @@
+"""TTLCache single-flight loading, per-entry TTLs and cancellation. Needs no database.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from app.cache import TTLCache
+
+
+def test_get_or_load_collapses_concurrent_misses():
+    cache = TTLCache(max_size=10, ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("key", loader))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_aget_or_load_collapses_concurrent_misses():
+    cache = TTLCache(max_size=10, ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*[cache.aget_or_load("key", loader) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.get("key") == "value"
+
+
+def test_ttl_for_sets_per_entry_ttl():
+    cache = TTLCache(max_size=10, ttl=60)
+
+    async def loader(value):
+        return value
+
+    def ttl_for(value):
+        return 0.05 if value == "negative" else 60
+
+    async def main():
+        await cache.aget_or_load("negative", lambda: loader("negative"), ttl_for=ttl_for)
+        await cache.aget_or_load("positive", lambda: loader("positive"), ttl_for=ttl_for)
+
+    asyncio.run(main())
+    assert cache.get("negative") == "negative"
+    time.sleep(0.1)
+    assert cache.get("negative") is None
+    assert cache.get("positive") == "positive"
+
+
+def test_loader_errors_are_not_cached():
+    cache = TTLCache(max_size=10, ttl=60)
+    outcomes = iter([ValueError("down"), "value"])
+
+    async def loader():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def main():
+        with pytest.raises(ValueError):
+            await cache.aget_or_load("key", loader)
+        return await cache.aget_or_load("key", loader)
+
+    assert asyncio.run(main()) == "value"
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    cache = TTLCache(max_size=10, ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(cache.aget_or_load("key", loader))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.aget_or_load("key", loader))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "value"
+    assert len(calls) == 1
+    assert cache.get("key") == "value"
+
+
+def test_cancelled_only_caller_still_caches_the_load():
+    cache = TTLCache(max_size=10, ttl=60)
+
+    async def loader():
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        caller = asyncio.create_task(cache.aget_or_load("key", loader))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert cache.get("key") == "value"
@@ -0,0 +1,107 @@
+"""DST-transition behaviour of app/forecast.py against pytz.
+
+Fire times must match pytz localize(is_dst=False) (skipped wall times land after
+the transition, repeated ones on their second occurrence), be at or after now,
+and be strictly increasing. Needs no database.
+
+    python -m pytest -q tests
+"""
+import calendar
+import datetime
+import os
+
+os.environ.setdefault("MONGO_DB_LINK", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TRANSACTIONAL_DB_LINK", os.environ["MONGO_DB_LINK"])
+
+import numpy as np
+import pytest
+import pytz
+from app import forecast
+
+NewYork = "America/New_York"
+
+
+def utc(*args) -> int:
+    return calendar.timegm(datetime.datetime(*args).timetuple())
+
+
+def engine_for(*settings):
+    engine = forecast.ForecastEngine()
+    engine.compile([("Cron", f"site_{idx}", setting) for idx, setting in enumerate(settings)])
+    return engine
+
+
+def pytz_fire_times(setting, start, end):
+    """Every fire time in [start, end], one localized wall time at a time."""
+    tz = pytz.timezone(setting["timezone"])
+    if "beat_time" in setting:
+        hours, minutes = setting["beat_time"].split(":")
+        slots = [int(hours) * 60 + int(minutes)]
+    else:
+        slots = range(0, forecast.MinutesPerDay, setting["beat_freq"])
+    day = datetime.datetime.utcfromtimestamp(start).date() - datetime.timedelta(days=1)
+    fire_times = set()
+    while utc(day.year, day.month, day.day) <= end + forecast.SecondsPerDay:
+        if setting.get("freq") != "weekday" or day.weekday() < 5:
+            for slot in slots:
+                wall = datetime.datetime.combine(day, datetime.time()) + datetime.timedelta(minutes=slot)
+                fire_at = int(tz.localize(wall, is_dst=False).timestamp())
+                if start <= fire_at <= end:
+                    fire_times.add(fire_at)
+        day += datetime.timedelta(days=1)
+    return sorted(fire_times)
+
+
+def test_spring_forward_gap_is_increasing():
+    engine = engine_for({"timezone": NewYork, "beat_freq": 15})
+    fire_times = engine.next_fire_times(utc(2024, 3, 10, 6, 30), 6)[0].tolist()
+    assert fire_times == [utc(2024, 3, 10, 6, 30) + minutes * 60 for minutes in (0, 15, 30, 45, 60, 75)]
+
+
+def test_skipped_beat_time_fires_after_transition():
+    engine = engine_for({"timezone": NewYork, "beat_time": "02:30"})
+    assert engine.next_fire_times(utc(2024, 3, 9, 12, 0), 1)[0, 0] == utc(2024, 3, 10, 7, 30)
+
+
+def test_repeated_beat_time_fires_on_second_occurrence():
+    engine = engine_for({"timezone": NewYork, "beat_time": "01:30"})
+    assert engine.next_fire_times(utc(2024, 11, 3, 0, 0), 1)[0, 0] == utc(2024, 11, 3, 6, 30)
+
+
+def test_fires_within_spring_forward_gap():
+    engine = engine_for({"timezone": NewYork, "beat_freq": 15})
+    fires = sorted(fire_at for _, _, fire_at in engine.fires_within(utc(2024, 3, 10, 6, 50), 45))
+    assert fires == [utc(2024, 3, 10, 7, 0), utc(2024, 3, 10, 7, 15), utc(2024, 3, 10, 7, 30)]
+
+
+def test_fires_within_step_not_dividing_a_day():
+    # Slots at 23:48 and 23:55, then 00:00 the next day.
+    engine = engine_for({"timezone": "UTC", "beat_freq": 7})
+    fires = sorted(fire_at for _, _, fire_at in engine.fires_within(utc(2024, 5, 1, 23, 48), 12))
+    assert fires == [utc(2024, 5, 1, 23, 48), utc(2024, 5, 1, 23, 55), utc(2024, 5, 2, 0, 0)]
+
+
+def test_crontab_matches_column_schedule_across_gap():
+    engine = engine_for({"timezone": NewYork, "cron_expression": "*/15 * * * *"}, {"timezone": NewYork, "beat_freq": 15})
+    fire_times = engine.next_fire_times(utc(2024, 3, 10, 6, 30), 8)
+    assert np.array_equal(fire_times[0], fire_times[1])
+
+
+@pytest.mark.parametrize("zone_name", [NewYork, "Europe/Berlin", "Australia/Lord_Howe", "Antarctica/Troll"])
+@pytest.mark.parametrize("setting", [
+    {"beat_freq": 7}, {"beat_freq": 15, "freq": "weekday"}, {"beat_freq": 45}, {"beat_time": "02:15"}, {"beat_time": "01:30"},
+])
+def test_matches_pytz_around_2024_transitions(zone_name, setting):
+    setting = {**setting, "timezone": zone_name}
+    engine = engine_for(setting)
+    transitions = [
+        calendar.timegm(transition_time.timetuple())
+        for transition_time in pytz.timezone(zone_name)._utc_transition_times if transition_time.year == 2024
+    ]
+    for transition in transitions:
+        for offset_minutes in range(-180, 181, 17):
+            now = transition + offset_minutes * 60
+            expected = pytz_fire_times(setting, now, now + 7 * forecast.SecondsPerDay)
+            assert engine.next_fire_times(now, 5)[0].tolist() == expected[:5]
+            fires = sorted(fire_at for _, _, fire_at in engine.fires_within(now, 90))
+            assert fires == pytz_fire_times(setting, now, now + 90 * 60)
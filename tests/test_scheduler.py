@@ -0,0 +1,81 @@
+"""NotificationScheduler.tick/dispatch driven by a synthetic clock. Needs no database.
+
+    python -m pytest -q tests
+"""
+import calendar
+import datetime
+import os
+
+os.environ.setdefault("MONGO_DB_LINK", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TRANSACTIONAL_DB_LINK", os.environ["MONGO_DB_LINK"])
+
+import numpy as np
+from app import scheduler
+
+NewYork = "America/New_York"
+
+
+def utc(*args) -> int:
+    return calendar.timegm(datetime.datetime(*args).timetuple())
+
+
+def run_clock(notification_scheduler, start, end, step):
+    fired = []
+    for now in range(start, end, step):
+        fired.extend(job.fire_at for job in notification_scheduler.tick(now))
+        assert notification_scheduler.next_fire_at() > now
+    return fired
+
+
+def test_tick_across_spring_forward_gap():
+    notification_scheduler = scheduler.NotificationScheduler()
+    start = utc(2024, 3, 10, 5, 0)
+    notification_scheduler.load_settings([("Cron", "site_0", {"timezone": NewYork, "beat_freq": 15})], now=start)
+    fired = run_clock(notification_scheduler, start, utc(2024, 3, 10, 9, 0), 60)
+    assert fired == list(range(start, utc(2024, 3, 10, 9, 0), 15 * 60))
+
+
+def test_tick_across_fall_back_fires_repeated_hour_once():
+    notification_scheduler = scheduler.NotificationScheduler()
+    start = utc(2024, 11, 3, 4, 0)
+    notification_scheduler.load_settings([("Cron", "site_0", {"timezone": NewYork, "beat_freq": 15})], now=start)
+    fired = run_clock(notification_scheduler, start, utc(2024, 11, 3, 8, 0), 60)
+    # 01:00-01:59 happens twice; its slots fire on the second (standard time) pass only.
+    first_pass = range(utc(2024, 11, 3, 5, 0), utc(2024, 11, 3, 6, 0))
+    assert fired == [fire_at for fire_at in range(start, utc(2024, 11, 3, 8, 0), 15 * 60) if fire_at not in first_pass]
+
+
+def test_tick_never_reschedules_at_or_before_now():
+    notification_scheduler = scheduler.NotificationScheduler()
+    start = utc(2024, 5, 1, 12, 0)
+    notification_scheduler.load_settings([("Cron", "site_0", {"timezone": "UTC", "beat_freq": 15})], now=start)
+    engine = notification_scheduler._schedules[("Cron", "site_0")][0]
+    next_fire_times = engine.next_fire_times
+    stale_answers = [np.array([[start]], dtype=np.int64)]
+
+    def forecast_once_in_the_past(now, k, rows=None):
+        return stale_answers.pop() if stale_answers else next_fire_times(now, k, rows)
+
+    engine.next_fire_times = forecast_once_in_the_past
+    assert len(notification_scheduler.tick(start)) == 1
+    assert notification_scheduler.next_fire_at() > start
+    assert notification_scheduler.tick(start) == []
+
+
+def test_dispatch_stops_once_lease_expired():
+    submitted = []
+
+    class Executor():
+        def submit(self, func, job):
+            submitted.append(job)
+
+    notification_scheduler = scheduler.NotificationScheduler(max_pending=1)
+    notification_scheduler._executor = Executor()
+    jobs = [scheduler.DueJob("Cron", "site_0", None, 0), scheduler.DueJob("Cron", "site_1", None, 0)]
+    notification_scheduler.dispatch(jobs)
+    assert submitted == []
+
+    # Holding the lease, the second job waits for the first's slot only until the lease runs out.
+    notification_scheduler.lease.expires_at = scheduler.time.time() + 0.2
+    notification_scheduler.dispatch(jobs)
+    assert submitted == jobs[:1]
@@ -0,0 +1,68 @@
+"""Notification CRUD through outbox.RunInTransaction against a replica set.
+
+Skipped unless MONGO_TEST_REPLICA_SET=true and MONGO_DB_LINK points at a replica
+set (a throwaway one is enough: `mongod --replSet rs0` then `rs.initiate()`):
+
+    MONGO_TEST_REPLICA_SET=true MONGO_DB_LINK=mongodb://localhost:27017/?replicaSet=rs0 python -m pytest -q tests
+"""
+import os
+
+os.environ.setdefault("MONGO_DB_LINK", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TRANSACTIONAL_DB_LINK", os.environ["MONGO_DB_LINK"])
+
+import pytest
+from app import models, notification_sites, outbox, service, storage
+from app.constants import NotificationListCollection
+from app.database import get_mongo_client
+
+pytestmark = pytest.mark.skipif(
+    os.getenv("MONGO_TEST_REPLICA_SET", "false").lower() != "true", reason="needs a replica set (MONGO_TEST_REPLICA_SET=true)"
+)
+
+SiteId = "test_transactions_site"
+NotificationName = models.NoPermitUploadNotification.NotificationName
+
+
+@pytest.fixture(autouse=True)
+def clean_site():
+    def clean():
+        get_mongo_client().drop_database(SiteId)
+        collection, site_filter = storage.GetSiteCollection(SiteId, NotificationListCollection, write=True)
+        collection.delete_many({**site_filter, "entity_type": "NotificationList"})
+        notification_sites.GetNotificationSitesCollection().delete_many({"site_id": SiteId})
+    clean()
+    yield
+    clean()
+
+
+def index_entries():
+    return list(notification_sites.GetNotificationSitesCollection().find({"site_id": SiteId}, notification_sites.EntryProjection))
+
+
+def test_transactions_detected():
+    assert outbox.TransactionsEnabled()
+
+
+def test_crud_keeps_notification_sites_in_step():
+    service.CreateNotification({"site_id": SiteId, "notification_name": NotificationName, "email_recipients": ["ops@example.com"]})
+    assert [entry["recipient_count"] for entry in index_entries()] == [1]
+    service.UpdateNotification({"site_id": SiteId, "notification_name": NotificationName, "email_recipients": ["ops@example.com", "it@example.com"]})
+    assert [entry["recipient_count"] for entry in index_entries()] == [2]
+    service.DeleteNotification({"site_id": SiteId, "notification_name": NotificationName})
+    assert index_entries() == []
+    assert notification_sites.CheckSite(SiteId) == []
+
+
+def test_failed_write_rolls_back_both_collections():
+    notification = models.NoPermitUploadNotification(site_id=SiteId, email_recipients=["ops@example.com"])
+    collection, site_filter = storage.GetSiteCollection(SiteId, NotificationListCollection, write=True)
+
+    def create_then_fail(session):
+        collection.update_one(notification.NotificationListFilter(False, site_filter), notification.NewNotificationUpdate(), upsert=True, session=session)
+        notification_sites.UpsertNotificationSite(SiteId, notification.FormatNotificationForDatabase(), session=session)
+        raise RuntimeError("abort")
+
+    with pytest.raises(RuntimeError):
+        outbox.RunInTransaction(create_then_fail)
+    assert collection.count_documents({**site_filter, "entity_type": "NotificationList"}) == 0
+    assert index_entries() == []